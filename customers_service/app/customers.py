@@ -5,6 +5,7 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import requests
 import logging
+from shared.relay import conditional_headers, relay_json, relay_stream
 
 DATABASE_SERVICE_URL = "http://database:5000"
 
@@ -65,6 +66,34 @@ def api_register_customer():
         logger.error("Error registering customer: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/customers/register/bulk', methods=['POST'])
+@profile_function
+@profile
+def api_register_customers_bulk():
+    """
+    Register many customers in one request.
+
+    Passwords are hashed in parallel and rows are inserted in chunks. Invalid
+    rows and usernames that are repeated or already taken are reported per row
+    without aborting the rest of the batch.
+
+    Request Body:
+        list: JSON array of customer objects (first_name, last_name, username,
+        password, and optionally age, address, gender, marital_status, wallet_balance).
+
+    Returns:
+        Response: JSON with a per-row "results" list (inserted, duplicate,
+        invalid or failed) and a "summary" of counts and timings.
+    """
+    customers = request.get_json()
+    try:
+        logger.info("Registering %s customers in bulk", len(customers) if isinstance(customers, list) else 0)
+        response = requests.post(f"{DATABASE_SERVICE_URL}/customers/bulk", json=customers)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error registering customers in bulk: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/customers/delete/<customer_id>', methods=['DELETE'])
 @profile_function
 @profile
@@ -113,13 +142,25 @@ def api_get_customers():
     """
     Get a list of all customers.
 
+    Query Parameters:
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+        stream (str, optional): "ndjson" or "json" to stream every row
+            instead of paging; the body is relayed with constant memory.
+
+    Headers:
+        If-None-Match (str, optional): ETag of an earlier response; answered
+            with an empty 304 if the data has not changed since.
+
     Returns:
-        Response: JSON list of customers.
+        Response: JSON list of customers, or {"items", "next_cursor"} when paginated.
     """
     try:
         logger.info("Fetching all customers")
-        response = requests.get(f"{DATABASE_SERVICE_URL}/customers")
-        return jsonify(response.json()), response.status_code
+        if request.args.get("stream"):
+            return relay_stream(requests.get(f"{DATABASE_SERVICE_URL}/customers", params=request.args, stream=True))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/customers", params=request.args, headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching customers: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -139,8 +180,8 @@ def api_get_customer_by_username(username):
     """
     try:
         logger.info("Fetching customer by username: %s", username)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/customers/username/{username}")
-        return jsonify(response.json()), response.status_code
+        response = requests.get(f"{DATABASE_SERVICE_URL}/customers/username/{username}", headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching customer by username: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -158,8 +199,8 @@ def api_get_customer_by_id(customer_id):
     """
     try:
         logger.info("Fetching customer by ID: %s", customer_id)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/customers/id/{customer_id}")
-        return jsonify(response.json()), response.status_code
+        response = requests.get(f"{DATABASE_SERVICE_URL}/customers/id/{customer_id}", headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching customer by ID: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -106,6 +106,34 @@ def api_get_wishes(customer_id):
         logger.error("Error fetching wishlist: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/customers/wishlist/notify/sweep', methods=['POST'])
+@profile_function
+@profile
+def api_sweep_abandoned_wishlists():
+    """
+    Notify every customer with abandoned wishlist items in one batch job.
+
+    Wishes are read once in age order from where the previous sweep stopped,
+    and each customer gets a single notification per batch, so re-runs only
+    cover wishes that became abandoned since the last one.
+
+    Request Body:
+        dict (optional): JSON with "days" (age threshold, default 7) and
+        "reset" (true to ignore the checkpoint and sweep everything).
+
+    Returns:
+        Response: JSON summary with the number of wishes swept, notifications
+        sent, batches and the new checkpoint.
+    """
+    options = request.get_json(silent=True) or {}
+    try:
+        logger.info("Sweeping abandoned wishlists: %s", options)
+        response = requests.post(f"{DATABASE_SERVICE_URL}/wishlist/notify/sweep", json=options)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error sweeping abandoned wishlists: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/customers/wishlist/notify/<customer_id>', methods=['POST'])
 @profile_function
 @profile
@@ -113,6 +141,9 @@ def api_notify_customer(customer_id):
     """
     Notify the customer about abandoned wishlist items.
 
+    The notification is queued for background delivery, so the response
+    does not wait for it to be sent.
+
     Args:
         customer_id (str): The ID of the customer to notify.
 
@@ -114,5 +114,24 @@ class TestCustomerAPI(unittest.TestCase):
         self.assertEqual(response.json, {"success": True, "message": "Wallet updated"})
         mock_update_customer_wallet.assert_called_once_with("test_user", -30)
 
+    @patch('app.requests.post')
+    def test_register_customers_bulk(self, mock_post):
+        report = {
+            "results": [
+                {"row": 0, "status": "inserted", "customer_id": 1, "username": "user1"},
+                {"row": 1, "status": "duplicate", "username": "user1"},
+            ],
+            "summary": {"received": 2, "inserted": 1, "duplicates": 1, "invalid": 0, "failed": 0},
+        }
+        mock_post.return_value = MagicMock(status_code=201, json=lambda: report)
+        customers = [
+            {"first_name": "A", "last_name": "B", "username": "user1", "password": "pw1"},
+            {"first_name": "C", "last_name": "D", "username": "user1", "password": "pw2"},
+        ]
+        response = self.app.post('/customers/register/bulk', json=customers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json, report)
+        self.assertEqual(mock_post.call_args.kwargs["json"], customers)
+
 if __name__ == '__main__':
     unittest.main()
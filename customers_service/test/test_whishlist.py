@@ -36,3 +36,13 @@ def test_api_notify_customer(mock_notify, client):
     response = client.post('/customers/wishlist/notify/1')
     assert response.status_code == 200
     assert response.json == {"message": "Notification sent successfully."}
+
+@patch('wishlist.requests.post')
+def test_api_sweep_abandoned_wishlists(mock_post, client):
+    summary = {"wishes": 3, "notifications": 2, "batches": 1, "checkpoint": {"added_at": "2024-01-01 10:00:00", "wish_id": 3}}
+    mock_post.return_value.json.return_value = summary
+    mock_post.return_value.status_code = 200
+    response = client.post('/customers/wishlist/notify/sweep', json={"days": 7})
+    assert response.status_code == 200
+    assert response.json == summary
+    assert mock_post.call_args.kwargs["json"] == {"days": 7}
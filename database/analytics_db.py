@@ -0,0 +1,313 @@
+import json
+import os
+import threading
+import time
+from connection_db import get_connection
+from archive_db import month_bounds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ANALYTICS_CHUNK_SIZE = 50000
+# Seconds a loaded set of column arrays is reused by the numpy engine.
+ANALYTICS_CACHE_TTL = float(os.environ.get('ECOMMERCE_ANALYTICS_CACHE_TTL', 60))
+
+AGE_EDGES = (18, 25, 35, 45, 55, 65)
+AGE_BANDS = ('<18', '18-24', '25-34', '35-44', '45-54', '55-64', '65+')
+UNKNOWN_AGE = 'unknown'
+
+# Categorical columns of the Sales/Customers/Inventory join, by dimension name.
+CATEGORICAL_DIMENSIONS = {
+    'gender': 'c.gender',
+    'marital_status': 'c.marital_status',
+    'category': 'i.category',
+}
+DIMENSIONS = ('age_band',) + tuple(CATEGORICAL_DIMENSIONS)
+ENGINES = ('numpy', 'sql')
+
+# {sales} is main.Sales or the Sales table of an attached archive partition.
+_SALES_JOIN = '''
+    FROM {sales} s
+    LEFT JOIN main.Customers c ON c.customer_id = s.customer_id
+    LEFT JOIN main.Inventory i ON i.product_id = s.product_id
+'''
+
+_AGE_BAND_SQL = (
+    "CASE WHEN c.age IS NULL THEN '" + UNKNOWN_AGE + "'"
+    + "".join(f" WHEN c.age < {edge} THEN '{band}'" for edge, band in zip(AGE_EDGES, AGE_BANDS))
+    + f" ELSE '{AGE_BANDS[-1]}' END"
+)
+
+
+def parse_dimensions(by):
+    """
+    Split a comma-separated ``by`` argument into known dimension names.
+
+    Raises:
+        ValueError: If it is empty or names an unknown dimension.
+    """
+    dimensions = [d.strip() for d in (by or '').split(',') if d.strip()]
+    if not dimensions:
+        raise ValueError(f"by is required, one or more of: {', '.join(DIMENSIONS)}")
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s) {', '.join(unknown)}; expected: {', '.join(DIMENSIONS)}")
+    return list(dict.fromkeys(dimensions))
+
+
+class SalesColumns:
+    """
+    Sales joined with their customer and product, held as NumPy column arrays.
+
+    Categorical columns are dictionary-encoded: ``codes[name]`` is an int32
+    array indexing into ``labels[name]``. Ages are float64 with NaN for
+    missing customers or ages. ``archived_months`` lists the archive
+    partitions included.
+    """
+
+    def __init__(self, revenue, units, age, codes, labels, archived_months=()):
+        self.revenue = revenue
+        self.units = units
+        self.age = age
+        self.codes = codes
+        self.labels = labels
+        self.archived_months = list(archived_months)
+
+    def __len__(self):
+        return len(self.revenue)
+
+
+def read_sales(conn, select, handle, group_by=''):
+    """
+    Run ``SELECT {select}`` over the sales join of the hot table and of every archive partition.
+
+    ``handle`` is called with one cursor per source. The hot rows, the archive
+    catalog and the ids of hot rows in already archived months are read in
+    one transaction. Those rows are skipped in the partitions, which may
+    also hold copies made by a concurrent archive_sales, so every sale is
+    counted exactly once.
+
+    Returns:
+        list: The archived months that were read.
+    """
+    conn.execute("BEGIN")
+    try:
+        partitions = conn.execute("SELECT month, path FROM SalesArchivePartitions ORDER BY month").fetchall()
+        late = []
+        if partitions:
+            until = month_bounds(partitions[-1][0])[1]
+            late = [row[0] for row in conn.execute("SELECT sale_id FROM Sales WHERE order_date < ?", (until,))]
+        handle(conn.execute(f"SELECT {select} {_SALES_JOIN.format(sales='main.Sales')} {group_by}"))
+    finally:
+        conn.rollback()
+    months = []
+    for month, path in partitions:
+        if not os.path.exists(path):
+            continue
+        conn.execute("ATTACH DATABASE ? AS archived", (path,))
+        try:
+            handle(conn.execute(
+                f"SELECT {select} {_SALES_JOIN.format(sales='archived.Sales')} "
+                f"WHERE s.sale_id NOT IN (SELECT value FROM json_each(?)) {group_by}",
+                (json.dumps(late),),
+            ))
+        finally:
+            conn.execute("DETACH DATABASE archived")
+        months.append(month)
+    return months
+
+
+def _encode(values, mapping):
+    return np.fromiter((mapping.setdefault(v, len(mapping)) for v in values), dtype=np.int32, count=len(values))
+
+
+def load_sales_columns(chunk_size=ANALYTICS_CHUNK_SIZE):
+    """
+    Read the Sales join, archive partitions included, into column arrays, ``chunk_size`` rows at a time.
+
+    Raises:
+        RuntimeError: If NumPy is not installed.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is not installed; use the sql engine")
+    names = list(CATEGORICAL_DIMENSIONS)
+    columns = ", ".join(CATEGORICAL_DIMENSIONS[name] for name in names)
+    mappings = {name: {} for name in names}
+    revenue, units, age = [], [], []
+    codes = {name: [] for name in names}
+
+    def append(cur):
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = list(zip(*rows))
+            revenue.append(np.asarray(chunk[0], dtype=np.float64))
+            units.append(np.asarray(chunk[1], dtype=np.int64))
+            age.append(np.asarray([np.nan if a is None else a for a in chunk[2]], dtype=np.float64))
+            for offset, name in enumerate(names, start=3):
+                codes[name].append(_encode(chunk[offset], mappings[name]))
+
+    with get_connection() as conn:
+        # Plain tuples: the chunks are transposed, never read by column name.
+        row_factory, conn.row_factory = conn.row_factory, None
+        try:
+            months = read_sales(conn, f"COALESCE(s.total_price, 0), s.quantity, c.age, {columns}", append)
+        finally:
+            conn.row_factory = row_factory
+
+    def join(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    labels = {name: list(mappings[name]) for name in names}
+    return SalesColumns(
+        join(revenue, np.float64),
+        join(units, np.int64),
+        join(age, np.float64),
+        {name: join(codes[name], np.int32) for name in names},
+        labels,
+        months,
+    )
+
+
+_columns_lock = threading.Lock()
+_columns_cache = {}
+
+
+def get_sales_columns(max_age=ANALYTICS_CACHE_TTL):
+    """
+    Return the loaded column arrays, reloading them once they are older than ``max_age`` seconds.
+
+    Loading dominates the cost of a numpy breakdown, so consecutive reports
+    share one load. Results can therefore lag writes by up to ``max_age``.
+
+    Returns:
+        tuple: (SalesColumns, age of the arrays in seconds).
+    """
+    with _columns_lock:
+        loaded_at = _columns_cache.get("loaded_at")
+        if loaded_at is None or time.monotonic() - loaded_at > max_age:
+            _columns_cache["columns"] = load_sales_columns()
+            _columns_cache["loaded_at"] = loaded_at = time.monotonic()
+        return _columns_cache["columns"], time.monotonic() - loaded_at
+
+
+def _dimension_codes(columns, dimension):
+    if dimension == 'age_band':
+        codes = np.digitize(columns.age, AGE_EDGES).astype(np.int32)
+        codes[np.isnan(columns.age)] = len(AGE_BANDS)
+        return codes, list(AGE_BANDS) + [UNKNOWN_AGE]
+    return columns.codes[dimension], columns.labels[dimension]
+
+
+def group_by_numpy(columns, dimensions):
+    """
+    Aggregate revenue, units and order count per combination of dimensions.
+
+    Each dimension is an integer code array; the codes are combined into one
+    mixed-radix group key, and the sums are taken with ``np.bincount``.
+    """
+    key = np.zeros(len(columns), dtype=np.int64)
+    labels = []
+    for dimension in dimensions:
+        codes, names = _dimension_codes(columns, dimension)
+        key = key * max(len(names), 1) + codes
+        labels.append(names)
+    groups, inverse = np.unique(key, return_inverse=True)
+    revenue = np.bincount(inverse, weights=columns.revenue, minlength=len(groups))
+    units = np.bincount(inverse, weights=columns.units, minlength=len(groups))
+    orders = np.bincount(inverse, minlength=len(groups))
+    rows = []
+    for index, group in enumerate(groups.tolist()):
+        row = {}
+        for dimension, names in zip(reversed(dimensions), reversed(labels)):
+            group, code = divmod(group, max(len(names), 1))
+            row[dimension] = names[code]
+        row = {dimension: row[dimension] for dimension in dimensions}
+        row.update(revenue=round(float(revenue[index]), 2), units=int(units[index]), orders=int(orders[index]))
+        rows.append(row)
+    return rows
+
+
+def group_by_sql(dimensions, archived_months=None):
+    """
+    Let SQLite group each source, then add up the groups of all sources.
+
+    Args:
+        archived_months (list, optional): Filled with the archive partitions read.
+    """
+    expressions = [_AGE_BAND_SQL if d == 'age_band' else CATEGORICAL_DIMENSIONS[d] for d in dimensions]
+    select = ", ".join(f"{expr} AS {d}" for expr, d in zip(expressions, dimensions))
+    groups = {}
+
+    def add(cur):
+        for row in cur:
+            key = tuple(row[d] for d in dimensions)
+            group = groups.setdefault(key, {**{d: row[d] for d in dimensions}, "revenue": 0.0, "units": 0, "orders": 0})
+            group["revenue"] += float(row["revenue"])
+            group["units"] += row["units"]
+            group["orders"] += row["orders"]
+
+    with get_connection() as conn:
+        months = read_sales(
+            conn,
+            f"{select}, SUM(COALESCE(s.total_price, 0)) AS revenue, SUM(s.quantity) AS units, COUNT(*) AS orders",
+            add,
+            group_by=f"GROUP BY {', '.join(expressions)}",
+        )
+    if archived_months is not None:
+        archived_months.extend(months)
+    return [{**group, "revenue": round(group["revenue"], 2)} for group in groups.values()]
+
+
+def _sort_key(dimensions):
+    return lambda row: tuple((row[d] is None, str(row[d])) for d in dimensions)
+
+
+def sales_breakdown(by, engine='numpy'):
+    """
+    Revenue, units and order count of all sales grouped by customer and product attributes.
+
+    Archived sales are included: the hot Sales table and every archive
+    partition are read.
+
+    Args:
+        by (str): Comma-separated dimensions: age_band, gender, marital_status, category.
+        engine (str): ``"numpy"`` to aggregate column arrays in memory, or
+            ``"sql"`` to let SQLite group the join. ``"numpy"`` falls back to
+            ``"sql"`` when NumPy is not installed. Its column arrays are
+            cached for ANALYTICS_CACHE_TTL seconds.
+
+    Returns:
+        dict: ``groups`` sorted by the dimensions, overall ``totals``, the
+        archived months included, the engine used, its elapsed time and,
+        for numpy, the age of the data.
+
+    Raises:
+        ValueError: If a dimension or the engine is unknown.
+    """
+    dimensions = parse_dimensions(by)
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of: {', '.join(ENGINES)}")
+    if engine == 'numpy' and np is None:
+        engine = 'sql'
+    start = time.perf_counter()
+    data_age = 0.0
+    if engine == 'numpy':
+        columns, data_age = get_sales_columns()
+        groups = group_by_numpy(columns, dimensions)
+        archived_months = columns.archived_months
+    else:
+        archived_months = []
+        groups = group_by_sql(dimensions, archived_months)
+    groups.sort(key=_sort_key(dimensions))
+    elapsed = time.perf_counter() - start
+    totals = {
+        "revenue": round(sum(g["revenue"] for g in groups), 2),
+        "units": sum(g["units"] for g in groups),
+        "orders": sum(g["orders"] for g in groups),
+    }
+    return {"by": dimensions, "groups": groups, "totals": totals, "archived_months": archived_months, "engine": engine,
+            "elapsed_ms": round(elapsed * 1000, 2), "data_age_s": round(data_age, 1)}
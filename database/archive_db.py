@@ -0,0 +1,206 @@
+import heapq
+import os
+import sqlite3
+from datetime import date, timedelta
+from connection_db import DATABASE, get_connection
+from rollups_db import suspend_rollups, resume_rollups
+
+ARCHIVE_DIR = os.environ.get('ECOMMERCE_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'archive'))
+ARCHIVE_HORIZON_DAYS = int(os.environ.get('ECOMMERCE_ARCHIVE_HORIZON_DAYS', 365))
+
+_ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive.Sales (
+    sale_id INTEGER PRIMARY KEY NOT NULL,
+    customer_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    total_price DECIMAL(10, 2),
+    order_date TIMESTAMP
+    );
+    ''',
+    "CREATE INDEX IF NOT EXISTS archive.idx_sales_customer ON Sales (customer_id)",
+]
+
+_SALES_COLUMNS = "sale_id, customer_id, product_id, quantity, total_price, order_date"
+
+
+def create_archive_catalog_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS SalesArchivePartitions (
+                month TEXT PRIMARY KEY NOT NULL,
+                path TEXT NOT NULL,
+                row_count INT NOT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            ''')
+            conn.commit()
+        print('SalesArchivePartitions table created successfully.')
+    except:
+        print('An error occured while creating the sales archive catalog table.')
+
+
+def month_bounds(month):
+    first = date.fromisoformat(month + '-01')
+    following = (first + timedelta(days=32)).replace(day=1)
+    return first.isoformat(), following.isoformat()
+
+
+def partition_path(month):
+    return os.path.join(ARCHIVE_DIR, f"sales_{month.replace('-', '_')}.db")
+
+
+def archive_boundary(horizon_days=ARCHIVE_HORIZON_DAYS, today=None):
+    """
+    First day of the month containing ``today - horizon_days``.
+
+    Only whole months before it are closed and eligible for archival.
+    """
+    return ((today or date.today()) - timedelta(days=horizon_days)).replace(day=1).isoformat()
+
+
+def archived_until():
+    """
+    Day after the newest archived month, or None if nothing is archived.
+    """
+    with get_connection() as conn:
+        month = conn.execute("SELECT MAX(month) FROM SalesArchivePartitions").fetchone()[0]
+    return month_bounds(month)[1] if month else None
+
+
+def _archive_month(conn, month):
+    first, following = month_bounds(month)
+    path = partition_path(month)
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        for statement in _ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+        # Copy first and commit the partition on its own: with WAL, a
+        # transaction spanning attached files is not atomic as a whole.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f'''
+                INSERT OR IGNORE INTO archive.Sales ({_SALES_COLUMNS})
+                SELECT {_SALES_COLUMNS} FROM main.Sales WHERE order_date >= ? AND order_date < ?
+            ''', (first, following))
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+
+        # Then delete only rows the partition holds, and publish the partition
+        # in the catalog in the same main-database transaction. Readers consult
+        # the catalog, so they never see a row in both places or in neither.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            suspend_rollups(conn, 'archive')
+            moved = conn.execute('''
+                DELETE FROM main.Sales
+                WHERE order_date >= ? AND order_date < ? AND sale_id IN (SELECT sale_id FROM archive.Sales)
+            ''', (first, following)).rowcount
+            resume_rollups(conn, 'archive')
+            conn.execute('''
+                INSERT INTO SalesArchivePartitions (month, path, row_count) VALUES (?, ?, (SELECT COUNT(*) FROM archive.Sales))
+                ON CONFLICT (month) DO UPDATE SET path = excluded.path, row_count = excluded.row_count, archived_at = CURRENT_TIMESTAMP
+            ''', (month, path))
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return moved
+
+
+def archive_sales(horizon_days=ARCHIVE_HORIZON_DAYS):
+    """
+    Move closed months of sales older than the horizon into per-month files.
+
+    Each month is attached as its own SQLite file under ARCHIVE_DIR, copied
+    with INSERT ... SELECT, and then removed from the hot Sales table. The
+    sales rollups are left untouched. Re-running is safe and picks up any
+    late rows for an already archived month.
+
+    Args:
+        horizon_days (int): Sales in months that ended more than this many days ago are archived.
+
+    Returns:
+        list: One dict per archived month with the number of rows moved.
+    """
+    boundary = archive_boundary(horizon_days)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with get_connection() as conn:
+        months = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT strftime('%Y-%m', order_date) FROM Sales WHERE order_date < ? ORDER BY 1", (boundary,)
+            )
+        ]
+        return [{"month": month, "moved": _archive_month(conn, month)} for month in months]
+
+
+def _partitions_for(start, end):
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT month, path FROM SalesArchivePartitions WHERE month BETWEEN ? AND ? ORDER BY month",
+            (start[:7], end[:7]),
+        ).fetchall()
+    return [(row["month"], row["path"]) for row in rows]
+
+
+def _query_partition(path, where, params):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(f"SELECT {_SALES_COLUMNS} FROM Sales WHERE {where} ORDER BY sale_id LIMIT ?", params)]
+    finally:
+        conn.close()
+
+
+def customer_sales_history(customer_id, after=0, limit=-1, start=None, end=None):
+    """
+    A customer's sales in sale_id order, from the hot table and, when needed, the archive.
+
+    Without a date range only the hot Sales table is read. With one, the
+    archive catalog is checked and just the monthly partitions overlapping
+    the range are opened, read-only; their rows are merged with the hot
+    rows by sale_id.
+
+    Args:
+        customer_id (int): The customer.
+        after (int): Keyset position; only sales with a greater sale_id.
+        limit (int): Maximum number of sales, -1 for all.
+        start (str, optional): First day, ``YYYY-MM-DD``, inclusive.
+        end (str, optional): Last day, ``YYYY-MM-DD``, inclusive.
+
+    Returns:
+        list: Sale dicts ordered by sale_id.
+    """
+    where = "customer_id = ? AND sale_id > ?"
+    params = [customer_id, after]
+    if start:
+        where += " AND order_date >= ?"
+        params.append(start)
+    if end:
+        where += " AND order_date < ?"
+        params.append((date.fromisoformat(end) + timedelta(days=1)).isoformat())
+    with get_connection() as conn:
+        hot = [dict(row) for row in conn.execute(f"SELECT {_SALES_COLUMNS} FROM Sales WHERE {where} ORDER BY sale_id LIMIT ?", params + [limit])]
+    if not start and not end:
+        return hot
+    parts = [hot]
+    for _, path in _partitions_for(start or '0000-01-01', end or date.today().isoformat()):
+        parts.append(_query_partition(path, where, params + [limit]))
+    sales, seen = [], set()
+    for sale in heapq.merge(*parts, key=lambda s: s["sale_id"]):
+        if sale["sale_id"] in seen:
+            continue
+        seen.add(sale["sale_id"])
+        sales.append(sale)
+        if len(sales) == limit:
+            break
+    return sales
@@ -0,0 +1,26 @@
+"""
+Move sales in closed months older than the horizon out of the hot Sales
+table into per-month archive files.
+
+Meant to run periodically, e.g. nightly from cron. Months already archived
+only pick up late rows.
+
+Usage:
+    python archive_sales.py [horizon_days]
+"""
+import sys
+
+from archive_db import create_archive_catalog_table, archive_sales, ARCHIVE_DIR, ARCHIVE_HORIZON_DAYS
+
+
+def main():
+    horizon_days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_HORIZON_DAYS
+    create_archive_catalog_table()
+    months = archive_sales(horizon_days)
+    for month in months:
+        print(f"{month['month']}: moved {month['moved']} sale(s)")
+    print(f"Archived {len(months)} month(s) into {ARCHIVE_DIR}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark for the sales analytics engines.
+
+Fills a temporary database with synthetic customers, products and sales, then
+computes every single-dimension breakdown and one combined breakdown with
+both the NumPy and the SQL engine. For each it checks that the two agree and
+reports their timings; the NumPy timing is split into loading the column
+arrays and aggregating them.
+
+Usage:
+    python bench_analytics.py [sales] [customers] [products]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ['ECOMMERCE_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_analytics.db')
+
+from connection_db import DATABASE, get_pool
+from customers_db import create_customers_table, GENDERS, MARITAL_STATUSES
+from inventory_db import create_inventory_table, CATEGORIES
+from sales_db import create_sales_table
+from archive_db import create_archive_catalog_table
+from analytics_db import DIMENSIONS, np, load_sales_columns, group_by_numpy, group_by_sql, _sort_key
+
+
+def populate(sales, customers, products):
+    rng = random.Random(42)
+    with get_pool().connection() as conn:
+        conn.executemany(
+            "INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [('F', 'L', f'user{i}', 'x', rng.choice([None] + list(range(14, 90))), 'n/a',
+              rng.choice(GENDERS), rng.choice(MARITAL_STATUSES), 0) for i in range(customers)],
+        )
+        conn.executemany(
+            "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, ?, ?, ?, ?)",
+            [(f'product{i}', rng.choice(CATEGORIES), round(rng.uniform(1, 500), 2), '', 0) for i in range(products)],
+        )
+        conn.executemany(
+            "INSERT INTO Sales (customer_id, product_id, quantity, total_price) VALUES (?, ?, ?, ?)",
+            ((rng.randint(1, customers), rng.randint(1, products), q, round(q * rng.uniform(1, 500), 2))
+             for q in (rng.randint(1, 5) for _ in range(sales))),
+        )
+        conn.commit()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    if np is None:
+        sys.exit("NumPy is not installed.")
+    sales = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    customers = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    products = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    create_customers_table()
+    create_inventory_table()
+    create_sales_table()
+    create_archive_catalog_table()
+    populate(sales, customers, products)
+    print(f"{sales} sales, {customers} customers, {products} products in {DATABASE}")
+
+    columns, load_ms = timed(load_sales_columns)
+    print(f"numpy load: {load_ms:.1f} ms")
+    for dimensions in [[d] for d in DIMENSIONS] + [['category', 'age_band', 'gender']]:
+        by_numpy, numpy_ms = timed(group_by_numpy, columns, dimensions)
+        by_sql, sql_ms = timed(group_by_sql, dimensions)
+        key = _sort_key(dimensions)
+        match = sorted(by_numpy, key=key) == sorted(by_sql, key=key)
+        print(f"{','.join(dimensions):>28}: numpy {numpy_ms:8.1f} ms (+ load), sql {sql_ms:8.1f} ms, "
+              f"{len(by_numpy)} groups, {'results match' if match else 'RESULTS DIFFER'}")
+
+
+if __name__ == '__main__':
+    main()
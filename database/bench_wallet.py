@@ -0,0 +1,97 @@
+"""
+Concurrency benchmark for customer wallet updates.
+
+Many threads charge the same customer in parallel, first through the old
+read-modify-write sequence (SELECT balance, add in Python, UPDATE) and then
+through adjust_wallet_balance. For each strategy it reports the expected and
+final balance, the number of lost updates and the throughput.
+
+Usage:
+    python bench_wallet.py [threads] [charges_per_thread]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['ECOMMERCE_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_wallet.db')
+
+from connection_db import DATABASE, get_pool
+from customers_db import create_customers_table, adjust_wallet_balance
+
+USERNAME = 'bench_user'
+
+
+def read_modify_write(username, amount):
+    conn = sqlite3.connect(DATABASE, timeout=30)
+    try:
+        balance = conn.execute("SELECT wallet_balance FROM Customers WHERE username = ?", (username,)).fetchone()[0]
+        conn.execute("UPDATE Customers SET wallet_balance = ? WHERE username = ?", (balance + amount, username))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def reset_wallet():
+    with get_pool().connection() as conn:
+        conn.execute("DELETE FROM Customers")
+        conn.execute(
+            "INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ('Bench', 'User', USERNAME, 'x', 30, 'n/a', 'O', 'Other', 0),
+        )
+        conn.commit()
+
+
+def final_balance():
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT wallet_balance FROM Customers WHERE username = ?", (USERNAME,)).fetchone()[0]
+
+
+def run(strategy, threads, charges):
+    reset_wallet()
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(charges):
+            try:
+                strategy(USERNAME, 1)
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    expected = threads * charges - len(errors)
+    balance = final_balance()
+    return {
+        "strategy": strategy.__name__,
+        "expected": expected,
+        "balance": balance,
+        "lost_updates": expected - balance,
+        "errors": len(errors),
+        "ops_per_sec": round(threads * charges / elapsed),
+    }
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    charges = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    create_customers_table()
+    print(f"{threads} threads x {charges} charges of 1 against {DATABASE}")
+    for strategy in (read_modify_write, adjust_wallet_balance):
+        result = run(strategy, threads, charges)
+        print("{strategy:>22}: balance {balance}/{expected}, lost updates {lost_updates}, "
+              "errors {errors}, {ops_per_sec} ops/s".format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecordCache:
+    """
+    A bounded, thread-safe LRU cache of row dicts with a time to live.
+
+    Records are stored under their primary key and can also be found through
+    one alternate key (an alias such as a username); both are dropped
+    together on eviction or invalidation. Callers get copies, so mutating a
+    returned record never changes the cached one.
+
+    A miss is filled with ``put(..., generation=...)`` using the generation
+    read before the database query. Any invalidation in between bumps the
+    generation and the possibly stale row is not stored.
+
+    Args:
+        max_size (int): Maximum number of records; the least recently used is evicted.
+        ttl (float): Seconds a record is served before it is read again; 0 disables the cache.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._aliases = {}
+        self.generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def _drop(self, key):
+        _, _, alias = self._records.pop(key)
+        if alias is not None and self._aliases.get(alias) == key:
+            del self._aliases[alias]
+
+    def get(self, key=None, alias=None):
+        """
+        Look a record up by primary key or by alias.
+
+        Returns:
+            dict or None: A copy of the record, or None on a miss.
+        """
+        with self._lock:
+            if key is None:
+                key = self._aliases.get(alias)
+            entry = self._records.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            record, stored_at, _ = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._drop(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._records.move_to_end(key)
+            self._stats["hits"] += 1
+            return dict(record)
+
+    def put(self, key, record, alias=None, generation=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._records:
+                self._drop(key)
+            self._records[key] = (dict(record), time.monotonic(), alias)
+            if alias is not None:
+                self._aliases[alias] = key
+            while len(self._records) > self.max_size:
+                self._drop(next(iter(self._records)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key=None, alias=None):
+        """
+        Drop a record, found by primary key or alias, and fence off in-flight fills.
+        """
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                key = self._aliases.pop(alias, None)
+            if key in self._records:
+                self._drop(key)
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._records.clear()
+            self._aliases.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"size": len(self._records), "max_size": self.max_size, "ttl": self.ttl})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else None
+        return stats
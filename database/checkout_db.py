@@ -0,0 +1,191 @@
+from connection_db import get_connection
+from inventory_db import decrement_stock_batch, StockError
+from customers_db import invalidate_customer
+
+MAX_CART_LINES = 500
+
+
+class CheckoutError(Exception):
+    """
+    Raised when a checkout cannot be completed; ``status`` is the HTTP status to report.
+
+    For cart checkouts ``errors`` lists the offending lines, one dict per line.
+    """
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors or []
+
+    def to_dict(self):
+        body = {"error": str(self)}
+        if self.errors:
+            body["errors"] = self.errors
+        return body
+
+
+def _valid_quantity(quantity):
+    return isinstance(quantity, int) and not isinstance(quantity, bool) and quantity >= 1
+
+
+def checkout(customer_id, product_id, quantity=1):
+    """
+    Sell ``quantity`` units of a product to a customer in a single transaction.
+
+    The stock decrement and the wallet debit are guarded UPDATEs, so the balance
+    and stock checks happen in the same statements that apply them. The sale row
+    comes back from its INSERT via RETURNING. Everything runs under BEGIN
+    IMMEDIATE on one pooled connection and is rolled back as a whole on failure.
+    The price is taken from Inventory, not from the client.
+
+    Args:
+        customer_id (int): ID of the buying customer.
+        product_id (int): ID of the product being bought.
+        quantity (int): Number of units, at least 1.
+
+    Returns:
+        dict: The created Sales row.
+
+    Raises:
+        CheckoutError: If the input is invalid, the customer or product does not
+            exist, the product is out of stock or the balance is insufficient.
+    """
+    if not _valid_quantity(quantity):
+        raise CheckoutError("Quantity must be a positive integer")
+
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            product = conn.execute(
+                "UPDATE Inventory SET stock_count = stock_count - ? WHERE product_id = ? AND stock_count >= ? RETURNING price",
+                (quantity, product_id, quantity),
+            ).fetchone()
+            if product is None:
+                if conn.execute("SELECT 1 FROM Inventory WHERE product_id = ?", (product_id,)).fetchone() is None:
+                    raise CheckoutError("Product not found", 404)
+                raise CheckoutError("Product is out of stock", 409)
+
+            total_price = round(product["price"] * quantity, 2)
+            customer = conn.execute(
+                "UPDATE Customers SET wallet_balance = wallet_balance - ? WHERE customer_id = ? AND wallet_balance >= ? RETURNING wallet_balance",
+                (total_price, customer_id, total_price),
+            ).fetchone()
+            if customer is None:
+                if conn.execute("SELECT 1 FROM Customers WHERE customer_id = ?", (customer_id,)).fetchone() is None:
+                    raise CheckoutError("Customer not found", 404)
+                raise CheckoutError("Insufficient wallet balance", 402)
+
+            sale = conn.execute(
+                "INSERT INTO Sales (customer_id, product_id, quantity, total_price) VALUES (?, ?, ?, ?) RETURNING *",
+                (customer_id, product_id, quantity, total_price),
+            ).fetchone()
+            sale = dict(sale)
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    invalidate_customer(customer_id)
+    return sale
+
+
+def checkout_cart(customer_id, items):
+    """
+    Check out a multi-line cart in a single transaction.
+
+    All lines are validated and priced together against one read of Inventory
+    taken under the write lock. If any line is invalid, unknown or short on
+    stock, nothing is written and every failing line is reported. Otherwise the
+    wallet is debited once for the cart total, stock is decremented for all
+    products in one statement and one Sales row is inserted per line.
+
+    Args:
+        customer_id (int): ID of the buying customer.
+        items (list): Dicts with ``product_id`` and ``quantity``.
+
+    Returns:
+        dict: The customer ID, cart total, new wallet balance and created sales.
+
+    Raises:
+        CheckoutError: With per-line ``errors`` when lines are rejected, or a
+            plain message when the cart, customer or balance is at fault.
+    """
+    if not isinstance(items, list) or not items:
+        raise CheckoutError("Cart must contain at least one item")
+    if len(items) > MAX_CART_LINES:
+        raise CheckoutError(f"Cart cannot contain more than {MAX_CART_LINES} items")
+
+    errors = []
+    for line, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("product_id"), int):
+            errors.append({"line": line, "error": "product_id must be an integer"})
+        elif not _valid_quantity(item.get("quantity", 1)):
+            errors.append({"line": line, "product_id": item["product_id"], "error": "Quantity must be a positive integer"})
+    if errors:
+        raise CheckoutError("Cart contains invalid items", 400, errors)
+
+    lines = [(item["product_id"], item.get("quantity", 1)) for item in items]
+    requested = {}
+    for product_id, quantity in lines:
+        requested[product_id] = requested.get(product_id, 0) + quantity
+
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ", ".join("?" * len(requested))
+            products = {
+                row["product_id"]: row
+                for row in conn.execute(
+                    f"SELECT product_id, price, stock_count FROM Inventory WHERE product_id IN ({placeholders})",
+                    list(requested),
+                )
+            }
+            for line, (product_id, quantity) in enumerate(lines):
+                product = products.get(product_id)
+                if product is None:
+                    errors.append({"line": line, "product_id": product_id, "error": "Product not found"})
+                elif product["stock_count"] < requested[product_id]:
+                    errors.append({"line": line, "product_id": product_id, "error": "Product is out of stock", "available": product["stock_count"]})
+            if errors:
+                status = 404 if all(e["error"] == "Product not found" for e in errors) else 409
+                raise CheckoutError("Some cart items cannot be purchased", status, errors)
+
+            prices = [round(products[product_id]["price"] * quantity, 2) for product_id, quantity in lines]
+            total_price = round(sum(prices), 2)
+            customer = conn.execute(
+                "UPDATE Customers SET wallet_balance = wallet_balance - ? WHERE customer_id = ? AND wallet_balance >= ? RETURNING wallet_balance",
+                (total_price, customer_id, total_price),
+            ).fetchone()
+            if customer is None:
+                if conn.execute("SELECT 1 FROM Customers WHERE customer_id = ?", (customer_id,)).fetchone() is None:
+                    raise CheckoutError("Customer not found", 404)
+                raise CheckoutError("Insufficient wallet balance", 402)
+
+            # Stock was checked above while holding the write lock, so the guard
+            # only trips if that invariant is ever broken.
+            try:
+                decrement_stock_batch(requested)
+            except StockError as e:
+                raise CheckoutError(str(e), e.status)
+
+            values = ", ".join(["(?, ?, ?, ?)"] * len(lines))
+            params = []
+            for (product_id, quantity), price in zip(lines, prices):
+                params.extend((customer_id, product_id, quantity, price))
+            sales = [
+                dict(row)
+                for row in conn.execute(
+                    f"INSERT INTO Sales (customer_id, product_id, quantity, total_price) VALUES {values} RETURNING *",
+                    params,
+                ).fetchall()
+            ]
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    invalidate_customer(customer_id)
+    return {
+        "customer_id": customer_id,
+        "total_price": total_price,
+        "wallet_balance": customer["wallet_balance"],
+        "sales": sales,
+    }
@@ -0,0 +1,409 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DATABASE = os.environ.get('ECOMMERCE_DB_PATH', 'ecommerce.db')
+POOL_SIZE = int(os.environ.get('ECOMMERCE_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('ECOMMERCE_DB_POOL_TIMEOUT', '5.0'))
+LEAK_THRESHOLD = float(os.environ.get('ECOMMERCE_DB_LEAK_THRESHOLD', '30.0'))
+PRAGMA_PROFILE = os.environ.get('ECOMMERCE_DB_PROFILE', 'durable')
+PRAGMA_OVERRIDES = os.environ.get('ECOMMERCE_DB_PRAGMAS', '')
+
+# Applied in order on every new connection. busy_timeout goes first so that
+# switching journal_mode waits for a concurrent writer instead of failing.
+# "durable" keeps fsync on every commit; "fast" trades the last transactions
+# before a power loss for cheaper commits and a larger in-memory working set.
+PRAGMA_PROFILES = {
+    "durable": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "fast": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+TUNABLE_PRAGMAS = tuple(PRAGMA_PROFILES["durable"])
+_PRAGMA_VALUE = re.compile(r'^-?[A-Za-z0-9_]+$')
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """
+    Raised when no pooled connection becomes available within the pool timeout.
+    """
+
+
+def parse_pragmas(text):
+    """
+    Parse a ``name=value;name=value`` override string into a PRAGMA dict.
+
+    Args:
+        text (str): Overrides, e.g. ``"synchronous=OFF;cache_size=-32000"``.
+
+    Returns:
+        dict: The parsed overrides.
+
+    Raises:
+        ValueError: If a name is not a tunable PRAGMA or a value is malformed.
+    """
+    pragmas = {}
+    for item in filter(None, (part.strip() for part in text.split(';'))):
+        name, _, value = item.partition('=')
+        name, value = name.strip().lower(), value.strip()
+        if name not in TUNABLE_PRAGMAS:
+            raise ValueError(f"Unsupported PRAGMA override: {name}")
+        if not _PRAGMA_VALUE.match(value):
+            raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+        pragmas[name] = value
+    return pragmas
+
+
+def resolve_pragmas(profile=PRAGMA_PROFILE, overrides=PRAGMA_OVERRIDES):
+    """
+    Build the PRAGMA settings for a named profile plus optional overrides.
+
+    Args:
+        profile (str): One of the keys of ``PRAGMA_PROFILES``.
+        overrides (str or dict): Extra settings that win over the profile.
+
+    Returns:
+        dict: Ordered PRAGMA name to value mapping.
+    """
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown PRAGMA profile: {profile}")
+    pragmas = dict(PRAGMA_PROFILES[profile])
+    if isinstance(overrides, str):
+        overrides = parse_pragmas(overrides)
+    pragmas.update(overrides or {})
+    return pragmas
+
+
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def read_pragmas(conn, names=None):
+    """
+    Read back the effective value of each tunable PRAGMA on a connection.
+
+    Args:
+        conn (sqlite3.Connection): The connection to inspect.
+        names (iterable, optional): PRAGMA names, defaults to all tunables.
+
+    Returns:
+        dict: PRAGMA name to the value SQLite reports.
+    """
+    names = names or TUNABLE_PRAGMAS
+    return {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in names}
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections shared by the *_db.py modules.
+
+    Connections are opened lazily up to ``max_size`` and handed back to an idle
+    stack on release, so the file open, schema parse and page cache of a
+    connection are paid once instead of on every query. A thread that already
+    holds a connection gets the same one back from nested ``connection()``
+    calls, which keeps helpers such as ``get_customer_by_id`` from taking a
+    second slot. The pool is reset when it is used from a forked worker.
+
+    Args:
+        database (str): Path of the SQLite database file.
+        max_size (int): Maximum number of open connections per process.
+        timeout (float): Seconds to wait for a free connection before failing.
+        leak_threshold (float): Seconds after which a checked out connection is
+            reported as leaked.
+        profile (str): Name of the PRAGMA profile applied to new connections.
+        pragmas (str or dict, optional): Overrides on top of the profile.
+    """
+
+    def __init__(self, database=DATABASE, max_size=POOL_SIZE, timeout=POOL_TIMEOUT, leak_threshold=LEAK_THRESHOLD,
+                 profile=PRAGMA_PROFILE, pragmas=PRAGMA_OVERRIDES):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.leak_threshold = leak_threshold
+        self.profile = profile
+        self.pragmas = resolve_pragmas(profile, pragmas)
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self._checked_out = {}
+        self._local = threading.local()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "leaks": 0,
+            "discarded": 0,
+            "peak_in_use": 0,
+        }
+
+    def _check_pid(self):
+        # Connections must never cross a fork; the child starts from an empty pool.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            apply_pragmas(conn, self.pragmas)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def acquire(self):
+        """
+        Check a connection out of the pool, opening a new one if allowed.
+
+        Returns:
+            sqlite3.Connection: A connection owned by the caller until released.
+
+        Raises:
+            PoolTimeout: If the pool stays exhausted for ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._check_pid()
+            conn = None
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._stats["reused"] += 1
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    now = time.monotonic()
+                    self._report_leaks(c for c in self._checked_out.values() if now - c["acquired_at"] >= self.leak_threshold)
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["created"] += 1
+
+        with self._cond:
+            self._checked_out[id(conn)] = {
+                "connection": conn,
+                "thread": threading.current_thread().name,
+                "acquired_at": time.monotonic(),
+                "stack": traceback.format_stack(limit=8)[:-1],
+                "leak_reported": False,
+            }
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], len(self._checked_out))
+        return conn
+
+    def release(self, conn):
+        """
+        Return a connection to the pool.
+
+        Any transaction left open by the caller is rolled back so the next user
+        starts clean. Connections that fail the rollback are closed and dropped.
+
+        Args:
+            conn (sqlite3.Connection): A connection obtained from ``acquire``.
+        """
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            checkout = self._checked_out.pop(id(conn), None)
+        if checkout is None:
+            logger.warning("Released a connection that is not checked out of the pool")
+            return
+
+        healthy = True
+        try:
+            if conn.in_transaction:
+                logger.warning("Connection returned with an open transaction; rolling back")
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                self._stats["discarded"] += 1
+            self._cond.notify()
+        if not healthy:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager yielding a pooled connection.
+
+        Nested use on the same thread yields the connection already held. The
+        outermost block rolls back on error and always returns the connection
+        to the pool. Commits stay explicit, as in the rest of the data layer.
+
+        Yields:
+            sqlite3.Connection: The connection, with ``sqlite3.Row`` rows.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None and self._pid == os.getpid():
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    def check_leaks(self, threshold=None):
+        """
+        Report connections checked out for longer than the leak threshold.
+
+        Args:
+            threshold (float, optional): Override for ``leak_threshold`` in seconds.
+
+        Returns:
+            list: One dict per suspected leak with the holding thread, age and stack.
+        """
+        threshold = self.leak_threshold if threshold is None else threshold
+        now = time.monotonic()
+        with self._cond:
+            suspects = [c for c in self._checked_out.values() if now - c["acquired_at"] >= threshold]
+        self._report_leaks(suspects)
+        return [
+            {
+                "thread": c["thread"],
+                "held_for": round(now - c["acquired_at"], 3),
+                "stack": "".join(c["stack"]),
+            }
+            for c in suspects
+        ]
+
+    def _report_leaks(self, checkouts):
+        # Each checkout is counted and logged once, when it is first seen
+        # past the threshold, however often it is inspected afterwards.
+        now = time.monotonic()
+        with self._cond:
+            new = [c for c in checkouts if not c["leak_reported"]]
+            for c in new:
+                c["leak_reported"] = True
+                self._stats["leaks"] += 1
+        for c in new:
+            logger.warning(
+                "Connection held by thread %s for %.1fs, acquired at:\n%s",
+                c["thread"], now - c["acquired_at"], "".join(c["stack"]),
+            )
+
+    def stats(self):
+        """
+        Snapshot of the pool counters.
+
+        Returns:
+            dict: Sizes (open, idle, in use) and lifetime counters.
+        """
+        with self._cond:
+            self._check_pid()
+            stats = dict(self._stats)
+            stats.update({
+                "database": self.database,
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": len(self._checked_out),
+            })
+        return stats
+
+    def settings(self):
+        """
+        Effective PRAGMA settings as reported by a pooled connection.
+
+        Returns:
+            dict: The profile name, the requested values and the effective ones.
+        """
+        with self.connection() as conn:
+            effective = read_pragmas(conn, self.pragmas.keys())
+        return {"profile": self.profile, "requested": dict(self.pragmas), "effective": effective}
+
+    def close_all(self):
+        """
+        Close every idle connection. Checked out connections are left to their owners.
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def get_connection():
+    return get_pool().connection()
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def pool_settings():
+    return get_pool().settings()
@@ -1,87 +1,122 @@
-import sqlite3
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash
+from connection_db import get_connection
+from cache_db import RecordCache
+
+GENDERS = ('M', 'F', 'O')
+MARITAL_STATUSES = ('Single', 'Married', 'Other')
+BULK_CHUNK_SIZE = 1000
+HASH_WORKERS = int(os.environ.get('ECOMMERCE_HASH_WORKERS', os.cpu_count() or 1))
+# Below this many passwords the process pool start-up costs more than it saves.
+HASH_POOL_THRESHOLD = 16
+CUSTOMER_CACHE_SIZE = int(os.environ.get('ECOMMERCE_CUSTOMER_CACHE_SIZE', 1024))
+# Bounds how long a change made outside this process (another worker, the
+# sqlite3 shell) can go unseen; changes made here invalidate immediately.
+CUSTOMER_CACHE_TTL = float(os.environ.get('ECOMMERCE_CUSTOMER_CACHE_TTL', 30))
+# Largest single charge or deduction; also keeps balances far from float overflow.
+MAX_WALLET_AMOUNT = float(os.environ.get('ECOMMERCE_MAX_WALLET_AMOUNT', 1_000_000))
+
+# What generate_password_hash produces: "<method>$<salt>$<hex digest>".
+PASSWORD_HASH_RE = re.compile(r'^(pbkdf2|scrypt):[^$]+\$[^$]+\$[0-9a-f]+$')
+
+# Customer records by customer_id, also reachable by username.
+customer_cache = RecordCache(CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL)
+
+# Hashing pools by worker count, started on first use and kept for later imports.
+_hash_pools = {}
+_hash_pools_lock = threading.Lock()
+
+
+class WalletError(Exception):
+    """
+    Raised when a wallet adjustment is rejected; ``status`` is the HTTP status to report.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
 
-def connect_to_db():
-    conn = sqlite3.connect('ecommerce.db')
-    return conn
 
 def create_customers_table():
     try:
-        conn = connect_to_db()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS Customers (
-            customer_id INTEGER PRIMARY KEY NOT NULL,
-            first_name VARCHAR(255) NOT NULL,
-            last_name VARCHAR(255) NOT NULL,
-            username VARCHAR(100) NOT NULL UNIQUE,
-            password VARCHAR(255) NOT NULL,
-            age INTEGER,
-            address TEXT,
-            gender ENUM('M', 'F', 'O'),
-            marital_status ENUM('Single', 'Married', 'Other'),
-            wallet_balance DECIMAL(10, 2) DEFAULT 0.0,
-            );
-        ''')
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS Customers (
+                customer_id INTEGER PRIMARY KEY NOT NULL,
+                first_name VARCHAR(255) NOT NULL,
+                last_name VARCHAR(255) NOT NULL,
+                username VARCHAR(100) NOT NULL UNIQUE,
+                password VARCHAR(255) NOT NULL,
+                age INTEGER,
+                address TEXT,
+                gender VARCHAR(1) CHECK (gender IN ('M', 'F', 'O')),
+                marital_status VARCHAR(10) CHECK (marital_status IN ('Single', 'Married', 'Other')),
+                wallet_balance DECIMAL(10, 2) DEFAULT 0.0
+                );
+            ''')
+            conn.commit()
         print('Customers table created successfully.')
     except:
         print('An error occured while creating the customers table.')
-    finally:
-        conn.close()
 
-def insert_customer(customer):
+def insert_customer(customer, prehashed=False):
+    """
+    Insert one customer. ``prehashed`` stores ``customer['password']`` as an
+    existing hash, for internal migrations only; client input is always hashed.
+    """
     inserted_customer = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (customer['first_name'], customer['last_name'], customer['username'], customer['password'], customer['age'], customer['address'], customer['gender'], customer['marital_status'], customer['wallet_balance']) )
-        conn.commit()
-        inserted_customer = get_customer_by_id(cur.lastrowid)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) RETURNING *", (customer['first_name'], customer['last_name'], customer['username'], stored_password(customer['password'], prehashed), customer['age'], customer['address'], customer['gender'], customer['marital_status'], customer['wallet_balance']) )
+            inserted_customer = dict(cur.fetchone())
+            conn.commit()
     except:
         print("Insertion failed.")
-        conn().rollback()
-    finally:
-        conn.close()
     return inserted_customer
 
 def update_customer(customer):
     updated_customer = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("UPDATE Customers SET first_name = ?, last_name = ?, username = ?, password=?, age = ?, address = ?, gender = ?, marital_status = ?, wallet_balance = ? WHERE customer_id=?", (customer['first_name'], customer['last_name'], customer['username'], customer['password'], customer['age'], customer['address'], customer['gender'], customer['marital_status'], customer['wallet_balance'], customer["user_id"],))
-        conn.commit()
-        updated_customer = get_customer_by_id(customer["customer_id"])
+        with get_connection() as conn:
+            cur = conn.cursor()
+            # A record read back carries its stored hash, which is kept; any other value is a new password.
+            cur.execute("UPDATE Customers SET first_name = ?, last_name = ?, username = ?, password = CASE WHEN password = ? THEN password ELSE ? END, age = ?, address = ?, gender = ?, marital_status = ?, wallet_balance = ? WHERE customer_id=? RETURNING *", (customer['first_name'], customer['last_name'], customer['username'], customer['password'], stored_password(customer['password']), customer['age'], customer['address'], customer['gender'], customer['marital_status'], customer['wallet_balance'], customer["customer_id"],))
+            row = cur.fetchone()
+            conn.commit()
+            updated_customer = dict(row) if row else {}
     except:
         print("Update failed.")
-        conn.rollback()
         updated_customer = {}
-    finally:
-        conn.close() 
+    invalidate_customer(customer.get("customer_id"))
     return updated_customer
 
 def delete_customer(customer_id):
     message = {}
     try:
-        conn = connect_to_db()
-        conn.execute("DELETE from Customers WHERE customer_id = ?",(customer_id,))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("DELETE from Customers WHERE customer_id = ?",(customer_id,))
+            conn.commit()
+        invalidate_customer(customer_id)
         message["status"] = "Customer deleted successfully"
     except:
         print("Deletion failed.")
-        conn.rollback()
         message["status"] = "Cannot delete customer"
-    finally:
-        conn.close()
     return message
 
-def get_customers():
+def get_customers(after=0, limit=-1):
     customers = []
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Customers")
-        rows = cur.fetchall()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Customers WHERE customer_id > ? ORDER BY customer_id LIMIT ?", (after, limit))
+            rows = cur.fetchall()
         for i in rows:
             customer = {}
             customer["customer_id"] = i["customer_id"]
@@ -100,14 +135,38 @@ def get_customers():
         customers = []
     return customers
 
+def invalidate_customer(customer_id=None, username=None):
+    """
+    Drop a customer from the record cache after a committed write.
+
+    Call it after the commit, not before: a reader could otherwise cache the
+    old row again in between.
+    """
+    if customer_id is not None:
+        customer_cache.invalidate(key=int(customer_id))
+    if username is not None:
+        customer_cache.invalidate(alias=username)
+
+def customer_cache_stats():
+    return customer_cache.stats()
+
 def get_customer_by_id(customer_id):
+    # Routes may pass the id as a string; the cache is keyed by int.
+    try:
+        customer_id = int(customer_id)
+    except (TypeError, ValueError):
+        print(f"Failed to fetch customer with id: {customer_id}")
+        return {}
+    cached = customer_cache.get(key=customer_id)
+    if cached is not None:
+        return cached
     customer = {}
+    generation = customer_cache.generation
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Customers WHERE customer_id = ?",(customer_id,))
-        row = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Customers WHERE customer_id = ?",(customer_id,))
+            row = cur.fetchone()
         customer["customer_id"] = row["customer_id"]
         customer["first_name"] = row["first_name"]
         customer["last_name"] = row["last_name"]
@@ -118,19 +177,23 @@ def get_customer_by_id(customer_id):
         customer["gender"] = row["gender"]
         customer["marital_status"] = row["marital_status"]
         customer["wallet_balance"] = row["wallet_balance"]
+        customer_cache.put(customer["customer_id"], customer, customer["username"], generation)
     except:
         print(f"Failed to fetch customer with id: {customer_id}")
         customer = {}
     return customer
 
 def get_customer_by_username(customer_username):
+    cached = customer_cache.get(alias=customer_username)
+    if cached is not None:
+        return cached
     customer = {}
+    generation = customer_cache.generation
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Customers WHERE username = ?",(customer_username,))
-        row = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Customers WHERE username = ?",(customer_username,))
+            row = cur.fetchone()
         customer["customer_id"] = row["customer_id"]
         customer["first_name"] = row["first_name"]
         customer["last_name"] = row["last_name"]
@@ -141,25 +204,236 @@ def get_customer_by_username(customer_username):
         customer["gender"] = row["gender"]
         customer["marital_status"] = row["marital_status"]
         customer["wallet_balance"] = row["wallet_balance"]
+        customer_cache.put(customer["customer_id"], customer, customer["username"], generation)
     except:
         print(f"Failed to fetch customer with username: {customer_username}")
         customer = {}
     return customer
 
+def adjust_wallet_balance(username, amount):
+    """
+    Add ``amount`` (negative to deduct) to a customer's wallet in one statement.
+
+    The arithmetic and the overdraft check run inside a single conditional
+    UPDATE, so concurrent charges and deductions can never overwrite each other
+    and the balance never goes below zero.
+
+    Joins the caller's transaction when one is open on the pooled connection:
+    nothing is committed or rolled back here, a rejected adjustment leaves the
+    caller's earlier work in place, and the caller invalidates the customer
+    after its own commit. Otherwise the change is committed on its own.
+
+    Returns:
+        dict: The updated customer row.
+
+    Raises:
+        WalletError: 400 if the amount is not a finite number within
+            MAX_WALLET_AMOUNT, 404 if the customer does not exist, 402 if the
+            deduction would overdraw the wallet.
+    """
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise WalletError("Amount must be a number")
+    if not math.isfinite(amount) or abs(amount) > MAX_WALLET_AMOUNT:
+        raise WalletError(f"Amount must be a finite number of at most {MAX_WALLET_AMOUNT:g}")
+    with get_connection() as conn:
+        nested = conn.in_transaction
+        row = conn.execute(
+            "UPDATE Customers SET wallet_balance = wallet_balance + ? WHERE username = ? AND wallet_balance + ? >= 0 RETURNING *",
+            (amount, username, amount),
+        ).fetchone()
+        # A guard that matched no row changed nothing, so a caller's
+        # transaction is left as it was.
+        if row is None:
+            if not nested:
+                conn.rollback()
+            if conn.execute("SELECT 1 FROM Customers WHERE username = ?", (username,)).fetchone() is None:
+                raise WalletError("Customer not found", 404)
+            raise WalletError("Insufficient wallet balance", 402)
+        if nested:
+            return dict(row)
+        conn.commit()
+    invalidate_customer(row["customer_id"])
+    return dict(row)
+
 def update_customer_wallet(username, amount):
     updated_customer = {}
-    customer = get_customer_by_username(username)
-    balance = customer["wallet_balance"] + amount
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("UPDATE Customers SET wallet_balance = ? WHERE username = ?", (balance, username))
-        conn.commit()
-        updated_customer = get_customer_by_id(customer["customer_id"])
+        updated_customer = adjust_wallet_balance(username, amount)
+    except WalletError as e:
+        print(f"Wallet update rejected: {e}")
     except:
         print("Wallet update failed.")
-        conn.rollback()
-        updated_customer = {}
-    finally:
-        conn.close()
-    return updated_customer
\ No newline at end of file
+    return updated_customer
+
+def hash_password(password):
+    return generate_password_hash(password)
+
+def stored_password(password, prehashed=False):
+    """
+    Hash a password for storage.
+
+    Anything a client sends is hashed, even if it looks like a hash, so a
+    client cannot plant a hash it computed itself. Only internal migrations
+    of rows that already hold a hash pass ``prehashed=True``.
+    """
+    if prehashed:
+        if not PASSWORD_HASH_RE.match(password):
+            raise ValueError("password is not a password hash")
+        return password
+    return hash_password(password)
+
+def _hash_pool(workers):
+    with _hash_pools_lock:
+        pool = _hash_pools.get(workers)
+        if pool is None:
+            pool = _hash_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+def hash_passwords(passwords, workers=HASH_WORKERS):
+    if len(passwords) < HASH_POOL_THRESHOLD or workers <= 1:
+        return [hash_password(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    pool = _hash_pool(workers)
+    try:
+        return list(pool.map(hash_password, passwords, chunksize=chunksize))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and finish this batch here.
+        with _hash_pools_lock:
+            if _hash_pools.get(workers) is pool:
+                del _hash_pools[workers]
+        return [hash_password(p) for p in passwords]
+
+def validate_customer(customer):
+    """
+    Check and normalize one customer for bulk registration.
+
+    Returns:
+        tuple: (normalized dict or None, list of error messages).
+    """
+    if not isinstance(customer, dict):
+        return None, ["Row must be an object"]
+    errors = []
+    for field in ('first_name', 'last_name', 'username', 'password'):
+        value = customer.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f"{field} is required")
+    age = customer.get('age')
+    if age is not None and (not isinstance(age, int) or isinstance(age, bool) or age < 0):
+        errors.append("age must be a non-negative integer")
+    if customer.get('gender') not in (None,) + GENDERS:
+        errors.append(f"gender must be one of: {', '.join(GENDERS)}")
+    if customer.get('marital_status') not in (None,) + MARITAL_STATUSES:
+        errors.append(f"marital_status must be one of: {', '.join(MARITAL_STATUSES)}")
+    wallet_balance = customer.get('wallet_balance', 0)
+    if not isinstance(wallet_balance, (int, float)) or isinstance(wallet_balance, bool) or wallet_balance < 0:
+        errors.append("wallet_balance must be a non-negative number")
+    if errors:
+        return None, errors
+    normalized = dict(customer)
+    normalized['username'] = customer['username'].strip()
+    normalized['wallet_balance'] = wallet_balance
+    return normalized, []
+
+def _existing_usernames(conn, usernames):
+    existing = set()
+    usernames = list(usernames)
+    for offset in range(0, len(usernames), 500):
+        part = usernames[offset:offset + 500]
+        placeholders = ", ".join("?" * len(part))
+        rows = conn.execute(f"SELECT username FROM Customers WHERE username IN ({placeholders})", part)
+        existing.update(row["username"] for row in rows)
+    return existing
+
+def import_customers(customers, chunk_size=BULK_CHUNK_SIZE, workers=HASH_WORKERS):
+    """
+    Register many customers at once.
+
+    Rows are validated, usernames repeated within the batch or already taken
+    are reported as duplicates, and the remaining passwords are hashed before
+    any write lock is taken, in a process pool kept across calls once a batch
+    reaches HASH_POOL_THRESHOLD. Inserts then run with executemany in chunked
+    BEGIN IMMEDIATE transactions, re-checking usernames under the lock, so
+    one bad row or chunk never aborts the whole batch.
+
+    Returns:
+        dict: ``results`` with one entry per input row and a ``summary``.
+    """
+    start = time.perf_counter()
+    results = [None] * len(customers)
+    candidates = []
+    seen = set()
+    for index, customer in enumerate(customers):
+        normalized, errors = validate_customer(customer)
+        if errors:
+            results[index] = {"row": index, "status": "invalid", "errors": errors}
+        elif normalized['username'] in seen:
+            results[index] = {"row": index, "status": "duplicate", "username": normalized['username']}
+        else:
+            seen.add(normalized['username'])
+            candidates.append((index, normalized))
+
+    with get_connection() as conn:
+        taken = _existing_usernames(conn, seen)
+    pending = []
+    for index, customer in candidates:
+        if customer['username'] in taken:
+            results[index] = {"row": index, "status": "duplicate", "username": customer['username']}
+        else:
+            pending.append((index, customer))
+
+    hash_start = time.perf_counter()
+    hashes = hash_passwords([customer['password'] for _, customer in pending], workers)
+    hash_elapsed = time.perf_counter() - hash_start
+
+    with get_connection() as conn:
+        for offset in range(0, len(pending), chunk_size):
+            chunk = list(zip(pending[offset:offset + chunk_size], hashes[offset:offset + chunk_size]))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                taken = _existing_usernames(conn, (customer['username'] for (_, customer), _ in chunk))
+                rows = []
+                for (index, customer), hashed in chunk:
+                    if customer['username'] in taken:
+                        results[index] = {"row": index, "status": "duplicate", "username": customer['username']}
+                    else:
+                        rows.append((index, customer, hashed))
+                conn.executemany(
+                    "INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(c['first_name'], c['last_name'], c['username'], hashed, c.get('age'), c.get('address'), c.get('gender'), c.get('marital_status'), c['wallet_balance']) for _, c, hashed in rows],
+                )
+                ids = {}
+                usernames = [c['username'] for _, c, _ in rows]
+                for part in range(0, len(usernames), 500):
+                    names = usernames[part:part + 500]
+                    placeholders = ", ".join("?" * len(names))
+                    for row in conn.execute(f"SELECT customer_id, username FROM Customers WHERE username IN ({placeholders})", names):
+                        ids[row["username"]] = row["customer_id"]
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                for (index, _), _ in chunk:
+                    # Rows already reported as duplicates keep that status.
+                    if results[index] is None:
+                        results[index] = {"row": index, "status": "failed", "errors": [str(e)]}
+                continue
+            for index, customer, _ in rows:
+                results[index] = {"row": index, "status": "inserted", "customer_id": ids[customer['username']], "username": customer['username']}
+
+    elapsed = time.perf_counter() - start
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {
+        "results": results,
+        "summary": {
+            "received": len(customers),
+            "inserted": counts.get("inserted", 0),
+            "duplicates": counts.get("duplicate", 0),
+            "invalid": counts.get("invalid", 0),
+            "failed": counts.get("failed", 0),
+            "hashing_ms": round(hash_elapsed * 1000, 2),
+            "elapsed_ms": round(elapsed * 1000, 2),
+        },
+    }
@@ -1,572 +1,769 @@
 from auth_db import create_users_table
-from customers_db import create_customers_table
-from inventory_db import create_inventory_table
-from reviews_db import create_reviews_table, create_moderation_table
+from customers_db import create_customers_table, adjust_wallet_balance, MAX_WALLET_AMOUNT, hash_password, import_customers, WalletError, get_customer_by_id, get_customer_by_username, invalidate_customer, customer_cache_stats
+from inventory_db import create_inventory_table, create_inventory_search_table, get_catalog_snapshot, import_products, get_stock_levels, parse_products_csv, search_products, parse_catalog_args, query_products, explain_catalog_query
+from reviews_db import create_reviews_table, create_moderation_table, create_rating_stats_table, get_product_rating_stats, rebuild_rating_stats, moderate_reviews, get_moderation_queue
 from sales_db import create_sales_table
-from wishlist_db import create_wishlist_table
+from analytics_db import sales_breakdown
+from rollups_db import create_sales_rollup_tables, get_product_sales_report, get_category_sales_report, rebuild_sales_rollups, parse_date_range
+from archive_db import create_archive_catalog_table, archive_sales, archived_until, customer_sales_history, ARCHIVE_HORIZON_DAYS
+from wishlist_db import create_wishlist_table, create_wishlist_sweep_table, sweep_abandoned_wishlists, abandoned_wishlist_notification
+from migrations_db import run_migrations
+from versions_db import create_table_versions_table, get_table_versions
+from maintenance_db import enable_incremental_vacuum, run_maintenance, backup_database, list_backups, start_maintenance, TASKS, FREQUENT_TASKS, BACKUP_DIR, BACKUP_MAX_STEP_SLEEP
+from outbox_db import create_outbox_table, enqueue_notifications, outbox_stats, start_dispatcher, OUTBOX_SINK
+from checkout_db import checkout, checkout_cart, CheckoutError
+from pagination_db import DEFAULT_PAGE_SIZE, Page, parse_page_args, page_response
+from streaming_db import stream_query
 
 def initialize_database():
+    enable_incremental_vacuum()
     create_customers_table()
     create_inventory_table()
+    create_inventory_search_table()
     create_reviews_table()
     create_moderation_table()
+    create_rating_stats_table()
     create_sales_table()
+    create_sales_rollup_tables()
+    create_archive_catalog_table()
     create_wishlist_table()
+    create_wishlist_sweep_table()
     create_users_table()
-
-from flask import Flask, request, jsonify
+    create_outbox_table()
+    create_table_versions_table()
+    run_migrations()
+
+from flask import Flask, Response, request, jsonify, make_response
+import functools
+import hashlib
+import math
+import secrets
 import sqlite3
+from datetime import date
 from werkzeug.security import generate_password_hash, check_password_hash
+from connection_db import get_connection, get_pool, pool_stats, pool_settings
 
 app = Flask(__name__)
-
-DATABASE = 'ecommerce.db'
-
-def connect_to_db():
-    return sqlite3.connect(DATABASE)
+maintenance_scheduler = None
+
+def stream_response(sql, params=()):
+    chunks, content_type = stream_query(sql, params, request.args['stream'])
+    return Response(chunks, status=200, content_type=content_type)
+
+# Changes on every start, so a database restored under an older counter
+# value can never revalidate a body cached from before the restore.
+ETAG_EPOCH = secrets.token_hex(4)
+
+def table_etag(tables):
+    versions = get_table_versions()
+    key = f"{ETAG_EPOCH}|{request.full_path}|" + ",".join(f"{table}={versions.get(table, 0)}" for table in tables)
+    return hashlib.sha1(key.encode()).hexdigest()[:24]
+
+def etag_for(*tables):
+    """
+    Give a GET route a strong ETag from the change counters of the tables it reads.
+
+    A request whose If-None-Match holds the current tag gets an empty 304
+    after one TableVersions lookup, without running the route. The tag is
+    computed before the body is read, so a concurrent write can only give
+    a newer body an older tag, which the next request then misses.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = table_etag(tables)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
 
 @app.route('/customers', methods=['POST'])
 def api_insert_customer():
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (data['first_name'], data['last_name'], data['username'], data['password'], data['age'], data['address'], data['gender'], data['marital_status'], data['wallet_balance']))
-        conn.commit()
-        return jsonify({"message": "Customer added successfully!"}), 201
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (data['first_name'], data['last_name'], data['username'], hash_password(data['password']), data['age'], data['address'], data['gender'], data['marital_status'], data['wallet_balance']))
+            conn.commit()
+            return jsonify({"message": "Customer added successfully!"}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/customers/bulk', methods=['POST'])
+def api_import_customers():
+    try:
+        customers = request.get_json()
+        if not isinstance(customers, list):
+            return jsonify({"error": "Expected a JSON array of customers"}), 400
+        report = import_customers(customers)
+        status = 201 if report["summary"]["inserted"] else 400
+        return jsonify(report), status
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/customers/<int:customer_id>', methods=['DELETE'])
 def api_delete_customer(customer_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM Customers WHERE customer_id = ?", (customer_id,))
-        conn.commit()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM Customers WHERE customer_id = ?", (customer_id,))
+            conn.commit()
+        invalidate_customer(customer_id)
         return jsonify({"message": "Customer deleted successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/customers/<int:customer_id>', methods=['GET'])
+@etag_for('Customers')
 def api_get_customer_by_id(customer_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Customers WHERE customer_id = ?", (customer_id,))
-        row = cur.fetchone()
-        if row:
-            customer = {
-                "customer_id": row[0],
-                "first_name": row[1],
-                "last_name": row[2],
-                "username": row[3],
-                "password": row[4],
-                "age": row[5],
-                "address": row[6],
-                "gender": row[7],
-                "marital_status": row[8],
-                "wallet_balance": row[9],
-            }
+        customer = get_customer_by_id(customer_id)
+        if customer:
             return jsonify(customer), 200
         return jsonify({"error": "Customer not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/customers', methods=['GET'])
+@etag_for('Customers')
 def api_get_customers():
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Customers")
-        rows = cur.fetchall()
-        customers = [
-            {
-                "customer_id": row[0],
-                "first_name": row[1],
-                "last_name": row[2],
-                "username": row[3],
-                "password": row[4],
-                "age": row[5],
-                "address": row[6],
-                "gender": row[7],
-                "marital_status": row[8],
-                "wallet_balance": row[9],
-            }
-            for row in rows
-        ]
-        return jsonify(customers), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        if request.args.get('stream'):
+            return stream_response("SELECT * FROM Customers ORDER BY customer_id")
+        page = parse_page_args(request.args)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Customers WHERE customer_id > ? ORDER BY customer_id LIMIT ?", (page.after, page.limit))
+            rows = cur.fetchall()
+            customers = [
+                {
+                    "customer_id": row[0],
+                    "first_name": row[1],
+                    "last_name": row[2],
+                    "username": row[3],
+                    "password": row[4],
+                    "age": row[5],
+                    "address": row[6],
+                    "gender": row[7],
+                    "marital_status": row[8],
+                    "wallet_balance": row[9],
+                }
+                for row in rows
+            ]
+            return jsonify(page_response(customers, page, rows[-1][0] if rows else page.after)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/customers/<username>', methods=['GET'])
+@etag_for('Customers')
 def api_get_customer_by_username(username):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Customers WHERE username = ?", (username,))
-        row = cur.fetchone()
-        if row:
-            customer = {
-                "customer_id": row[0],
-                "first_name": row[1],
-                "last_name": row[2],
-                "username": row[3],
-                "password": row[4],
-                "age": row[5],
-                "address": row[6],
-                "gender": row[7],
-                "marital_status": row[8],
-                "wallet_balance": row[9],
-            }
+        customer = get_customer_by_username(username)
+        if customer:
             return jsonify(customer), 200
         return jsonify({"error": "Customer not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/customers/<username>/wallet', methods=['POST'])
 def api_update_customer_wallet(username):
     data = request.get_json()
     amount = data.get("amount", 0)
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT wallet_balance FROM Customers WHERE username = ?", (username,))
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": "Customer not found"}), 404
-        new_balance = row[0] + amount
-        cur.execute("UPDATE Customers SET wallet_balance = ? WHERE username = ?", (new_balance, username))
-        conn.commit()
-        return jsonify({"message": "Wallet updated successfully!", "new_balance": new_balance}), 200
+        customer = adjust_wallet_balance(username, amount)
+        return jsonify({"message": "Wallet updated successfully!", "new_balance": customer["wallet_balance"]}), 200
+    except WalletError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+def _parse_wallet_amount(amount):
+    amount = float(amount)
+    if not math.isfinite(amount):
+        raise ValueError("Amount must be a finite number")
+    if amount <= 0:
+        raise ValueError("Amount must be positive")
+    if amount > MAX_WALLET_AMOUNT:
+        raise ValueError(f"Amount must not exceed {MAX_WALLET_AMOUNT:g}")
+    return amount
+
+@app.route('/customers/<username>/charge/<amount>', methods=['POST'])
+def api_charge_customer(username, amount):
+    try:
+        customer = adjust_wallet_balance(username, _parse_wallet_amount(amount))
+        return jsonify({"message": "Wallet charged successfully!", "new_balance": customer["wallet_balance"]}), 200
+    except WalletError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/customers/<username>/deduct/<amount>', methods=['POST'])
+def api_deduct_customer(username, amount):
+    try:
+        customer = adjust_wallet_balance(username, -_parse_wallet_amount(amount))
+        return jsonify({"message": "Wallet deducted successfully!", "new_balance": customer["wallet_balance"]}), 200
+    except WalletError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/inventory', methods=['POST'])
 def api_insert_product():
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Inventory (name, category, price, description, stock_count)
-            VALUES (?, ?, ?, ?, ?)
-        """, (data['name'], data['category'], data['price'], data['description'], data['stock_count']))
-        conn.commit()
-        return jsonify({"message": "Product added successfully!"}), 201
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO Inventory (name, category, price, description, stock_count)
+                VALUES (?, ?, ?, ?, ?)
+            """, (data['name'], data['category'], data['price'], data['description'], data['stock_count']))
+            conn.commit()
+            return jsonify({"message": "Product added successfully!"}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/inventory/import', methods=['POST'])
+def api_import_products():
+    try:
+        if request.mimetype == 'text/csv':
+            products = parse_products_csv(request.get_data(as_text=True))
+        else:
+            products = request.get_json()
+        if not isinstance(products, list):
+            return jsonify({"error": "Expected a JSON array or a CSV body"}), 400
+        report = import_products(products)
+        status = 201 if report["summary"]["inserted"] else 400
+        return jsonify(report), status
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/inventory/<int:product_id>', methods=['PUT'])
 def api_update_product(product_id):
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE Inventory
-            SET name = ?, category = ?, price = ?, description = ?, stock_count = ?
-            WHERE product_id = ?
-        """, (data['name'], data['category'], data['price'], data['description'], data['stock_count'], product_id))
-        conn.commit()
-        return jsonify({"message": "Product updated successfully!"}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE Inventory
+                SET name = ?, category = ?, price = ?, description = ?, stock_count = ?
+                WHERE product_id = ?
+            """, (data['name'], data['category'], data['price'], data['description'], data['stock_count'], product_id))
+            conn.commit()
+            return jsonify({"message": "Product updated successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/inventory/<int:product_id>', methods=['DELETE'])
 def api_delete_product(product_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM Inventory WHERE product_id = ?", (product_id,))
-        conn.commit()
-        return jsonify({"message": "Product deleted successfully!"}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM Inventory WHERE product_id = ?", (product_id,))
+            conn.commit()
+            return jsonify({"message": "Product deleted successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/inventory', methods=['GET'])
+@etag_for('Inventory')
 def api_get_products():
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory")
-        rows = cur.fetchall()
-        products = [
-            {
-                "product_id": row[0],
-                "name": row[1],
-                "category": row[2],
-                "price": row[3],
-                "description": row[4],
-                "stock_count": row[5],
-            }
-            for row in rows
-        ]
-        return jsonify(products), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        if request.args.get('stream'):
+            return stream_response("SELECT * FROM Inventory ORDER BY product_id")
+        page = parse_page_args(request.args)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE product_id > ? ORDER BY product_id LIMIT ?", (page.after, page.limit))
+            rows = cur.fetchall()
+            products = [
+                {
+                    "product_id": row[0],
+                    "name": row[1],
+                    "category": row[2],
+                    "price": row[3],
+                    "description": row[4],
+                    "stock_count": row[5],
+                }
+                for row in rows
+            ]
+            return jsonify(page_response(products, page, rows[-1][0] if rows else page.after)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/inventory/catalog', methods=['GET'])
+@etag_for('Inventory')
+def api_get_catalog_snapshot():
+    try:
+        return jsonify(get_catalog_snapshot()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/inventory/stock', methods=['GET'])
+@etag_for('Inventory')
+def api_get_stock_levels():
+    try:
+        return jsonify(get_stock_levels()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/inventory/query', methods=['GET'])
+@etag_for('Inventory')
+def api_query_products():
+    try:
+        query = parse_catalog_args(request.args)
+        result = query_products(query)
+        if request.args.get('explain'):
+            result["plan"] = explain_catalog_query(query)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/inventory/search', methods=['GET'])
+@etag_for('Inventory')
+def api_search_products():
+    try:
+        page = parse_page_args(request.args)
+        # Ranked results page by offset: the cursor's key is the number of matches already returned.
+        page = Page(page.after, page.limit if page.requested else DEFAULT_PAGE_SIZE, True)
+        products = search_products(request.args.get('q'), request.args.get('category'), page.after, page.limit)
+        return jsonify(page_response(products, page, page.after + len(products))), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/inventory/<int:product_id>', methods=['GET'])
+@etag_for('Inventory')
 def api_get_product_by_id(product_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory WHERE product_id = ?", (product_id,))
-        row = cur.fetchone()
-        if row:
-            product = {
-                "product_id": row[0],
-                "name": row[1],
-                "category": row[2],
-                "price": row[3],
-                "description": row[4],
-                "stock_count": row[5],
-            }
-            return jsonify(product), 200
-        return jsonify({"error": "Product not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE product_id = ?", (product_id,))
+            row = cur.fetchone()
+            if row:
+                product = {
+                    "product_id": row[0],
+                    "name": row[1],
+                    "category": row[2],
+                    "price": row[3],
+                    "description": row[4],
+                    "stock_count": row[5],
+                }
+                return jsonify(product), 200
+            return jsonify({"error": "Product not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/inventory/categories/<string:category>', methods=['GET'])
+@etag_for('Inventory')
 def api_get_products_by_category(category):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory WHERE category = ?", (category,))
-        rows = cur.fetchall()
-        products = [
-            {
-                "product_id": row[0],
-                "name": row[1],
-                "category": row[2],
-                "price": row[3],
-                "description": row[4],
-                "stock_count": row[5],
-            }
-            for row in rows
-        ]
-        return jsonify(products), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        page = parse_page_args(request.args)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE category = ? AND product_id > ? ORDER BY product_id LIMIT ?", (category, page.after, page.limit))
+            rows = cur.fetchall()
+            products = [
+                {
+                    "product_id": row[0],
+                    "name": row[1],
+                    "category": row[2],
+                    "price": row[3],
+                    "description": row[4],
+                    "stock_count": row[5],
+                }
+                for row in rows
+            ]
+            return jsonify(page_response(products, page, rows[-1][0] if rows else page.after)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/sales/products', methods=['GET'])
+@etag_for('Inventory')
 def api_get_products_for_sale():
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT name, price FROM Inventory")
-        rows = cur.fetchall()
-        products = [{"name": row[0], "price": row[1]} for row in rows]
-        return jsonify(products), 200
+        page = parse_page_args(request.args)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT product_id, name, price FROM Inventory WHERE product_id > ? ORDER BY product_id LIMIT ?", (page.after, page.limit))
+            rows = cur.fetchall()
+            products = [{"name": row[1], "price": row[2]} for row in rows]
+            return jsonify(page_response(products, page, rows[-1][0] if rows else page.after)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/sales/products/<int:product_id>', methods=['GET'])
+@etag_for('Inventory')
 def api_get_product_detail(product_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory WHERE product_id = ?", (product_id,))
-        row = cur.fetchone()
-        if row:
-            product = {
-                "product_id": row[0],
-                "name": row[1],
-                "category": row[2],
-                "price": row[3],
-                "description": row[4],
-                "stock_count": row[5],
-            }
-            return jsonify(product), 200
-        return jsonify({"error": "Product not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE product_id = ?", (product_id,))
+            row = cur.fetchone()
+            if row:
+                product = {
+                    "product_id": row[0],
+                    "name": row[1],
+                    "category": row[2],
+                    "price": row[3],
+                    "description": row[4],
+                    "stock_count": row[5],
+                }
+                return jsonify(product), 200
+            return jsonify({"error": "Product not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/sales', methods=['POST'])
 def api_insert_sale():
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Sales (customer_id, product_id, quantity, total_price)
-            VALUES (?, ?, ?, ?)
-        """, (data['customer_id'], data['product_id'], data['quantity'], data['total_price']))
-        conn.commit()
-        return jsonify({"message": "Sale processed successfully!"}), 201
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO Sales (customer_id, product_id, quantity, total_price)
+                VALUES (?, ?, ?, ?)
+            """, (data['customer_id'], data['product_id'], data['quantity'], data['total_price']))
+            conn.commit()
+            return jsonify({"message": "Sale processed successfully!"}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/purchase', methods=['POST'])
+def api_purchase():
+    data = request.get_json()
+    try:
+        sale = checkout(data['customer_id'], data['product_id'], data.get('quantity', 1))
+        return jsonify(sale), 201
+    except CheckoutError as e:
+        return jsonify(e.to_dict()), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/cart', methods=['POST'])
+def api_checkout_cart():
+    data = request.get_json()
+    try:
+        order = checkout_cart(data['customer_id'], data.get('items'))
+        return jsonify(order), 201
+    except CheckoutError as e:
+        return jsonify(e.to_dict()), e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/sales/history/<int:customer_id>', methods=['GET'])
 def api_get_customer_sales_history(customer_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Sales WHERE customer_id = ?", (customer_id,))
-        rows = cur.fetchall()
-        sales = [
-            {
-                "sale_id": row[0],
-                "customer_id": row[1],
-                "product_id": row[2],
-                "quantity": row[3],
-                "total_price": row[4],
-                "order_date": row[5],
-            }
-            for row in rows
-        ]
-        return jsonify(sales), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        page = parse_page_args(request.args)
+        start, end = request.args.get('start'), request.args.get('end')
+        if start or end:
+            start, end = parse_date_range(start or '0001-01-01', end or date.today().isoformat())
+        # Archived months are only opened when a date range reaches into them.
+        sales = customer_sales_history(customer_id, page.after, page.limit, start, end)
+        return jsonify(page_response(sales, page, sales[-1]["sale_id"] if sales else page.after)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/archive', methods=['POST'])
+def api_archive_sales():
+    data = request.get_json(silent=True) or {}
+    try:
+        horizon_days = int(data.get('horizon_days', ARCHIVE_HORIZON_DAYS))
+        if horizon_days < 0:
+            return jsonify({"error": "horizon_days must not be negative"}), 400
+        months = archive_sales(horizon_days)
+        return jsonify({"months": months, "archived_until": archived_until()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/reports/products', methods=['GET'])
+def api_product_sales_report():
+    try:
+        product_id = request.args.get('product_id', type=int)
+        report = get_product_sales_report(request.args.get('start'), request.args.get('end'), product_id)
+        return jsonify(report), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/reports/categories', methods=['GET'])
+def api_category_sales_report():
+    try:
+        report = get_category_sales_report(request.args.get('start'), request.args.get('end'), request.args.get('category'))
+        return jsonify(report), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/reports/rebuild', methods=['POST'])
+def api_rebuild_sales_rollups():
+    try:
+        rebuilt = rebuild_sales_rollups(since=archived_until())
+        return jsonify({"message": "Sales rollups rebuilt.", **rebuilt}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/sales/analytics', methods=['GET'])
+def api_sales_breakdown():
+    try:
+        report = sales_breakdown(request.args.get('by'), request.args.get('engine', 'numpy'))
+        return jsonify(report), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/reviews', methods=['POST'])
 def api_submit_review():
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Moderate (customer_id, product_id, rating, comment)
-            VALUES (?, ?, ?, ?)
-        """, (data['customer_id'], data['product_id'], data['rating'], data['comment']))
-        conn.commit()
-        return jsonify({"message": "Review submitted for moderation."}), 201
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO Moderate (customer_id, product_id, rating, comment)
+                VALUES (?, ?, ?, ?)
+            """, (data['customer_id'], data['product_id'], data['rating'], data['comment']))
+            conn.commit()
+            return jsonify({"message": "Review submitted for moderation."}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/reviews/<int:review_id>', methods=['PUT'])
 def api_update_review(review_id):
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE Reviews
-            SET customer_id = ?, product_id = ?, rating = ?, comment = ?
-            WHERE review_id = ?
-        """, (data['customer_id'], data['product_id'], data['rating'], data['comment'], review_id))
-        conn.commit()
-        return jsonify({"message": "Review updated successfully."}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE Reviews
+                SET customer_id = ?, product_id = ?, rating = ?, comment = ?
+                WHERE review_id = ?
+            """, (data['customer_id'], data['product_id'], data['rating'], data['comment'], review_id))
+            conn.commit()
+            return jsonify({"message": "Review updated successfully."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/reviews/<int:review_id>', methods=['DELETE'])
 def api_delete_review(review_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM Reviews WHERE review_id = ?", (review_id,))
-        conn.commit()
-        return jsonify({"message": "Review deleted successfully."}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM Reviews WHERE review_id = ?", (review_id,))
+            conn.commit()
+            return jsonify({"message": "Review deleted successfully."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/reviews/product/<int:product_id>', methods=['GET'])
+@etag_for('Reviews')
 def api_get_product_reviews(product_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Reviews WHERE product_id = ?", (product_id,))
-        rows = cur.fetchall()
-        reviews = [
-            {
-                "review_id": row[0],
-                "customer_id": row[1],
-                "product_id": row[2],
-                "rating": row[3],
-                "comment": row[4],
-                "created_at": row[5],
-                "updated_at": row[6],
-            }
-            for row in rows
-        ]
-        return jsonify(reviews), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        page = parse_page_args(request.args)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Reviews WHERE product_id = ? AND review_id > ? ORDER BY review_id LIMIT ?", (product_id, page.after, page.limit))
+            rows = cur.fetchall()
+            reviews = [
+                {
+                    "review_id": row[0],
+                    "customer_id": row[1],
+                    "product_id": row[2],
+                    "rating": row[3],
+                    "comment": row[4],
+                    "created_at": row[5],
+                    "updated_at": row[6],
+                }
+                for row in rows
+            ]
+            return jsonify(page_response(reviews, page, rows[-1][0] if rows else page.after)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/reviews/product/<int:product_id>/stats', methods=['GET'])
+@etag_for('Reviews')
+def api_get_product_rating_stats(product_id):
+    try:
+        stats = get_product_rating_stats(product_id)
+        if not stats:
+            return jsonify({"error": "Could not read rating stats"}), 500
+        return jsonify(stats), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/reviews/stats/rebuild', methods=['POST'])
+def api_rebuild_rating_stats():
+    data = request.get_json(silent=True) or {}
+    try:
+        rebuilt = rebuild_rating_stats(data.get('product_id'))
+        return jsonify({"message": "Rating stats rebuilt.", "products": rebuilt}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/reviews/customer/<int:customer_id>', methods=['GET'])
+@etag_for('Reviews')
 def api_get_customer_reviews(customer_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Reviews WHERE customer_id = ?", (customer_id,))
-        rows = cur.fetchall()
-        reviews = [
-            {
-                "review_id": row[0],
-                "customer_id": row[1],
-                "product_id": row[2],
-                "rating": row[3],
-                "comment": row[4],
-                "created_at": row[5],
-                "updated_at": row[6],
-            }
-            for row in rows
-        ]
-        return jsonify(reviews), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Reviews WHERE customer_id = ?", (customer_id,))
+            rows = cur.fetchall()
+            reviews = [
+                {
+                    "review_id": row[0],
+                    "customer_id": row[1],
+                    "product_id": row[2],
+                    "rating": row[3],
+                    "comment": row[4],
+                    "created_at": row[5],
+                    "updated_at": row[6],
+                }
+                for row in rows
+            ]
+            return jsonify(reviews), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/reviews/approve', methods=['POST'])
 def api_approve_review():
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Reviews (customer_id, product_id, rating, comment)
-            VALUES (?, ?, ?, ?)
-        """, (data['customer_id'], data['product_id'], data['rating'], data['comment']))
-        conn.commit()
-        return jsonify({"message": "Review approved and added."}), 201
+        if data.get('review_id') is not None:
+            result = moderate_reviews(approve_ids=[data['review_id']])
+            if not result["approved"]:
+                return jsonify({"error": "Review is not pending moderation"}), 404
+            return jsonify({"message": "Review approved and added.", "review": result["approved"][0]}), 201
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO Reviews (customer_id, product_id, rating, comment)
+                VALUES (?, ?, ?, ?)
+            """, (data['customer_id'], data['product_id'], data['rating'], data['comment']))
+            conn.commit()
+            return jsonify({"message": "Review approved and added."}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/reviews/moderate', methods=['POST'])
+def api_moderate_reviews():
+    data = request.get_json(silent=True) or {}
+    try:
+        result = moderate_reviews(data.get('approve'), data.get('reject'))
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/reviews/moderation', methods=['GET'])
+def api_get_moderation_queue():
+    try:
+        page = parse_page_args(request.args)
+        product_id = request.args.get('product_id', type=int)
+        reviews = get_moderation_queue(page.after, page.limit, product_id)
+        return jsonify(page_response(reviews, page, reviews[-1]["review_id"] if reviews else page.after)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/reviews/reject/<int:review_id>', methods=['DELETE'])
 def api_reject_review(review_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM Moderate WHERE review_id = ?", (review_id,))
-        conn.commit()
-        return jsonify({"message": "Review rejected and removed."}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM Moderate WHERE review_id = ?", (review_id,))
+            conn.commit()
+            return jsonify({"message": "Review rejected and removed."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/wishlist', methods=['POST'])
 def api_add_to_wishlist():
     data = request.get_json()
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Wishes (customer_id, product_id, quantity)
-            VALUES (?, ?, ?)
-        """, (data['customer_id'], data['product_id'], data['quantity']))
-        conn.commit()
-        return jsonify({"message": "Wish added successfully!"}), 201
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO Wishes (customer_id, product_id, quantity)
+                VALUES (?, ?, ?)
+            """, (data['customer_id'], data['product_id'], data['quantity']))
+            conn.commit()
+            return jsonify({"message": "Wish added successfully!"}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/wishlist/<int:customer_id>/<int:product_id>', methods=['DELETE'])
 def api_remove_from_wishlist(customer_id, product_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            DELETE FROM Wishes WHERE customer_id = ? AND product_id = ?
-        """, (customer_id, product_id))
-        conn.commit()
-        return jsonify({"message": "Wish removed successfully!"}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                DELETE FROM Wishes WHERE customer_id = ? AND product_id = ?
+            """, (customer_id, product_id))
+            conn.commit()
+            return jsonify({"message": "Wish removed successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/wishlist/<int:customer_id>', methods=['GET'])
 def api_get_wishlist(customer_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT * FROM Wishes WHERE customer_id = ?
-        """, (customer_id,))
-        rows = cur.fetchall()
-        wishes = [
-            {
-                "wish_id": row[0],
-                "customer_id": row[1],
-                "product_id": row[2],
-                "quantity": row[3],
-                "added_at": row[4],
-            }
-            for row in rows
-        ]
-        return jsonify(wishes), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT * FROM Wishes WHERE customer_id = ?
+            """, (customer_id,))
+            rows = cur.fetchall()
+            wishes = [
+                {
+                    "wish_id": row[0],
+                    "customer_id": row[1],
+                    "product_id": row[2],
+                    "quantity": row[3],
+                    "added_at": row[4],
+                }
+                for row in rows
+            ]
+            return jsonify(wishes), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/wishlist/notify/sweep', methods=['POST'])
+def api_sweep_abandoned_wishlists():
+    data = request.get_json(silent=True) or {}
+    try:
+        days = int(data.get('days', 7))
+        if days < 0:
+            return jsonify({"error": "days must not be negative"}), 400
+        summary = sweep_abandoned_wishlists(days=days, reset=bool(data.get('reset')))
+        return jsonify(summary), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/wishlist/notify/<int:customer_id>', methods=['POST'])
 def api_notify_abandoned_wishlist(customer_id):
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-
-        # Notify about items added more than 7 days ago
-        cur.execute("""
-            SELECT * FROM Wishes
-            WHERE customer_id = ? AND added_at < datetime('now', '-7 days')
-        """, (customer_id,))
-        rows = cur.fetchall()
-
-        if not rows:
-            return jsonify({"message": "No abandoned wishlist items found."}), 200
-
-        notifications = []
-        for row in rows:
-            notifications.append(
-                f"Customer {row[1]}, your wish for product {row[2]} (quantity: {row[3]}) "
-                f"added on {row[4]} is still in your wishlist. Consider purchasing!"
-            )
-
-        return jsonify({"notifications": notifications}), 200
+        with get_connection() as conn:
+            cur = conn.cursor()
+
+            # Notify about items added more than 7 days ago
+            cur.execute("""
+                SELECT wish_id, customer_id, product_id, quantity, added_at FROM Wishes
+                WHERE customer_id = ? AND added_at < datetime('now', '-7 days')
+            """, (customer_id,))
+            wishes = [dict(row) for row in cur.fetchall()]
+
+            if not wishes:
+                return jsonify({"message": "No abandoned wishlist items found."}), 200
+
+            # Delivery happens in the outbox dispatcher, not in this request.
+            notification = abandoned_wishlist_notification(customer_id, wishes)
+            queued = enqueue_notifications(conn, [notification])
+            conn.commit()
+            message = "Notification queued." if queued else "Notification already queued."
+            return jsonify({"message": message, "notifications": [notification["payload"]["message"]]}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/auth/signup', methods=['POST'])
 def api_signup():
@@ -584,16 +781,14 @@ def api_signup():
     hashed_password = generate_password_hash(password, method='sha256')
 
     try:
-        conn = connect_to_db()
-        conn.execute("""
-            INSERT INTO Users (username, password, role) VALUES (?, ?, ?)
-        """, (username, hashed_password, role))
-        conn.commit()
-        return jsonify({"message": f"User {username} created successfully!"}), 201
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT INTO Users (username, password, role) VALUES (?, ?, ?)
+            """, (username, hashed_password, role))
+            conn.commit()
+            return jsonify({"message": f"User {username} created successfully!"}), 201
     except sqlite3.IntegrityError:
         return jsonify({"message": "User already exists!"}), 400
-    finally:
-        conn.close()
 
 @app.route('/auth/login', methods=['POST'])
 def api_login():
@@ -605,26 +800,84 @@ def api_login():
         return jsonify({"message": "Username and password are required!"}), 400
 
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Users WHERE username = ?", (username,))
-        user = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Users WHERE username = ?", (username,))
+            user = cur.fetchone()
 
-        if not user or not check_password_hash(user['password'], password):
-            return jsonify({"message": "Invalid credentials!"}), 401
+            if not user or not check_password_hash(user['password'], password):
+                return jsonify({"message": "Invalid credentials!"}), 401
 
-        return jsonify({"message": f"Welcome {username}!", "role": user['role']}), 200
+            return jsonify({"message": f"Welcome {username}!", "role": user['role']}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
 
 @app.route('/auth/logout', methods=['POST'])
 def api_logout():
     return jsonify({"message": "Logout functionality is client-side in this setup."}), 200
 
+@app.route('/db/pool', methods=['GET'])
+def api_pool_stats():
+    return jsonify({"pool": pool_stats(), "leaks": get_pool().check_leaks(), "settings": pool_settings()}), 200
+
+@app.route('/db/versions', methods=['GET'])
+def api_table_versions():
+    try:
+        return jsonify(get_table_versions()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/db/cache', methods=['GET'])
+def api_cache_stats():
+    return jsonify({"customers": customer_cache_stats()}), 200
+
+@app.route('/db/outbox', methods=['GET'])
+def api_outbox_stats():
+    try:
+        return jsonify(outbox_stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/db/backup', methods=['POST'])
+def api_backup_database():
+    data = request.get_json(silent=True) or {}
+    pages, sleep = data.get('pages'), data.get('sleep')
+    options = {}
+    if 'pages' in data:
+        if isinstance(pages, bool) or not isinstance(pages, int) or pages <= 0:
+            return jsonify({"error": "pages must be a positive integer"}), 400
+        options['pages'] = pages
+    if 'sleep' in data:
+        if isinstance(sleep, bool) or not isinstance(sleep, (int, float)) or not 0 <= sleep <= BACKUP_MAX_STEP_SLEEP:
+            return jsonify({"error": f"sleep must be a number of seconds between 0 and {BACKUP_MAX_STEP_SLEEP:g}"}), 400
+        options['sleep'] = float(sleep)
+    try:
+        return jsonify(backup_database(**options)), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/db/maintenance', methods=['POST'])
+def api_run_maintenance():
+    data = request.get_json(silent=True) or {}
+    try:
+        tasks = data.get('tasks', list(FREQUENT_TASKS))
+        if not isinstance(tasks, list):
+            return jsonify({"error": f"tasks must be a list of: {', '.join(TASKS)}"}), 400
+        return jsonify(run_maintenance(tasks)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/db/maintenance', methods=['GET'])
+def api_maintenance_status():
+    last_runs = maintenance_scheduler.last_runs if maintenance_scheduler else {}
+    return jsonify({"last_runs": last_runs, "backup_dir": BACKUP_DIR, "backups": list_backups()}), 200
+
 
 if __name__ == '__main__':
     initialize_database()
     print("Database initialized successfully!")
+    print(f"SQLite settings: {pool_settings()}")
+    start_dispatcher()
+    print(f"Notification dispatcher started, delivering to {OUTBOX_SINK}")
+    maintenance_scheduler = start_maintenance()
     app.run(host='0.0.0.0', port=5000)
@@ -1,83 +1,140 @@
-import sqlite3
+import csv
+import io
+import math
+import re
+import time
+from connection_db import get_connection
+from pagination_db import parse_limit, encode_keyset_cursor, decode_keyset_cursor
+from versions_db import get_table_version, get_table_versions
+
+CATEGORIES = ('Food', 'Clothes', 'Accessories', 'Electronics')
+IMPORT_CHUNK_SIZE = 1000
+# bm25 column weights for (name, description): a match in the name ranks higher.
+SEARCH_RANK = 'bm25(10.0, 1.0)'
+# Catalog sort keys: (column, direction). Ties are broken by product_id in the same direction.
+CATALOG_SORTS = {
+    'product_id': ('product_id', 'ASC'),
+    'price': ('price', 'ASC'),
+    '-price': ('price', 'DESC'),
+    'name': ('name', 'ASC'),
+    '-name': ('name', 'DESC'),
+    'stock_count': ('stock_count', 'ASC'),
+    '-stock_count': ('stock_count', 'DESC'),
+}
+
+
+class StockError(Exception):
+    """
+    Raised when a stock decrement is rejected; ``status`` is the HTTP status to report.
+
+    ``product_ids`` lists the products that were missing or short on stock.
+    """
+
+    def __init__(self, message, status=409, product_ids=None):
+        super().__init__(message)
+        self.status = status
+        self.product_ids = product_ids or []
 
-def connect_to_db():
-    conn = sqlite3.connect('ecommerce.db')
-    return conn
 
 def create_inventory_table():
     try:
-        conn = connect_to_db()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS Inventory (
-            product_id INTEGER PRIMARY KEY NOT NULL,
-            name VARCHAR(255) NOT NULL,
-            category ENUM('Food', 'Clothes', 'Accessories', 'Electronics') NOT NULL,
-            price DECIMAL(10, 2) NOT NULL,
-            description TEXT,
-            stock_count INT DEFAULT 0
-            );
-        ''')
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS Inventory (
+                product_id INTEGER PRIMARY KEY NOT NULL,
+                name VARCHAR(255) NOT NULL,
+                category VARCHAR(20) NOT NULL CHECK (category IN ('Food', 'Clothes', 'Accessories', 'Electronics')),
+                price DECIMAL(10, 2) NOT NULL,
+                description TEXT,
+                stock_count INT DEFAULT 0
+                );
+            ''')
+            conn.commit()
         print('Inventory table created successfully.')
     except:
         print('An error occured while creating the inventory table.')
-    finally:
-        conn.close()
+
+def create_inventory_search_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS InventorySearch USING fts5(
+                name,
+                description,
+                content='Inventory',
+                content_rowid='product_id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            );
+            ''')
+            conn.execute("INSERT INTO InventorySearch (InventorySearch, rank) VALUES ('rank', ?)", (SEARCH_RANK,))
+            # External-content index: the triggers mirror every Inventory write into it.
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS inventory_search_insert AFTER INSERT ON Inventory BEGIN
+                    INSERT INTO InventorySearch (rowid, name, description) VALUES (NEW.product_id, NEW.name, NEW.description);
+                END;
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS inventory_search_delete AFTER DELETE ON Inventory BEGIN
+                    INSERT INTO InventorySearch (InventorySearch, rowid, name, description) VALUES ('delete', OLD.product_id, OLD.name, OLD.description);
+                END;
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS inventory_search_update AFTER UPDATE OF product_id, name, description ON Inventory BEGIN
+                    INSERT INTO InventorySearch (InventorySearch, rowid, name, description) VALUES ('delete', OLD.product_id, OLD.name, OLD.description);
+                    INSERT INTO InventorySearch (rowid, name, description) VALUES (NEW.product_id, NEW.name, NEW.description);
+                END;
+            ''')
+            conn.commit()
+        print('InventorySearch table created successfully.')
+    except:
+        print('An error occured while creating the inventory search table.')
 
 def insert_product(product):
     inserted_product = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, ?, ?, ?, ?)", (product['name'], product['category'], product['price'], product['description'], product['stock_count']) )
-        conn.commit()
-        inserted_product = get_product_by_id(cur.lastrowid)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, ?, ?, ?, ?) RETURNING *", (product['name'], product['category'], product['price'], product['description'], product['stock_count']) )
+            inserted_product = dict(cur.fetchone())
+            conn.commit()
     except:
         print("Insertion failed.")
-        conn().rollback()
-    finally:
-        conn.close()
     return inserted_product
 
 def update_product(product):
     updated_product = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("UPDATE Inventory SET name = ?, category = ?, price = ?, description = ?, stock_count = ? WHERE product_id = ?", (product['name'], product['category'], product['price'], product['description'], product['stock_count'], product['product_id']))
-        conn.commit()
-        updated_product = get_product_by_id(product["product_id"])
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE Inventory SET name = ?, category = ?, price = ?, description = ?, stock_count = ? WHERE product_id = ? RETURNING *", (product['name'], product['category'], product['price'], product['description'], product['stock_count'], product['product_id']))
+            row = cur.fetchone()
+            conn.commit()
+            updated_product = dict(row) if row else {}
     except:
         print("Update failed.")
-        conn.rollback()
         updated_product = {}
-    finally:
-        conn.close() 
     return updated_product
 
 def delete_product(product_id):
     message = {}
     try:
-        conn = connect_to_db()
-        conn.execute("DELETE from Inventory WHERE product_id = ?",(product_id,))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("DELETE from Inventory WHERE product_id = ?",(product_id,))
+            conn.commit()
         message["status"] = "Product deleted successfully"
     except:
         print("Deletion failed.")
-        conn.rollback()
         message["status"] = "Cannot delete product"
-    finally:
-        conn.close()
     return message
 
-def get_products():
+def get_products(after=0, limit=-1):
     products = []
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory")
-        rows = cur.fetchall()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE product_id > ? ORDER BY product_id LIMIT ?", (after, limit))
+            rows = cur.fetchall()
         for i in rows:
             product = {}
             product["product_id"] = i["product_id"]
@@ -95,11 +152,10 @@ def get_products():
 def get_product_by_id(product_id):
     product = {}
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory WHERE product_id = ?",(product_id,))
-        row = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE product_id = ?",(product_id,))
+            row = cur.fetchone()
         product["product_id"] = row["product_id"]
         product["name"] = row["name"]
         product["category"] = row["category"]
@@ -111,14 +167,13 @@ def get_product_by_id(product_id):
         product = {}
     return product
 
-def get_category_products(category):
+def get_category_products(category, after=0, limit=-1):
     products = []
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Inventory WHERE category = ?", (category,))
-        rows = cur.fetchall()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Inventory WHERE category = ? AND product_id > ? ORDER BY product_id LIMIT ?", (category, after, limit))
+            rows = cur.fetchall()
         for i in rows:
             product = {}
             product["product_id"] = i["product_id"]
@@ -131,4 +186,422 @@ def get_category_products(category):
     except:
         print("Failed to fetch all products.")
         products = []
-    return products
\ No newline at end of file
+    return products
+
+def decrement_stock(product_id, quantity=1):
+    """
+    Take ``quantity`` units of a product out of stock in one guarded UPDATE.
+
+    Joins the caller's transaction when one is open on the pooled connection,
+    otherwise commits on its own.
+
+    Returns:
+        int: The new stock count.
+
+    Raises:
+        StockError: 404 if the product does not exist, 409 if stock would go negative.
+    """
+    if quantity < 1:
+        raise StockError("Quantity must be a positive integer", 400, [product_id])
+    with get_connection() as conn:
+        nested = conn.in_transaction
+        row = conn.execute(
+            "UPDATE Inventory SET stock_count = stock_count - ? WHERE product_id = ? AND stock_count >= ? RETURNING stock_count",
+            (quantity, product_id, quantity),
+        ).fetchone()
+        if row is None:
+            if not nested:
+                conn.rollback()
+            if conn.execute("SELECT 1 FROM Inventory WHERE product_id = ?", (product_id,)).fetchone() is None:
+                raise StockError("Product not found", 404, [product_id])
+            raise StockError("Product is out of stock", 409, [product_id])
+        if not nested:
+            conn.commit()
+    return row["stock_count"]
+
+def decrement_stock_batch(quantities):
+    """
+    Decrement stock for many products in a single UPDATE ... FROM statement.
+
+    The batch is all or nothing: if any product is missing or short on stock
+    the whole statement is undone. Joins the caller's transaction when one is
+    open on the pooled connection, otherwise commits on its own.
+
+    Args:
+        quantities (dict): Product ID to the number of units to remove.
+
+    Returns:
+        dict: Product ID to its new stock count.
+
+    Raises:
+        StockError: Listing the products that could not be decremented.
+    """
+    if not quantities:
+        return {}
+    if any(quantity < 1 for quantity in quantities.values()):
+        raise StockError("Quantities must be positive integers", 400, [p for p, q in quantities.items() if q < 1])
+    values = ", ".join(["(?, ?)"] * len(quantities))
+    params = [value for item in quantities.items() for value in item]
+    with get_connection() as conn:
+        nested = conn.in_transaction
+        if not nested:
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute("SAVEPOINT decrement_stock_batch")
+        rows = conn.execute(
+            f"""
+            WITH requested(product_id, quantity) AS (VALUES {values})
+            UPDATE Inventory SET stock_count = stock_count - requested.quantity
+            FROM requested
+            WHERE Inventory.product_id = requested.product_id AND Inventory.stock_count >= requested.quantity
+            RETURNING Inventory.product_id, Inventory.stock_count
+            """,
+            params,
+        ).fetchall()
+        updated = {row["product_id"]: row["stock_count"] for row in rows}
+        if len(updated) != len(quantities):
+            if nested:
+                conn.execute("ROLLBACK TO decrement_stock_batch")
+                conn.execute("RELEASE decrement_stock_batch")
+            else:
+                conn.rollback()
+            raise StockError("Some products are missing or out of stock", 409, [p for p in quantities if p not in updated])
+        if nested:
+            conn.execute("RELEASE decrement_stock_batch")
+        else:
+            conn.commit()
+    return updated
+
+def validate_product(product):
+    """
+    Check and normalize one product for insertion.
+
+    String values, as read from CSV, are converted to the column types.
+
+    Returns:
+        tuple: (normalized row tuple or None, list of error messages).
+    """
+    if not isinstance(product, dict):
+        return None, ["Row must be an object"]
+    errors = []
+    name = product.get('name')
+    if not isinstance(name, str) or not name.strip():
+        errors.append("name is required")
+    category = product.get('category')
+    if category not in CATEGORIES:
+        errors.append(f"category must be one of: {', '.join(CATEGORIES)}")
+    try:
+        price = float(product.get('price'))
+        if not math.isfinite(price):
+            errors.append("price must be a finite number")
+        elif price < 0:
+            errors.append("price must not be negative")
+    except (TypeError, ValueError):
+        errors.append("price must be a number")
+    # int() would truncate 2.7 and accept True, so only whole numbers get through.
+    stock_count = product.get('stock_count')
+    if stock_count is None or stock_count == '':
+        stock_count = 0
+    elif isinstance(stock_count, str) and stock_count.strip().lstrip('+-').isdigit():
+        stock_count = int(stock_count)
+    elif isinstance(stock_count, float) and stock_count.is_integer():
+        stock_count = int(stock_count)
+    if isinstance(stock_count, bool) or not isinstance(stock_count, int):
+        errors.append("stock_count must be an integer")
+    elif stock_count < 0:
+        errors.append("stock_count must not be negative")
+    description = product.get('description')
+    if description is not None and not isinstance(description, str):
+        errors.append("description must be a string")
+    if errors:
+        return None, errors
+    return (name.strip(), category, price, description, stock_count), []
+
+def parse_products_csv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+def import_products(products, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Bulk insert products with executemany in chunked transactions.
+
+    Every row is validated up front; invalid rows are reported and skipped
+    without affecting the others. Valid rows are inserted ``chunk_size`` at a
+    time, each chunk in its own BEGIN IMMEDIATE transaction, so a failing chunk
+    only rolls back its own rows.
+
+    Args:
+        products (list): Product dicts as sent to POST /inventory/add.
+        chunk_size (int): Rows per transaction.
+
+    Returns:
+        dict: ``results`` with one entry per input row, and a ``summary``
+        with counts, elapsed time and rows per second.
+    """
+    start = time.perf_counter()
+    results = []
+    valid = []
+    for index, product in enumerate(products):
+        row, errors = validate_product(product)
+        if errors:
+            results.append({"row": index, "status": "invalid", "errors": errors})
+        else:
+            results.append({"row": index, "status": "pending"})
+            valid.append((index, row))
+
+    chunks = 0
+    with get_connection() as conn:
+        for offset in range(0, len(valid), chunk_size):
+            chunk = valid[offset:offset + chunk_size]
+            chunks += 1
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.execute("SELECT COALESCE(MAX(product_id), 0) FROM Inventory").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, ?, ?, ?, ?)",
+                    [row for _, row in chunk],
+                )
+                after = conn.execute("SELECT MAX(product_id) FROM Inventory").fetchone()[0]
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                for index, _ in chunk:
+                    results[index] = {"row": index, "status": "failed", "errors": [str(e)]}
+                continue
+            # Under the write lock new rowids are handed out consecutively from
+            # MAX + 1; only report IDs when that held for the whole chunk.
+            sequential = after - before == len(chunk)
+            for position, (index, _) in enumerate(chunk):
+                results[index] = {"row": index, "status": "inserted"}
+                if sequential:
+                    results[index]["product_id"] = before + position + 1
+
+    elapsed = time.perf_counter() - start
+    inserted = sum(1 for r in results if r["status"] == "inserted")
+    return {
+        "results": results,
+        "summary": {
+            "received": len(products),
+            "inserted": inserted,
+            "failed": len(products) - inserted,
+            "chunks": chunks,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "rows_per_sec": round(inserted / elapsed) if elapsed > 0 else inserted,
+        },
+    }
+
+def build_search_query(text):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    treated as plain text. ``"red sho"`` becomes ``"red"* "sho"*``.
+
+    Raises:
+        ValueError: If the text contains no searchable words.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        raise ValueError("q must contain at least one word")
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_products(text, category=None, offset=0, limit=100):
+    """
+    Full-text search over product names and descriptions, best matches first.
+
+    Args:
+        text (str): Words to look for; each matches as a prefix.
+        category (str, optional): Only return products in this category.
+        offset (int): Number of ranked matches to skip.
+        limit (int): Maximum number of matches to return.
+
+    Returns:
+        list: Product dicts with their ``rank`` (lower is better).
+
+    Raises:
+        ValueError: If the text contains no searchable words.
+    """
+    query = build_search_query(text)
+    where = "InventorySearch MATCH ?"
+    params = [query]
+    if category is not None:
+        where += " AND i.category = ?"
+        params.append(category)
+    with get_connection() as conn:
+        rows = conn.execute(f'''
+            SELECT i.*, s.rank
+            FROM InventorySearch s
+            JOIN Inventory i ON i.product_id = s.rowid
+            WHERE {where}
+            ORDER BY s.rank, i.product_id
+            LIMIT ? OFFSET ?
+        ''', params + [limit, offset]).fetchall()
+    return [dict(row) for row in rows]
+
+class CatalogQuery:
+    """
+    Filters, sort and keyset position of an inventory catalog listing.
+
+    ``after`` is None for the first page, otherwise the sort key of the last
+    row returned: ``[product_id]`` for the product_id sort and
+    ``[value, product_id]`` for the others.
+    """
+
+    def __init__(self, category=None, min_price=None, max_price=None, in_stock=False, sort='product_id', after=None, limit=100):
+        self.category = category
+        self.min_price = min_price
+        self.max_price = max_price
+        self.in_stock = in_stock
+        self.sort = sort
+        self.after = after
+        self.limit = limit
+
+    def key_size(self):
+        return 1 if self.sort == 'product_id' else 2
+
+    def last_key(self, row):
+        column = CATALOG_SORTS[self.sort][0]
+        return [row["product_id"]] if self.sort == 'product_id' else [row[column], row["product_id"]]
+
+def _parse_price(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        price = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(price):
+        raise ValueError(f"{name} must be a finite number")
+    if price < 0:
+        raise ValueError(f"{name} must not be negative")
+    return price
+
+def parse_catalog_args(args):
+    """
+    Build a CatalogQuery from request query parameters.
+
+    Raises:
+        ValueError: On an unknown category or sort, a malformed price, limit
+        or cursor, or a cursor issued for another sort.
+    """
+    category = args.get('category')
+    if category is not None and category not in CATEGORIES:
+        raise ValueError(f"category must be one of: {', '.join(CATEGORIES)}")
+    sort = args.get('sort', 'product_id')
+    if sort not in CATALOG_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(CATALOG_SORTS)}")
+    min_price = _parse_price(args, 'min_price')
+    max_price = _parse_price(args, 'max_price')
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ValueError("min_price must not be greater than max_price")
+    in_stock = str(args.get('in_stock', '')).lower() in ('1', 'true', 'yes')
+    query = CatalogQuery(category, min_price, max_price, in_stock, sort, limit=parse_limit(args.get('limit')))
+    cursor = args.get('cursor')
+    if cursor:
+        query.after = decode_keyset_cursor(cursor, sort, query.key_size())
+    return query
+
+def build_catalog_sql(query):
+    """
+    Translate a CatalogQuery into one parameterized SELECT.
+
+    Every filter is a sargable predicate on an indexed column, and the page
+    position is a row-value comparison on the sort key, so a page costs an
+    index seek plus ``limit`` rows however deep it is.
+
+    Returns:
+        tuple: (sql, params).
+    """
+    column, direction = CATALOG_SORTS[query.sort]
+    where, params = [], []
+    if query.category is not None:
+        where.append("category = ?")
+        params.append(query.category)
+    if query.min_price is not None:
+        where.append("price >= ?")
+        params.append(query.min_price)
+    if query.max_price is not None:
+        where.append("price <= ?")
+        params.append(query.max_price)
+    if query.in_stock:
+        where.append("stock_count > 0")
+    comparison = '>' if direction == 'ASC' else '<'
+    if query.after is not None:
+        if query.sort == 'product_id':
+            where.append(f"product_id {comparison} ?")
+        else:
+            where.append(f"({column}, product_id) {comparison} (?, ?)")
+        params.extend(query.after)
+    order = f"product_id {direction}" if query.sort == 'product_id' else f"{column} {direction}, product_id {direction}"
+    sql = "SELECT * FROM Inventory"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(query.limit)
+    return sql, params
+
+def query_products(query):
+    """
+    Run a catalog listing.
+
+    Returns:
+        dict: ``items`` (product dicts) and ``next_cursor``, which is None on the last page.
+    """
+    sql, params = build_catalog_sql(query)
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    products = [dict(row) for row in rows]
+    next_cursor = None
+    if len(products) == query.limit:
+        next_cursor = encode_keyset_cursor(query.sort, query.last_key(products[-1]))
+    return {"items": products, "next_cursor": next_cursor}
+
+def explain_catalog_query(query):
+    """
+    Return SQLite's plan for a catalog listing, one line per plan step.
+    """
+    sql, params = build_catalog_sql(query)
+    with get_connection() as conn:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row["detail"] for row in rows]
+
+def get_catalog_snapshot():
+    """
+    Every product together with the versions they were read at.
+
+    ``version`` is the Catalog counter, which moves only when products are
+    added, removed or edited; ``stock_version`` is the Inventory counter,
+    which also moves on every stock change. Everything is read in one
+    transaction, so both describe exactly these rows.
+
+    Returns:
+        dict: ``version``, ``stock_version`` and ``products`` (product dicts in product_id order).
+    """
+    with get_connection() as conn:
+        conn.execute("BEGIN")
+        try:
+            versions = get_table_versions(conn)
+            rows = conn.execute(
+                "SELECT product_id, name, category, price, description, stock_count FROM Inventory ORDER BY product_id"
+            ).fetchall()
+        finally:
+            conn.rollback()
+    return {"version": versions.get('Catalog', 0), "stock_version": versions.get('Inventory', 0), "products": [dict(row) for row in rows]}
+
+def get_stock_levels():
+    """
+    Stock count of every product with the Inventory version it was read at.
+
+    Lets a catalog snapshot follow stock changes without reloading products.
+
+    Returns:
+        dict: ``stock_version`` and ``stock`` ([product_id, stock_count] pairs).
+    """
+    with get_connection() as conn:
+        conn.execute("BEGIN")
+        try:
+            version = get_table_version('Inventory', conn)
+            rows = conn.execute("SELECT product_id, stock_count FROM Inventory ORDER BY product_id").fetchall()
+        finally:
+            conn.rollback()
+    return {"stock_version": version, "stock": [[row["product_id"], row["stock_count"]] for row in rows]}
@@ -0,0 +1,296 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from connection_db import DATABASE, POOL_TIMEOUT, get_connection
+
+BACKUP_DIR = os.environ.get('ECOMMERCE_BACKUP_DIR', os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'backups'))
+BACKUP_KEEP = int(os.environ.get('ECOMMERCE_BACKUP_KEEP', 7))
+# Pages copied per backup step, and the pause between steps during which
+# writers get the database to themselves.
+BACKUP_STEP_PAGES = int(os.environ.get('ECOMMERCE_BACKUP_STEP_PAGES', 256))
+BACKUP_STEP_SLEEP = float(os.environ.get('ECOMMERCE_BACKUP_STEP_SLEEP', 0.005))
+# Longest pause a request may ask for, so one backup cannot hold its read open for hours.
+BACKUP_MAX_STEP_SLEEP = 1.0
+# A write through another connection makes the backup start over. After this
+# many restarts the copy is finished in one step, which in WAL mode is a
+# single read transaction and still does not block writers.
+BACKUP_MAX_RESTARTS = int(os.environ.get('ECOMMERCE_BACKUP_MAX_RESTARTS', 3))
+
+# Upper bound on free pages returned to the filesystem per run, so the
+# write lock taken by incremental_vacuum stays short.
+VACUUM_STEP_PAGES = int(os.environ.get('ECOMMERCE_VACUUM_STEP_PAGES', 2000))
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+# Seconds between scheduled runs; 0 disables the schedule.
+MAINTENANCE_INTERVAL = float(os.environ.get('ECOMMERCE_MAINTENANCE_INTERVAL', 3600))
+BACKUP_INTERVAL = float(os.environ.get('ECOMMERCE_BACKUP_INTERVAL', 86400))
+
+# Cheap tasks run every MAINTENANCE_INTERVAL; the full-scan ones with the backup.
+FREQUENT_TASKS = ('optimize', 'checkpoint', 'incremental_vacuum')
+DAILY_TASKS = ('backup', 'analyze')
+
+
+class _BackupRestarting(Exception):
+    pass
+
+
+def enable_incremental_vacuum():
+    """
+    Switch a database that has no tables yet to ``auto_vacuum = INCREMENTAL``.
+
+    The mode can only be changed for free before the first table is created,
+    and before the pool switches the file to WAL, so this uses a plain
+    connection and must run before anything else opens the database. An
+    existing file keeps its mode until the ``vacuum`` task rebuilds it.
+    """
+    conn = sqlite3.connect(DATABASE, timeout=POOL_TIMEOUT)
+    try:
+        if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+
+
+def backup_name(now=None):
+    return f"ecommerce_{(now or datetime.now()).strftime('%Y%m%d_%H%M%S_%f')}.db"
+
+
+def list_backups():
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    names = sorted(n for n in os.listdir(BACKUP_DIR) if n.startswith('ecommerce_') and n.endswith('.db'))
+    return [{"name": n, "bytes": os.path.getsize(os.path.join(BACKUP_DIR, n))} for n in names]
+
+
+def prune_backups(keep=BACKUP_KEEP):
+    if keep <= 0:
+        return []
+    removed = [backup["name"] for backup in list_backups()[:-keep]]
+    for name in removed:
+        os.remove(os.path.join(BACKUP_DIR, name))
+    return removed
+
+
+def backup_database(target=None, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP, max_restarts=BACKUP_MAX_RESTARTS, keep=BACKUP_KEEP):
+    """
+    Copy the live database with the SQLite online backup API.
+
+    The copy runs ``pages`` pages at a time on its own connection, sleeping
+    between steps, so the read lock is held only briefly and writers keep
+    going. The result is written to a temporary file, checked with
+    ``PRAGMA quick_check`` and then renamed into place, so a backup file
+    that exists is always complete.
+
+    Args:
+        target (str, optional): Destination path, defaults to a timestamped file in BACKUP_DIR.
+        pages (int): Pages per step.
+        sleep (float): Seconds to pause between steps.
+        max_restarts (int): Restarts caused by concurrent writes before finishing in one step.
+        keep (int): Timestamped backups to keep in BACKUP_DIR; older ones are removed.
+
+    Returns:
+        dict: Path, size, page and step counts, restarts and elapsed time.
+
+    Raises:
+        sqlite3.DatabaseError: If the copy fails its integrity check.
+    """
+    start = time.perf_counter()
+    if target is None:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        target = os.path.join(BACKUP_DIR, backup_name())
+    partial = target + '.partial'
+    progress = {"steps": 0, "restarts": 0, "remaining": None, "total": 0}
+
+    def on_progress(status, remaining, total):
+        progress["steps"] += 1
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if progress["restarts"] > max_restarts:
+                raise _BackupRestarting()
+        progress["remaining"], progress["total"] = remaining, total
+
+    source = sqlite3.connect(DATABASE, timeout=POOL_TIMEOUT)
+    dest = sqlite3.connect(partial)
+    try:
+        try:
+            source.backup(dest, pages=pages, progress=on_progress, sleep=sleep)
+            single_step = False
+        except _BackupRestarting:
+            source.backup(dest, pages=-1)
+            single_step = True
+        if dest.execute("PRAGMA quick_check").fetchone()[0] != 'ok':
+            raise sqlite3.DatabaseError(f"Backup {target} failed its integrity check")
+        page_count = dest.execute("PRAGMA page_count").fetchone()[0]
+    except:
+        dest.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    dest.close()
+    os.replace(partial, target)
+    return {
+        "path": target,
+        "bytes": os.path.getsize(target),
+        "pages": page_count,
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+        "single_step": single_step,
+        "pruned": prune_backups(keep) if os.path.dirname(os.path.abspath(target)) == os.path.abspath(BACKUP_DIR) else [],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def optimize():
+    with get_connection() as conn:
+        conn.execute("PRAGMA optimize")
+    return {}
+
+
+def analyze():
+    with get_connection() as conn:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return {}
+
+
+def checkpoint(mode='PASSIVE'):
+    """
+    Copy WAL frames back into the database file.
+
+    PASSIVE never waits for readers or writers and may leave frames behind;
+    TRUNCATE also resets the WAL file to zero bytes but waits for them.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"checkpoint mode must be one of: {', '.join(CHECKPOINT_MODES)}")
+    with get_connection() as conn:
+        busy, log, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return {"mode": mode, "busy": bool(busy), "wal_frames": log, "checkpointed": checkpointed}
+
+
+def incremental_vacuum(max_pages=VACUUM_STEP_PAGES):
+    """
+    Return up to ``max_pages`` free pages to the filesystem.
+
+    Does nothing unless the database uses ``auto_vacuum = INCREMENTAL``.
+    """
+    with get_connection() as conn:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if mode != 2:
+            return {"skipped": "auto_vacuum is not INCREMENTAL; run the vacuum task once", "free_pages": before}
+        # The PRAGMA frees one page per step and returns no rows, so
+        # execute() would stop after the first page; executescript() runs it
+        # to completion.
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"freed_pages": before - after, "free_pages": after}
+
+
+def vacuum():
+    """
+    Rebuild the whole file, switching it to ``auto_vacuum = INCREMENTAL``.
+
+    This blocks writers for its duration, so it is never scheduled; run it
+    once by hand on an existing database to enable incremental vacuum.
+    """
+    with get_connection() as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    return {"pages": pages}
+
+
+TASKS = {
+    'backup': backup_database,
+    'optimize': optimize,
+    'analyze': analyze,
+    'checkpoint': checkpoint,
+    'incremental_vacuum': incremental_vacuum,
+    'vacuum': vacuum,
+}
+
+
+def run_maintenance(tasks=FREQUENT_TASKS):
+    """
+    Run maintenance tasks in order and time each one.
+
+    A failing task is reported and does not stop the ones after it.
+
+    Args:
+        tasks (iterable): Names from TASKS.
+
+    Returns:
+        dict: One entry per task with its result or error and elapsed time.
+
+    Raises:
+        ValueError: If a task name is unknown.
+    """
+    unknown = [t for t in tasks if t not in TASKS]
+    if unknown:
+        raise ValueError(f"Unknown maintenance task(s) {', '.join(unknown)}; expected: {', '.join(TASKS)}")
+    started_at = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    results = []
+    for name in tasks:
+        task_start = time.perf_counter()
+        try:
+            result = {"task": name, "ok": True, **TASKS[name]()}
+        except Exception as e:
+            result = {"task": name, "ok": False, "error": str(e)}
+        result["elapsed_ms"] = round((time.perf_counter() - task_start) * 1000, 2)
+        results.append(result)
+    return {"started_at": started_at, "tasks": results, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+class MaintenanceScheduler:
+    """
+    Background worker running task groups on fixed intervals.
+
+    Each job is ``(name, interval, tasks)``; a job whose interval is 0 is
+    disabled. The last report of each job is kept for inspection.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = [(name, interval, tuple(tasks)) for name, interval, tasks in jobs if interval > 0]
+        self.last_runs = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def run(self):
+        due = {name: time.monotonic() + interval for name, interval, _ in self.jobs}
+        while self.jobs and not self.stopped.is_set():
+            now = time.monotonic()
+            for name, interval, tasks in self.jobs:
+                if now >= due[name]:
+                    try:
+                        self.last_runs[name] = run_maintenance(tasks)
+                    except Exception as e:
+                        print(f"Scheduled maintenance {name} failed: {e}")
+                    due[name] = time.monotonic() + interval
+            self.stopped.wait(max(min(due.values()) - time.monotonic(), 0))
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="db-maintenance", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+def start_maintenance(frequent_interval=MAINTENANCE_INTERVAL, daily_interval=BACKUP_INTERVAL):
+    return MaintenanceScheduler([
+        ('frequent', frequent_interval, FREQUENT_TASKS),
+        ('daily', daily_interval, DAILY_TASKS),
+    ]).start()
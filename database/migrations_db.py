@@ -0,0 +1,123 @@
+from connection_db import get_connection
+
+# Ordered forward migrations: (version, description, statements).
+# Never edit or reorder a released entry; append a new version instead.
+MIGRATIONS = [
+    (1, "Index Sales by customer for purchase history", [
+        "CREATE INDEX IF NOT EXISTS idx_sales_customer_date ON Sales (customer_id, order_date)",
+    ]),
+    (2, "Index Reviews by product and by customer", [
+        "CREATE INDEX IF NOT EXISTS idx_reviews_product ON Reviews (product_id)",
+        "CREATE INDEX IF NOT EXISTS idx_reviews_customer ON Reviews (customer_id)",
+    ]),
+    (3, "Index Wishes by customer and age for abandoned wishlist lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_wishes_customer_added ON Wishes (customer_id, added_at)",
+    ]),
+    (4, "Index Inventory by category", [
+        "CREATE INDEX IF NOT EXISTS idx_inventory_category ON Inventory (category)",
+    ]),
+    (5, "Index Sales by customer in sale order for keyset pagination", [
+        "CREATE INDEX IF NOT EXISTS idx_sales_customer ON Sales (customer_id)",
+    ]),
+    (6, "Backfill ProductRatingStats from existing reviews", [
+        "DELETE FROM ProductRatingStats",
+        """INSERT INTO ProductRatingStats (product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+           SELECT product_id, COUNT(*), SUM(rating),
+               SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+           FROM Reviews WHERE rating IS NOT NULL GROUP BY product_id""",
+    ]),
+    (7, "Backfill sales rollups from existing sales", [
+        "DELETE FROM SalesDailyProduct",
+        "DELETE FROM SalesDailyCategory",
+        """INSERT INTO SalesDailyProduct (day, product_id, revenue, units, orders)
+           SELECT date(order_date), product_id, SUM(COALESCE(total_price, 0)), SUM(quantity), COUNT(*)
+           FROM Sales GROUP BY date(order_date), product_id""",
+        """INSERT INTO SalesDailyCategory (day, category, revenue, units, orders)
+           SELECT date(s.order_date), COALESCE(i.category, 'Uncategorized'), SUM(COALESCE(s.total_price, 0)), SUM(s.quantity), COUNT(*)
+           FROM Sales s LEFT JOIN Inventory i ON i.product_id = s.product_id
+           GROUP BY date(s.order_date), COALESCE(i.category, 'Uncategorized')""",
+    ]),
+    (8, "Index existing products for full-text search", [
+        "INSERT INTO InventorySearch (InventorySearch) VALUES ('rebuild')",
+    ]),
+    (9, "Composite Inventory indexes for catalog filtering and sorting", [
+        "CREATE INDEX IF NOT EXISTS idx_inventory_category_price ON Inventory (category, price)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_stock ON Inventory (stock_count)",
+    ]),
+    (10, "Index Wishes by age for the abandoned wishlist sweep", [
+        "CREATE INDEX IF NOT EXISTS idx_wishes_added ON Wishes (added_at)",
+    ]),
+    (11, "Skip the sales rollup delete trigger while rollups are suspended", [
+        "CREATE TABLE IF NOT EXISTS RollupSuspend (reason TEXT PRIMARY KEY NOT NULL)",
+        "DROP TRIGGER IF EXISTS sales_rollup_delete",
+        """CREATE TRIGGER IF NOT EXISTS sales_rollup_delete AFTER DELETE ON Sales
+           WHEN NOT EXISTS (SELECT 1 FROM RollupSuspend)
+           BEGIN
+               UPDATE SalesDailyProduct SET
+                   revenue = revenue - COALESCE(OLD.total_price, 0),
+                   units = units - OLD.quantity,
+                   orders = orders - 1
+               WHERE day = date(OLD.order_date) AND product_id = OLD.product_id;
+               UPDATE SalesDailyCategory SET
+                   revenue = revenue - COALESCE(OLD.total_price, 0),
+                   units = units - OLD.quantity,
+                   orders = orders - 1
+               WHERE day = date(OLD.order_date)
+                   AND category = COALESCE((SELECT category FROM Inventory WHERE product_id = OLD.product_id), 'Uncategorized');
+           END""",
+    ]),
+    (12, "Drop the Sales customer index covered by idx_sales_customer_date", [
+        "DROP INDEX IF EXISTS idx_sales_customer",
+    ]),
+]
+
+def create_schema_version_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS SchemaVersion (
+                version INTEGER PRIMARY KEY NOT NULL,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            ''')
+            conn.commit()
+        print('SchemaVersion table created successfully.')
+    except:
+        print('An error occured while creating the schema version table.')
+
+def get_schema_version(conn):
+    row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM SchemaVersion").fetchone()
+    return row[0]
+
+def run_migrations(migrations=MIGRATIONS):
+    """
+    Apply every migration newer than the recorded schema version.
+
+    Each migration runs in its own BEGIN IMMEDIATE transaction together with its
+    SchemaVersion row, so a failed step leaves the database at the previous
+    version and concurrent starters cannot apply the same step twice.
+
+    Returns:
+        list: Versions applied by this call, empty if the schema was current.
+    """
+    create_schema_version_table()
+    applied = []
+    with get_connection() as conn:
+        for version, description, statements in sorted(migrations, key=lambda m: m[0]):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute("INSERT INTO SchemaVersion (version, description) VALUES (?, ?)", (version, description))
+                conn.commit()
+            except:
+                conn.rollback()
+                print(f"Migration {version} failed: {description}")
+                raise
+            print(f"Applied migration {version}: {description}")
+            applied.append(version)
+    return applied
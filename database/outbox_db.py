@@ -0,0 +1,241 @@
+import json
+import os
+import smtplib
+import threading
+from email.message import EmailMessage
+from connection_db import get_connection
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('ECOMMERCE_OUTBOX_BATCH_SIZE', 100))
+OUTBOX_INTERVAL = float(os.environ.get('ECOMMERCE_OUTBOX_INTERVAL', 1.0))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('ECOMMERCE_OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_SINK = os.environ.get('ECOMMERCE_NOTIFY_SINK', 'log:notifications.log')
+# A claimed row becomes due again after this long, so a crash mid-delivery is retried.
+OUTBOX_LEASE_SECONDS = 60
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 3600
+
+
+def create_outbox_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS NotificationOutbox (
+                outbox_id INTEGER PRIMARY KEY NOT NULL,
+                kind VARCHAR(50) NOT NULL,
+                customer_id INT NOT NULL,
+                payload TEXT NOT NULL,
+                dedupe_key VARCHAR(255) UNIQUE,
+                status VARCHAR(10) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+                attempts INT NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at TIMESTAMP
+                );
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON NotificationOutbox (status, next_attempt_at)")
+            conn.commit()
+        print('NotificationOutbox table created successfully.')
+    except:
+        print('An error occured while creating the notification outbox table.')
+
+
+def enqueue_notifications(conn, notifications):
+    """
+    Append notifications to the outbox on the caller's connection.
+
+    No commit is issued: the rows become visible, and deliverable, only when
+    the caller's transaction commits, together with the change that caused
+    them. A notification whose ``dedupe_key`` is already in the outbox is
+    skipped.
+
+    Args:
+        conn (sqlite3.Connection): Connection holding the caller's transaction.
+        notifications (list): Dicts with kind, customer_id, payload (JSON
+            serializable) and an optional dedupe_key.
+
+    Returns:
+        int: Number of notifications actually queued.
+    """
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT INTO NotificationOutbox (kind, customer_id, payload, dedupe_key) VALUES (?, ?, ?, ?) ON CONFLICT (dedupe_key) DO NOTHING",
+        [(n["kind"], n["customer_id"], json.dumps(n["payload"]), n.get("dedupe_key")) for n in notifications],
+    )
+    return conn.total_changes - before
+
+
+def outbox_stats():
+    with get_connection() as conn:
+        counts = {row["status"]: row["count"] for row in conn.execute("SELECT status, COUNT(*) AS count FROM NotificationOutbox GROUP BY status")}
+        oldest = conn.execute("SELECT MIN(created_at) FROM NotificationOutbox WHERE status = 'pending'").fetchone()[0]
+    return {
+        "pending": counts.get("pending", 0),
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending": oldest,
+    }
+
+
+class LogFileSink:
+    """
+    Appends each notification as one JSON line to a file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, notification):
+        with self.lock, open(self.path, 'a') as f:
+            f.write(json.dumps(notification) + "\n")
+
+
+class SmtpSink:
+    """
+    Sends each notification as an email through an SMTP server, e.g. a local stand-in.
+
+    Customers have no email address on record, so mail goes to
+    ``customer-<id>@<domain>``.
+    """
+
+    def __init__(self, host='localhost', port=1025, sender='noreply@ecommerce.local', domain='customers.ecommerce.local'):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.domain = domain
+
+    def send(self, notification):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = f"customer-{notification['customer_id']}@{self.domain}"
+        message["Subject"] = notification["kind"].replace('_', ' ').capitalize()
+        message["Message-ID"] = f"<outbox-{notification['outbox_id']}@{self.domain}>"
+        message.set_content(notification["payload"].get("message", json.dumps(notification["payload"])))
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(message)
+
+
+def build_sink(spec=OUTBOX_SINK):
+    """
+    Create a sink from ``log:<path>`` or ``smtp:<host>:<port>``.
+
+    Raises:
+        ValueError: If the spec names an unknown sink.
+    """
+    kind, _, target = spec.partition(':')
+    if kind == 'log':
+        return LogFileSink(target or 'notifications.log')
+    if kind == 'smtp':
+        host, _, port = target.partition(':')
+        return SmtpSink(host or 'localhost', int(port or 1025))
+    raise ValueError(f"Unknown notification sink: {spec}")
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+class OutboxDispatcher:
+    """
+    Background worker that drains the outbox in batches to a sink.
+
+    Each batch is claimed in one short write transaction that pushes its
+    rows' next_attempt_at forward by a lease, then delivered outside any
+    transaction. Delivered rows are marked sent; failed ones are retried
+    with exponential backoff until ``max_attempts``, then marked failed.
+    Delivery is at-least-once; sinks get the outbox_id to deduplicate on.
+    """
+
+    def __init__(self, sink, batch_size=OUTBOX_BATCH_SIZE, interval=OUTBOX_INTERVAL, max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def claim_batch(self):
+        with get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute('''
+                    UPDATE NotificationOutbox
+                    SET attempts = attempts + 1, next_attempt_at = datetime('now', ?)
+                    WHERE outbox_id IN (
+                        SELECT outbox_id FROM NotificationOutbox
+                        WHERE status = 'pending' AND next_attempt_at <= datetime('now')
+                        ORDER BY next_attempt_at, outbox_id
+                        LIMIT ?
+                    )
+                    RETURNING outbox_id, kind, customer_id, payload, attempts, created_at
+                ''', (f"+{OUTBOX_LEASE_SECONDS} seconds", self.batch_size)).fetchall()
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+        batch = [dict(row, payload=json.loads(row["payload"])) for row in rows]
+        return sorted(batch, key=lambda n: n["outbox_id"])
+
+    def dispatch_once(self):
+        """
+        Claim and deliver one batch.
+
+        Returns:
+            dict: Numbers of notifications sent, scheduled for retry and failed for good.
+        """
+        batch = self.claim_batch()
+        sent, failures = [], []
+        for notification in batch:
+            try:
+                self.sink.send(notification)
+                sent.append(notification["outbox_id"])
+            except Exception as e:
+                failures.append((notification, str(e)))
+        with get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE NotificationOutbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE outbox_id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(sent),),
+                )
+                conn.executemany(
+                    "UPDATE NotificationOutbox SET status = ?, next_attempt_at = datetime('now', ?), last_error = ? WHERE outbox_id = ?",
+                    [
+                        ('failed' if n["attempts"] >= self.max_attempts else 'pending',
+                         f"+{retry_delay(n['attempts'])} seconds", error, n["outbox_id"])
+                        for n, error in failures
+                    ],
+                )
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+        given_up = sum(1 for n, _ in failures if n["attempts"] >= self.max_attempts)
+        return {"sent": len(sent), "retrying": len(failures) - given_up, "failed": given_up}
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                result = self.dispatch_once()
+            except Exception as e:
+                print(f"Outbox dispatch failed: {e}")
+                result = {"sent": 0, "retrying": 0, "failed": 0}
+            # Keep draining while batches come back full; otherwise wait for new rows.
+            if sum(result.values()) < self.batch_size:
+                self.stopped.wait(self.interval)
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="outbox-dispatcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+def start_dispatcher(sink_spec=OUTBOX_SINK):
+    return OutboxDispatcher(build_sink(sink_spec)).start()
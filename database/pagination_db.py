@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class Page:
+    """
+    Keyset pagination window: rows with a key greater than ``after``, at most ``limit`` of them.
+
+    ``limit`` is -1 (no limit in SQLite) when the client did not ask for
+    pagination, so the same query serves both paged and legacy full reads.
+    """
+
+    def __init__(self, after=0, limit=-1, requested=False):
+        self.after = after
+        self.limit = limit
+        self.requested = requested
+
+
+def encode_cursor(last_key):
+    raw = json.dumps({"after": last_key}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        after = json.loads(raw)["after"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(after, int) or isinstance(after, bool):
+        raise ValueError("Invalid cursor")
+    return after
+
+
+def parse_page_args(args):
+    """
+    Build a Page from the ``limit`` and ``cursor`` query parameters.
+
+    Args:
+        args (Mapping): Request query parameters.
+
+    Returns:
+        Page: An unbounded page when neither parameter is present.
+
+    Raises:
+        ValueError: If the limit is out of range or the cursor is malformed.
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is None and cursor is None:
+        return Page()
+    after = decode_cursor(cursor) if cursor else 0
+    return Page(after, parse_limit(limit), True)
+
+
+def parse_limit(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def encode_keyset_cursor(sort, last_key):
+    raw = json.dumps({"sort": sort, "after": list(last_key)}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_keyset_cursor(cursor, sort, size):
+    """
+    Decode a cursor issued by ``encode_keyset_cursor`` for the same sort.
+
+    Returns:
+        list: The ``size`` key values of the last row of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        after = raw["after"]
+        issued_for = raw["sort"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if issued_for != sort:
+        raise ValueError("Cursor was issued for a different sort")
+    if not isinstance(after, list) or len(after) != size:
+        raise ValueError("Invalid cursor")
+    return after
+
+
+def page_response(items, page, last_key):
+    """
+    Shape a page of results for the response body.
+
+    Args:
+        items (list): The serialized rows of this page.
+        page (Page): The requested window.
+        last_key (int): Key of the last row read, used for the next cursor.
+
+    Returns:
+        list or dict: The bare list for unpaginated requests, otherwise
+        ``{"items": [...], "next_cursor": str or None}``.
+    """
+    if not page.requested:
+        return items
+    next_cursor = encode_cursor(last_key) if len(items) == page.limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,24 @@
+"""
+Recompute ProductRatingStats from the Reviews table.
+
+Run after bulk-loading reviews outside the application, or to repair the
+aggregates if they drift.
+
+Usage:
+    python rebuild_rating_stats.py [product_id]
+"""
+import sys
+
+from reviews_db import create_rating_stats_table, rebuild_rating_stats
+
+
+def main():
+    product_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    create_rating_stats_table()
+    rebuilt = rebuild_rating_stats(product_id)
+    target = f"product {product_id}" if product_id is not None else "all products"
+    print(f"Rebuilt rating stats for {target}: {rebuilt} product(s) with ratings.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,123 +1,109 @@
-import sqlite3
+import json
+from connection_db import get_connection
 
-def connect_to_db():
-    conn = sqlite3.connect('ecommerce.db')
-    return conn
+MAX_MODERATION_BATCH = 1000
 
 def create_reviews_table():
     try:
-        conn = connect_to_db()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS Reviews (
-            review_id INTEGER PRIMARY KEY NOT NULL,
-            customer_id INT NOT NULL,
-            product_id INT NOT NULL,
-            rating INT CHECK (rating BETWEEN 1 AND 5),
-            comment TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            FOREIGN KEY (customer_id) REFERENCES Customers(customer_id),
-            FOREIGN KEY (product_id) REFERENCES Inventory(product_id)
-        );
-        ''')
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS Reviews (
+                review_id INTEGER PRIMARY KEY NOT NULL,
+                customer_id INT NOT NULL,
+                product_id INT NOT NULL,
+                rating INT CHECK (rating BETWEEN 1 AND 5),
+                comment TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP,
+                FOREIGN KEY (customer_id) REFERENCES Customers(customer_id),
+                FOREIGN KEY (product_id) REFERENCES Inventory(product_id)
+            );
+            ''')
+            conn.commit()
         print('Reviews table created successfully.')
     except:
         print('An error occured while creating the reviews table.')
-    finally:
-        conn.close()
 
 def create_moderation_table():
     try:
-        conn = connect_to_db()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS Moderate (
-            review_id INTEGER PRIMARY KEY NOT NULL,
-            customer_id INT NOT NULL,
-            product_id INT NOT NULL,
-            rating INT CHECK (rating BETWEEN 1 AND 5),
-            comment TEXT,
-            FOREIGN KEY (customer_id) REFERENCES Customers(customer_id),
-            FOREIGN KEY (product_id) REFERENCES Inventory(product_id)
-        );
-        ''')
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS Moderate (
+                review_id INTEGER PRIMARY KEY NOT NULL,
+                customer_id INT NOT NULL,
+                product_id INT NOT NULL,
+                rating INT CHECK (rating BETWEEN 1 AND 5),
+                comment TEXT,
+                FOREIGN KEY (customer_id) REFERENCES Customers(customer_id),
+                FOREIGN KEY (product_id) REFERENCES Inventory(product_id)
+            );
+            ''')
+            conn.commit()
         print('Moderation table created successfully.')
     except:
         print('An error occured while creating the moderation table.')
-    finally:
-        conn.close()
 
 
 def approve_review(review):
     inserted_review = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Reviews (customer_id, product_id, rating, comment) VALUES (?, ?, ?, ?)", (review['customer_id'], review['product_id'], review['rating'], review['comment']))
-        conn.commit()
-        inserted_review = get_review_by_id(cur.lastrowid)
+        if review.get('review_id') is not None:
+            result = moderate_reviews(approve_ids=[review['review_id']])
+            return result["approved"][0] if result["approved"] else {}
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO Reviews (customer_id, product_id, rating, comment) VALUES (?, ?, ?, ?) RETURNING review_id, customer_id, product_id, rating, comment", (review['customer_id'], review['product_id'], review['rating'], review['comment']))
+            inserted_review = dict(cur.fetchone())
+            conn.commit()
     except:
         print("Insertion failed.")
-        conn().rollback()
-    finally:
-        conn.close()
     return inserted_review
 
 def reject_review(review):
     message = {}
     try:
-        conn = connect_to_db()
-        conn.execute("DELETE from Moderate WHERE review_id = ?",(review['review_id'],))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("DELETE from Moderate WHERE review_id = ?",(review['review_id'],))
+            conn.commit()
         message["status"] = "Unposted review deleted successfully"
     except:
         print("Deletion failed.")
-        conn.rollback()
         message["status"] = "Cannot delete unposted review"
-    finally:
-        conn.close()
     return message
 
 def update_review(review):
     updated_review = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("UPDATE Reviews SET customer_id = ?, product_id = ?, rating = ?, comment = ? WHERE review_id = ?", (review['customer_id'], review['product_id'], review['rating'], review['comment'], review['review_id']))
-        conn.commit()
-        updated_review = get_review_by_id(review["review_id"])
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE Reviews SET customer_id = ?, product_id = ?, rating = ?, comment = ? WHERE review_id = ? RETURNING review_id, customer_id, product_id, rating, comment", (review['customer_id'], review['product_id'], review['rating'], review['comment'], review['review_id']))
+            row = cur.fetchone()
+            conn.commit()
+            updated_review = dict(row) if row else {}
     except:
         print("Update failed.")
-        conn.rollback()
         updated_review = {}
-    finally:
-        conn.close() 
     return updated_review
 
 def delete_review(review_id):
     message = {}
     try:
-        conn = connect_to_db()
-        conn.execute("DELETE from Reviews WHERE review_id = ?",(review_id,))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("DELETE from Reviews WHERE review_id = ?",(review_id,))
+            conn.commit()
         message["status"] = "Review deleted successfully"
     except:
         print("Deletion failed.")
-        conn.rollback()
         message["status"] = "Cannot delete review"
-    finally:
-        conn.close()
     return message
 
-def get_product_reviews(product_id):
+def get_product_reviews(product_id, after=0, limit=-1):
     reviews = []
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Reviews WHERE product_id = ?", (product_id,))
-        rows = cur.fetchall()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Reviews WHERE product_id = ? AND review_id > ? ORDER BY review_id LIMIT ?", (product_id, after, limit))
+            rows = cur.fetchall()
         for i in rows:
             review = {}
             review["customer_id"] = i["customer_id"]
@@ -134,11 +120,10 @@ def get_product_reviews(product_id):
 def get_customer_reviews(customer_id):
     reviews = []
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Reviews WHERE customer_id = ?", (customer_id,))
-        rows = cur.fetchall()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Reviews WHERE customer_id = ?", (customer_id,))
+            rows = cur.fetchall()
         for i in rows:
             review = {}
             review["customer_id"] = i["customer_id"]
@@ -155,11 +140,10 @@ def get_customer_reviews(customer_id):
 def get_review_by_id(review_id):
     review = {}
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Reviews WHERE review_id = ?",(review_id,))
-        row = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Reviews WHERE review_id = ?",(review_id,))
+            row = cur.fetchone()
         review["review_id"] = row["review_id"]
         review["customer_id"] = row["customer_id"]
         review["product_id"] = row["product_id"]
@@ -173,11 +157,10 @@ def get_review_by_id(review_id):
 def get_moderate_by_id(review_id):
     review = {}
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Moderate WHERE review_id = ?",(review_id,))
-        row = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Moderate WHERE review_id = ?",(review_id,))
+            row = cur.fetchone()
         review["review_id"] = row["review_id"]
         review["customer_id"] = row["customer_id"]
         review["product_id"] = row["product_id"]
@@ -191,14 +174,218 @@ def get_moderate_by_id(review_id):
 def submit_review(review):
     submitted_review = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Moderate (customer_id, product_id, rating, comment) VALUES (?, ?, ?, ?)", (review['customer_id'], review['product_id'], review['rating'], review['comment']))
-        conn.commit()
-        submitted_review = get_moderate_by_id(cur.lastrowid)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO Moderate (customer_id, product_id, rating, comment) VALUES (?, ?, ?, ?) RETURNING *", (review['customer_id'], review['product_id'], review['rating'], review['comment']))
+            submitted_review = dict(cur.fetchone())
+            conn.commit()
     except:
         print("Insertion failed.")
-        conn().rollback()
-    finally:
-        conn.close()
     return submitted_review
+
+STAR_COLUMNS = ('stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5')
+
+# Adds one review's rating (NEW) to, or removes one (OLD) from, its product's row.
+_ADD_RATING = '''
+                INSERT INTO ProductRatingStats (product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+                VALUES (NEW.product_id, 1, NEW.rating, NEW.rating = 1, NEW.rating = 2, NEW.rating = 3, NEW.rating = 4, NEW.rating = 5)
+                ON CONFLICT (product_id) DO UPDATE SET
+                    review_count = review_count + 1,
+                    rating_sum = rating_sum + excluded.rating_sum,
+                    stars_1 = stars_1 + excluded.stars_1,
+                    stars_2 = stars_2 + excluded.stars_2,
+                    stars_3 = stars_3 + excluded.stars_3,
+                    stars_4 = stars_4 + excluded.stars_4,
+                    stars_5 = stars_5 + excluded.stars_5;
+'''
+_REMOVE_RATING = '''
+                UPDATE ProductRatingStats SET
+                    review_count = review_count - 1,
+                    rating_sum = rating_sum - OLD.rating,
+                    stars_1 = stars_1 - (OLD.rating = 1),
+                    stars_2 = stars_2 - (OLD.rating = 2),
+                    stars_3 = stars_3 - (OLD.rating = 3),
+                    stars_4 = stars_4 - (OLD.rating = 4),
+                    stars_5 = stars_5 - (OLD.rating = 5)
+                WHERE product_id = OLD.product_id;
+'''
+
+def create_rating_stats_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ProductRatingStats (
+                product_id INTEGER PRIMARY KEY NOT NULL,
+                review_count INT NOT NULL DEFAULT 0,
+                rating_sum INT NOT NULL DEFAULT 0,
+                stars_1 INT NOT NULL DEFAULT 0,
+                stars_2 INT NOT NULL DEFAULT 0,
+                stars_3 INT NOT NULL DEFAULT 0,
+                stars_4 INT NOT NULL DEFAULT 0,
+                stars_5 INT NOT NULL DEFAULT 0,
+                FOREIGN KEY (product_id) REFERENCES Inventory(product_id)
+            );
+            ''')
+            # Triggers keep the aggregates in step with every write to Reviews,
+            # whichever code path issues it. Unrated reviews are not counted.
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS reviews_rating_insert AFTER INSERT ON Reviews
+                WHEN NEW.rating IS NOT NULL
+                BEGIN {_ADD_RATING} END;
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS reviews_rating_delete AFTER DELETE ON Reviews
+                WHEN OLD.rating IS NOT NULL
+                BEGIN {_REMOVE_RATING} END;
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS reviews_rating_update_old AFTER UPDATE OF product_id, rating ON Reviews
+                WHEN OLD.rating IS NOT NULL
+                BEGIN {_REMOVE_RATING} END;
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS reviews_rating_update_new AFTER UPDATE OF product_id, rating ON Reviews
+                WHEN NEW.rating IS NOT NULL
+                BEGIN {_ADD_RATING} END;
+            ''')
+            conn.commit()
+        print('ProductRatingStats table created successfully.')
+    except:
+        print('An error occured while creating the product rating stats table.')
+
+def rating_stats_from_row(product_id, row):
+    count = row["review_count"] if row else 0
+    total = row["rating_sum"] if row else 0
+    return {
+        "product_id": product_id,
+        "review_count": count,
+        "average_rating": round(total / count, 2) if count else None,
+        "histogram": {str(star): (row[column] if row else 0) for star, column in enumerate(STAR_COLUMNS, start=1)},
+    }
+
+def get_product_rating_stats(product_id):
+    """
+    Read a product's rating aggregates with a single primary-key lookup.
+
+    Returns:
+        dict: review_count, average_rating (None without ratings) and a
+        per-star histogram. Products without reviews report zero counts.
+    """
+    stats = {}
+    try:
+        with get_connection() as conn:
+            row = conn.execute("SELECT * FROM ProductRatingStats WHERE product_id = ?", (product_id,)).fetchone()
+        stats = rating_stats_from_row(product_id, row)
+    except:
+        print(f"Failed to fetch rating stats for product: {product_id}.")
+    return stats
+
+def rebuild_rating_stats(product_id=None):
+    """
+    Recompute rating aggregates from the Reviews table.
+
+    Used to backfill after an import or to repair drift. Runs in one
+    BEGIN IMMEDIATE transaction so the triggers cannot interleave with it.
+
+    Args:
+        product_id (int, optional): Only rebuild this product; all products otherwise.
+
+    Returns:
+        int: Number of products with ratings after the rebuild.
+    """
+    where = "" if product_id is None else "AND product_id = ?"
+    params = () if product_id is None else (product_id,)
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DELETE FROM ProductRatingStats WHERE 1 = 1 {where}", params)
+            cur = conn.execute(f'''
+                INSERT INTO ProductRatingStats (product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+                SELECT product_id, COUNT(*), SUM(rating),
+                    SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+                FROM Reviews
+                WHERE rating IS NOT NULL {where}
+                GROUP BY product_id
+            ''', params)
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    return cur.rowcount
+
+def _review_ids(ids, name):
+    ids = list(dict.fromkeys(ids or []))
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError(f"{name} must be a list of review ids")
+    return ids
+
+def moderate_reviews(approve_ids=(), reject_ids=()):
+    """
+    Approve and reject a batch of pending reviews in one transaction.
+
+    Approved rows are copied from Moderate to Reviews with a single
+    INSERT ... SELECT, then every approved or rejected row is removed from
+    Moderate with a single DELETE. Ids that are not pending are reported
+    rather than failing the batch.
+
+    Args:
+        approve_ids (list): Moderate review ids to publish.
+        reject_ids (list): Moderate review ids to discard.
+
+    Returns:
+        dict: ``approved`` (the new Reviews rows), ``rejected`` (ids removed)
+        and ``missing`` (requested ids that were not pending).
+
+    Raises:
+        ValueError: If the ids are malformed, overlap or exceed MAX_MODERATION_BATCH.
+    """
+    approve_ids = _review_ids(approve_ids, "approve")
+    reject_ids = _review_ids(reject_ids, "reject")
+    if set(approve_ids) & set(reject_ids):
+        raise ValueError("A review cannot be both approved and rejected")
+    if len(approve_ids) + len(reject_ids) > MAX_MODERATION_BATCH:
+        raise ValueError(f"At most {MAX_MODERATION_BATCH} reviews can be moderated per batch")
+    requested = approve_ids + reject_ids
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pending = {
+                row["review_id"]
+                for row in conn.execute("SELECT review_id FROM Moderate WHERE review_id IN (SELECT value FROM json_each(?))", (json.dumps(requested),))
+            }
+            approved = [
+                dict(row)
+                for row in conn.execute('''
+                    INSERT INTO Reviews (customer_id, product_id, rating, comment)
+                    SELECT customer_id, product_id, rating, comment FROM Moderate
+                    WHERE review_id IN (SELECT value FROM json_each(?))
+                    ORDER BY review_id
+                    RETURNING review_id, customer_id, product_id, rating, comment
+                ''', (json.dumps(approve_ids),)).fetchall()
+            ]
+            conn.execute("DELETE FROM Moderate WHERE review_id IN (SELECT value FROM json_each(?))", (json.dumps(requested),))
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    return {
+        "approved": approved,
+        "rejected": [i for i in reject_ids if i in pending],
+        "missing": [i for i in requested if i not in pending],
+    }
+
+def get_moderation_queue(after=0, limit=-1, product_id=None):
+    reviews = []
+    try:
+        where = "review_id > ?"
+        params = [after]
+        if product_id is not None:
+            where += " AND product_id = ?"
+            params.append(product_id)
+        with get_connection() as conn:
+            rows = conn.execute(f"SELECT * FROM Moderate WHERE {where} ORDER BY review_id LIMIT ?", params + [limit]).fetchall()
+        reviews = [dict(row) for row in rows]
+    except:
+        print("Failed to fetch the moderation queue.")
+        reviews = []
+    return reviews
@@ -0,0 +1,243 @@
+from datetime import date
+from connection_db import get_connection
+
+# Category recorded for sales whose product no longer exists in Inventory.
+UNKNOWN_CATEGORY = 'Uncategorized'
+
+_SALE_CATEGORY = f"COALESCE((SELECT category FROM Inventory WHERE product_id = {{row}}.product_id), '{UNKNOWN_CATEGORY}')"
+
+# Adds one sale (NEW) to, or removes one (OLD) from, its day's rollup rows.
+_ADD_SALE = f'''
+                INSERT INTO SalesDailyProduct (day, product_id, revenue, units, orders)
+                VALUES (date(NEW.order_date), NEW.product_id, COALESCE(NEW.total_price, 0), NEW.quantity, 1)
+                ON CONFLICT (day, product_id) DO UPDATE SET
+                    revenue = revenue + excluded.revenue,
+                    units = units + excluded.units,
+                    orders = orders + 1;
+                INSERT INTO SalesDailyCategory (day, category, revenue, units, orders)
+                VALUES (date(NEW.order_date), {_SALE_CATEGORY.format(row='NEW')}, COALESCE(NEW.total_price, 0), NEW.quantity, 1)
+                ON CONFLICT (day, category) DO UPDATE SET
+                    revenue = revenue + excluded.revenue,
+                    units = units + excluded.units,
+                    orders = orders + 1;
+'''
+_REMOVE_SALE = f'''
+                UPDATE SalesDailyProduct SET
+                    revenue = revenue - COALESCE(OLD.total_price, 0),
+                    units = units - OLD.quantity,
+                    orders = orders - 1
+                WHERE day = date(OLD.order_date) AND product_id = OLD.product_id;
+                UPDATE SalesDailyCategory SET
+                    revenue = revenue - COALESCE(OLD.total_price, 0),
+                    units = units - OLD.quantity,
+                    orders = orders - 1
+                WHERE day = date(OLD.order_date) AND category = {_SALE_CATEGORY.format(row='OLD')};
+'''
+
+# Moves a product's totals between two categories on every day it sold, so
+# SalesDailyCategory keeps matching the product's current category, which is
+# what the sale triggers and rebuild_sales_rollups look up.
+_MOVE_PRODUCT = f'''
+                INSERT INTO SalesDailyCategory (day, category, revenue, units, orders)
+                SELECT day, {{to}}, revenue, units, orders FROM SalesDailyProduct WHERE product_id = {{row}}.product_id
+                ON CONFLICT (day, category) DO UPDATE SET
+                    revenue = revenue + excluded.revenue,
+                    units = units + excluded.units,
+                    orders = orders + excluded.orders;
+                UPDATE SalesDailyCategory SET
+                    revenue = SalesDailyCategory.revenue - p.revenue,
+                    units = SalesDailyCategory.units - p.units,
+                    orders = SalesDailyCategory.orders - p.orders
+                FROM SalesDailyProduct p
+                WHERE p.product_id = {{row}}.product_id AND SalesDailyCategory.day = p.day AND SalesDailyCategory.category = {{source}};
+'''
+
+def _move_product(row, source, to):
+    return _MOVE_PRODUCT.format(row=row, source=source, to=to)
+
+def _category_of(row):
+    return f"COALESCE({row}.category, '{UNKNOWN_CATEGORY}')"
+
+_UNKNOWN = f"'{UNKNOWN_CATEGORY}'"
+
+# Removing sales from the hot table without un-selling them (archival) must
+# leave the rollups alone: the delete trigger is skipped while a row exists in
+# RollupSuspend, which callers insert and remove inside their own transaction.
+SALES_ROLLUP_DELETE_TRIGGER = f'''
+                CREATE TRIGGER IF NOT EXISTS sales_rollup_delete AFTER DELETE ON Sales
+                WHEN NOT EXISTS (SELECT 1 FROM RollupSuspend)
+                BEGIN {_REMOVE_SALE} END;
+'''
+
+def create_sales_rollup_tables():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS SalesDailyProduct (
+                day TEXT NOT NULL,
+                product_id INT NOT NULL,
+                revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                units INT NOT NULL DEFAULT 0,
+                orders INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, product_id)
+                ) WITHOUT ROWID;
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS SalesDailyCategory (
+                day TEXT NOT NULL,
+                category VARCHAR(50) NOT NULL,
+                revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                units INT NOT NULL DEFAULT 0,
+                orders INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, category)
+                ) WITHOUT ROWID;
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS RollupSuspend (
+                reason TEXT PRIMARY KEY NOT NULL
+                );
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_daily_product_product ON SalesDailyProduct (product_id, day)")
+            # The checkout path inserts into Sales inside its transaction, so the
+            # rollups are updated atomically with the sale; the triggers also
+            # cover manual sale edits and deletions.
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON Sales BEGIN {_ADD_SALE} END;")
+            conn.execute(SALES_ROLLUP_DELETE_TRIGGER)
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS sales_rollup_update
+                AFTER UPDATE OF product_id, quantity, total_price, order_date ON Sales
+                BEGIN {_REMOVE_SALE} {_ADD_SALE} END;
+            ''')
+            # A recategorised product takes its past sales along; a deleted one
+            # leaves them under UNKNOWN_CATEGORY, and a new product reusing its
+            # id claims them back.
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS inventory_rollup_category
+                AFTER UPDATE OF category ON Inventory WHEN OLD.category IS NOT NEW.category
+                BEGIN {_move_product('NEW', _category_of('OLD'), _category_of('NEW'))} END;
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS inventory_rollup_delete AFTER DELETE ON Inventory
+                BEGIN {_move_product('OLD', _category_of('OLD'), _UNKNOWN)} END;
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS inventory_rollup_insert AFTER INSERT ON Inventory
+                BEGIN {_move_product('NEW', _UNKNOWN, _category_of('NEW'))} END;
+            ''')
+            conn.commit()
+        print('Sales rollup tables created successfully.')
+    except:
+        print('An error occured while creating the sales rollup tables.')
+
+def suspend_rollups(conn, reason):
+    conn.execute("INSERT INTO RollupSuspend (reason) VALUES (?)", (reason,))
+
+def resume_rollups(conn, reason):
+    conn.execute("DELETE FROM RollupSuspend WHERE reason = ?", (reason,))
+
+def rebuild_sales_rollups(since=None):
+    """
+    Recompute both rollup tables from the Sales table.
+
+    Args:
+        since (str, optional): Only rebuild days from this ``YYYY-MM-DD`` on.
+            Pass the archive boundary once sales have been archived, so the
+            rollups of archived days, no longer in Sales, are kept.
+
+    Returns:
+        dict: Number of (day, product) and (day, category) rows written.
+    """
+    since = since or ''
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM SalesDailyProduct WHERE day >= ?", (since,))
+            conn.execute("DELETE FROM SalesDailyCategory WHERE day >= ?", (since,))
+            products = conn.execute('''
+                INSERT INTO SalesDailyProduct (day, product_id, revenue, units, orders)
+                SELECT date(order_date), product_id, SUM(COALESCE(total_price, 0)), SUM(quantity), COUNT(*)
+                FROM Sales WHERE order_date >= ? GROUP BY date(order_date), product_id
+            ''', (since,)).rowcount
+            categories = conn.execute(f'''
+                INSERT INTO SalesDailyCategory (day, category, revenue, units, orders)
+                SELECT date(s.order_date), COALESCE(i.category, '{UNKNOWN_CATEGORY}'), SUM(COALESCE(s.total_price, 0)), SUM(s.quantity), COUNT(*)
+                FROM Sales s LEFT JOIN Inventory i ON i.product_id = s.product_id
+                WHERE s.order_date >= ?
+                GROUP BY date(s.order_date), COALESCE(i.category, '{UNKNOWN_CATEGORY}')
+            ''', (since,)).rowcount
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    return {"products": products, "categories": categories}
+
+def parse_date_range(start, end):
+    """
+    Validate an inclusive ``YYYY-MM-DD`` date range.
+
+    Raises:
+        ValueError: If either date is missing or malformed, or start is after end.
+    """
+    if not start or not end:
+        raise ValueError("start and end are required (YYYY-MM-DD)")
+    try:
+        start_day, end_day = date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError:
+        raise ValueError("start and end must be dates in YYYY-MM-DD format")
+    if start_day > end_day:
+        raise ValueError("start must not be after end")
+    return start_day.isoformat(), end_day.isoformat()
+
+def _rollup_report(table, key, start, end, value=None):
+    start, end = parse_date_range(start, end)
+    where = "day BETWEEN ? AND ?"
+    params = [start, end]
+    if value is not None:
+        where += f" AND {key} = ?"
+        params.append(value)
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT day, {key}, revenue, units, orders FROM {table} WHERE {where} AND orders > 0 ORDER BY day, {key}",
+            params,
+        ).fetchall()
+    days = [dict(row) for row in rows]
+    totals = {
+        "revenue": round(sum(row["revenue"] for row in days), 2),
+        "units": sum(row["units"] for row in days),
+        "orders": sum(row["orders"] for row in days),
+    }
+    return {"start": start, "end": end, "days": days, "totals": totals}
+
+def get_product_sales_report(start, end, product_id=None):
+    """
+    Daily revenue, units and order count per product over an inclusive date range.
+
+    Args:
+        start (str): First day, ``YYYY-MM-DD``.
+        end (str): Last day, ``YYYY-MM-DD``.
+        product_id (int, optional): Restrict the report to one product.
+
+    Returns:
+        dict: ``days`` (one row per day and product) and range ``totals``.
+
+    Raises:
+        ValueError: If the date range is invalid.
+    """
+    return _rollup_report("SalesDailyProduct", "product_id", start, end, product_id)
+
+def get_category_sales_report(start, end, category=None):
+    """
+    Daily revenue, units and order count per category over an inclusive date range.
+
+    Args:
+        start (str): First day, ``YYYY-MM-DD``.
+        end (str): Last day, ``YYYY-MM-DD``.
+        category (str, optional): Restrict the report to one category.
+
+    Returns:
+        dict: ``days`` (one row per day and category) and range ``totals``.
+
+    Raises:
+        ValueError: If the date range is invalid.
+    """
+    return _rollup_report("SalesDailyCategory", "category", start, end, category)
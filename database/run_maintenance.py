@@ -0,0 +1,27 @@
+"""
+Run database maintenance tasks by hand or from cron and print their timings.
+
+With no arguments the frequent tasks run (optimize, checkpoint,
+incremental_vacuum). ``backup`` copies the live database without blocking
+writers; ``vacuum`` rebuilds the file and does block them.
+
+Usage:
+    python run_maintenance.py [task ...]
+"""
+import sys
+
+from maintenance_db import run_maintenance, FREQUENT_TASKS
+
+
+def main():
+    report = run_maintenance(sys.argv[1:] or FREQUENT_TASKS)
+    for task in report["tasks"]:
+        details = {k: v for k, v in task.items() if k not in ('task', 'ok', 'elapsed_ms')}
+        status = "ok" if task["ok"] else "FAILED"
+        print(f"{task['task']}: {status} in {task['elapsed_ms']} ms {details or ''}".rstrip())
+    print(f"Done in {report['elapsed_ms']} ms.")
+    return 0 if all(task["ok"] for task in report["tasks"]) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import json
+from connection_db import get_connection
+
+STREAM_BATCH_SIZE = 500
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def iter_row_batches(sql, params=(), batch_size=STREAM_BATCH_SIZE):
+    """
+    Yield the rows of a query in ``fetchmany`` batches of plain dicts.
+
+    The pooled connection is held only while the generator is being consumed
+    and is returned when it finishes or is closed. Under WAL the long read
+    does not block writers.
+    """
+    with get_connection() as conn:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(row) for row in rows]
+
+
+def ndjson_chunks(batches):
+    for batch in batches:
+        yield "".join(json.dumps(row) + "\n" for row in batch)
+
+
+def json_array_chunks(batches):
+    yield "["
+    first = True
+    for batch in batches:
+        chunk = ",".join(json.dumps(row) for row in batch)
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]"
+
+
+def stream_query(sql, params=(), fmt="ndjson", batch_size=STREAM_BATCH_SIZE):
+    """
+    Serialize a query as NDJSON lines or as a chunked JSON array.
+
+    Args:
+        sql (str): The SELECT to stream.
+        params (tuple): Its parameters.
+        fmt (str): ``"ndjson"`` or ``"json"``.
+        batch_size (int): Rows fetched and emitted per chunk.
+
+    Returns:
+        tuple: (generator of str chunks, content type).
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"stream must be one of: {', '.join(STREAM_FORMATS)}")
+    batches = iter_row_batches(sql, params, batch_size)
+    chunks = ndjson_chunks(batches) if fmt == "ndjson" else json_array_chunks(batches)
+    return chunks, STREAM_FORMATS[fmt]
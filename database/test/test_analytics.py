@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+from connection_db import get_connection
+from archive_db import archive_sales
+import analytics_db
+
+class TestSalesBreakdown(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+        analytics_db._columns_cache.clear()
+
+    def breakdown(self, engine):
+        response = self.client.get(f'/sales/analytics?by=category&engine={engine}')
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_breakdown_includes_archived_sales(self):
+        with get_connection() as conn:
+            product_id = conn.execute(
+                "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES ('Analytics Kite', 'Accessories', 5, 'Red', 0) RETURNING product_id"
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO Sales (customer_id, product_id, quantity, total_price, order_date) VALUES (1, ?, 1, 5.0, ?)",
+                [(product_id, '2001-03-04'), (product_id, '2001-04-05')],
+            )
+            conn.commit()
+        before = {engine: self.breakdown(engine)["totals"] for engine in ('sql', 'numpy')}
+        self.assertTrue(archive_sales())
+        analytics_db._columns_cache.clear()
+        for engine in ('sql', 'numpy'):
+            report = self.breakdown(engine)
+            self.assertEqual(report["totals"], before[engine], engine)
+            self.assertIn('2001-03', report["archived_months"])
+            self.assertIn('2001-04', report["archived_months"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import date
+from unittest.mock import patch
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import initialize_database
+from connection_db import get_connection
+from archive_db import archive_sales, customer_sales_history, partition_path
+
+# Only months before March 1990 are closed, so other tests' sales stay hot.
+HORIZON_DAYS = (date.today() - date(1990, 3, 1)).days
+
+def make_customer():
+    with get_connection() as conn:
+        customer_id = conn.execute(
+            "INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) "
+            "VALUES ('Old', 'Buyer', ?, 'x', 30, 'n/a', 'O', 'Single', 0) RETURNING customer_id",
+            (f"archived_{uuid.uuid4().hex[:12]}",),
+        ).fetchone()[0]
+        conn.commit()
+    return customer_id
+
+def add_sale(customer_id, order_date):
+    with get_connection() as conn:
+        sale_id = conn.execute(
+            "INSERT INTO Sales (customer_id, product_id, quantity, total_price, order_date) VALUES (?, 1, 1, 10.0, ?) RETURNING sale_id",
+            (customer_id, order_date),
+        ).fetchone()[0]
+        conn.commit()
+    return sale_id
+
+def hot_sale_ids(customer_id):
+    with get_connection() as conn:
+        return [row[0] for row in conn.execute("SELECT sale_id FROM Sales WHERE customer_id = ? ORDER BY sale_id", (customer_id,))]
+
+def history_ids(customer_id, **kwargs):
+    return [sale["sale_id"] for sale in customer_sales_history(customer_id, **kwargs)]
+
+class TestSalesArchive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def test_rerun_after_crash_between_copy_and_delete(self):
+        customer_id = make_customer()
+        sale_ids = [add_sale(customer_id, f"1989-11-{day:02d} 10:00:00") for day in (3, 14, 25)]
+
+        # Fail inside the delete transaction, after the copy has been committed.
+        with patch('archive_db.suspend_rollups', side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                archive_sales(HORIZON_DAYS)
+        self.assertTrue(os.path.exists(partition_path('1989-11')))
+        self.assertEqual(hot_sale_ids(customer_id), sale_ids)
+        # The partition is not in the catalog yet, so each sale is read once, from the hot table.
+        self.assertEqual(history_ids(customer_id, start='1989-11-01', end='1989-11-30'), sale_ids)
+
+        archive_sales(HORIZON_DAYS)
+        self.assertEqual(hot_sale_ids(customer_id), [])
+        self.assertEqual(history_ids(customer_id, start='1989-11-01', end='1989-11-30'), sale_ids)
+        with get_connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS archive", (partition_path('1989-11'),))
+            try:
+                copies = conn.execute("SELECT COUNT(*) FROM archive.Sales WHERE customer_id = ?", (customer_id,)).fetchone()[0]
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        self.assertEqual(copies, len(sale_ids))
+
+    def test_history_ordered_across_partitions(self):
+        customer_id = make_customer()
+        # sale_id order differs from date order, so a merge by date would interleave wrongly.
+        december = add_sale(customer_id, "1989-12-20 10:00:00")
+        january = add_sale(customer_id, "1990-01-05 10:00:00")
+        late_december = add_sale(customer_id, "1989-12-31 23:00:00")
+        hot = add_sale(customer_id, date.today().isoformat() + " 09:00:00")
+        archive_sales(HORIZON_DAYS)
+        self.assertEqual(hot_sale_ids(customer_id), [hot])
+
+        expected = [december, january, late_december, hot]
+        self.assertEqual(history_ids(customer_id, start='1989-01-01'), expected)
+        self.assertEqual(history_ids(customer_id, start='1989-01-01', limit=2), expected[:2])
+        self.assertEqual(history_ids(customer_id, start='1989-01-01', after=january, limit=2), expected[2:])
+        self.assertEqual(history_ids(customer_id, start='1990-01-01', end='1990-01-31'), [january])
+        # Without a date range only the hot table is read.
+        self.assertEqual(history_ids(customer_id), [hot])
+
+if __name__ == '__main__':
+    unittest.main()
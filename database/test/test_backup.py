@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import tempfile
+import types
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+from maintenance_db import backup_database
+
+class FailingQuickCheck(sqlite3.Connection):
+    def execute(self, sql, *args):
+        if sql == "PRAGMA quick_check":
+            return super().execute("SELECT 'page 2: btree corrupt'")
+        return super().execute(sql, *args)
+
+def connect_with_corrupt_copy(path, *args, **kwargs):
+    if path.endswith('.partial'):
+        kwargs['factory'] = FailingQuickCheck
+    return sqlite3.connect(path, *args, **kwargs)
+
+class TestBackup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+
+    def test_invalid_options_rejected(self):
+        for options in ({"pages": 0}, {"pages": -1}, {"pages": 2.5}, {"pages": "10"}, {"pages": True},
+                        {"sleep": -0.1}, {"sleep": 5}, {"sleep": "0"}, {"sleep": True}, {"sleep": None}):
+            response = self.client.post('/db/backup', json=options)
+            self.assertEqual(response.status_code, 400, options)
+            self.assertIn("must be", response.json["error"])
+
+    def test_backup_is_checked_and_renamed(self):
+        response = self.client.post('/db/backup', json={"pages": 1, "sleep": 0})
+        self.assertEqual(response.status_code, 201)
+        result = response.json
+        self.assertGreater(result["steps"], 1)
+        self.assertTrue(os.path.exists(result["path"]))
+        self.assertFalse(os.path.exists(result["path"] + '.partial'))
+        copy = sqlite3.connect(result["path"])
+        try:
+            self.assertEqual(copy.execute("PRAGMA quick_check").fetchone()[0], 'ok')
+            self.assertEqual(copy.execute("PRAGMA page_count").fetchone()[0], result["pages"])
+            self.assertIsNotNone(copy.execute("SELECT name FROM sqlite_master WHERE name = 'Customers'").fetchone())
+        finally:
+            copy.close()
+
+    def test_failed_check_leaves_no_file(self):
+        target = os.path.join(tempfile.mkdtemp(), 'backup.db')
+        fake_sqlite3 = types.SimpleNamespace(connect=connect_with_corrupt_copy, DatabaseError=sqlite3.DatabaseError)
+        with patch('maintenance_db.sqlite3', fake_sqlite3):
+            with self.assertRaises(sqlite3.DatabaseError):
+                backup_database(target=target)
+        self.assertEqual(os.listdir(os.path.dirname(target)), [])
+
+if __name__ == '__main__':
+    unittest.main()
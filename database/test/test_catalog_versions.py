@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+from connection_db import get_connection
+
+class TestCatalogVersions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+        client = app.test_client()
+        client.post('/inventory/import', json=[
+            {"name": "Version Lamp", "category": "Electronics", "price": 20.0, "description": "Desk lamp", "stock_count": 10},
+        ])
+        cls.product_id = next(p["product_id"] for p in client.get('/inventory').json if p["name"] == "Version Lamp")
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+
+    def versions(self):
+        return self.client.get('/db/versions').json
+
+    def test_stock_update_keeps_catalog_version(self):
+        before = self.versions()
+        with get_connection() as conn:
+            conn.execute("UPDATE Inventory SET stock_count = stock_count - 1 WHERE product_id = ?", (self.product_id,))
+            conn.commit()
+        after = self.versions()
+        self.assertEqual(after["Catalog"], before["Catalog"])
+        self.assertEqual(after["Inventory"], before["Inventory"] + 1)
+        stock = self.client.get('/inventory/stock').json
+        self.assertEqual(stock["stock_version"], after["Inventory"])
+        self.assertIn([self.product_id, 9], stock["stock"])
+
+    def test_price_update_moves_catalog_version(self):
+        before = self.versions()
+        with get_connection() as conn:
+            conn.execute("UPDATE Inventory SET price = price + 1 WHERE product_id = ?", (self.product_id,))
+            conn.commit()
+        after = self.versions()
+        self.assertEqual(after["Catalog"], before["Catalog"] + 1)
+        snapshot = self.client.get('/inventory/catalog').json
+        self.assertEqual((snapshot["version"], snapshot["stock_version"]), (after["Catalog"], after["Inventory"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import initialize_database
+from connection_db import get_connection
+from checkout_db import checkout, checkout_cart, CheckoutError
+from customers_db import get_customer_by_id
+from inventory_db import decrement_stock_batch, StockError
+
+def make_customer(balance):
+    with get_connection() as conn:
+        customer_id = conn.execute(
+            "INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) "
+            "VALUES ('Check', 'Out', ?, 'x', 30, 'n/a', 'O', 'Single', ?) RETURNING customer_id",
+            (f"buyer_{uuid.uuid4().hex[:12]}", balance),
+        ).fetchone()[0]
+        conn.commit()
+    return customer_id
+
+def make_product(price, stock):
+    with get_connection() as conn:
+        product_id = conn.execute(
+            "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, 'Food', ?, '', ?) RETURNING product_id",
+            (f"item_{uuid.uuid4().hex[:12]}", price, stock),
+        ).fetchone()[0]
+        conn.commit()
+    return product_id
+
+def stock_of(product_id):
+    with get_connection() as conn:
+        return conn.execute("SELECT stock_count FROM Inventory WHERE product_id = ?", (product_id,)).fetchone()[0]
+
+def state(customer_id, product_id):
+    with get_connection() as conn:
+        balance = conn.execute("SELECT wallet_balance FROM Customers WHERE customer_id = ?", (customer_id,)).fetchone()[0]
+        stock = conn.execute("SELECT stock_count FROM Inventory WHERE product_id = ?", (product_id,)).fetchone()[0]
+        sales = conn.execute("SELECT COUNT(*) FROM Sales WHERE customer_id = ? AND product_id = ?", (customer_id, product_id)).fetchone()[0]
+    return balance, stock, sales
+
+class TestCheckout(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def test_checkout_applies_every_step(self):
+        customer_id, product_id = make_customer(100.0), make_product(12.5, 5)
+        sale = checkout(customer_id, product_id, 2)
+        self.assertEqual((sale["quantity"], sale["total_price"]), (2, 25.0))
+        self.assertEqual(state(customer_id, product_id), (75.0, 3, 1))
+
+    def test_out_of_stock_rolls_back(self):
+        customer_id, product_id = make_customer(100.0), make_product(1.0, 1)
+        with self.assertRaises(CheckoutError) as raised:
+            checkout(customer_id, product_id, 2)
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(state(customer_id, product_id), (100.0, 1, 0))
+
+    def test_insufficient_wallet_rolls_back_stock(self):
+        # The stock decrement runs before the wallet debit, so it must be undone.
+        customer_id, product_id = make_customer(5.0), make_product(10.0, 3)
+        with self.assertRaises(CheckoutError) as raised:
+            checkout(customer_id, product_id, 1)
+        self.assertEqual(raised.exception.status, 402)
+        self.assertEqual(state(customer_id, product_id), (5.0, 3, 0))
+
+    def test_unknown_customer_rolls_back_stock(self):
+        product_id = make_product(1.0, 2)
+        with self.assertRaises(CheckoutError) as raised:
+            checkout(10 ** 9, product_id, 1)
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(stock_of(product_id), 2)
+
+    def test_concurrent_checkouts_on_last_unit(self):
+        product_id = make_product(3.0, 1)
+        buyers = [make_customer(50.0) for _ in range(4)]
+        barrier = threading.Barrier(len(buyers))
+        outcomes = []
+
+        def buy(customer_id):
+            barrier.wait()
+            try:
+                checkout(customer_id, product_id, 1)
+                outcomes.append("sold")
+            except CheckoutError as e:
+                outcomes.append(e.status)
+
+        threads = [threading.Thread(target=buy, args=(customer_id,)) for customer_id in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes, key=str), [409, 409, 409, "sold"])
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM Sales WHERE product_id = ?", (product_id,)).fetchone()[0], 1)
+            debited = conn.execute(
+                f"SELECT COUNT(*) FROM Customers WHERE wallet_balance < 50 AND customer_id IN ({', '.join('?' * len(buyers))})", buyers
+            ).fetchone()[0]
+        self.assertEqual(debited, 1)
+        self.assertEqual(stock_of(product_id), 0)
+
+class TestCheckoutCart(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def test_cart_charges_the_line_total(self):
+        customer_id = make_customer(100.0)
+        apple, pear = make_product(1.25, 10), make_product(4.1, 10)
+        order = checkout_cart(customer_id, [{"product_id": apple, "quantity": 3}, {"product_id": pear, "quantity": 2}])
+        self.assertEqual(order["total_price"], 11.95)
+        self.assertEqual(order["wallet_balance"], 88.05)
+        self.assertEqual([(s["product_id"], s["total_price"]) for s in order["sales"]], [(apple, 3.75), (pear, 8.2)])
+        self.assertEqual((stock_of(apple), stock_of(pear)), (7, 8))
+
+    def test_partial_cart_rolls_back_every_line(self):
+        customer_id = make_customer(100.0)
+        plenty, scarce = make_product(2.0, 10), make_product(2.0, 1)
+        with self.assertRaises(CheckoutError) as raised:
+            checkout_cart(customer_id, [{"product_id": plenty, "quantity": 4}, {"product_id": scarce, "quantity": 2}])
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(raised.exception.errors, [{"line": 1, "product_id": scarce, "error": "Product is out of stock", "available": 1}])
+        self.assertEqual(state(customer_id, plenty), (100.0, 10, 0))
+        self.assertEqual(state(customer_id, scarce), (100.0, 1, 0))
+
+    def test_duplicate_lines_share_the_stock(self):
+        customer_id = make_customer(100.0)
+        product_id = make_product(1.0, 3)
+        with self.assertRaises(CheckoutError):
+            checkout_cart(customer_id, [{"product_id": product_id, "quantity": 2}, {"product_id": product_id, "quantity": 2}])
+        self.assertEqual(state(customer_id, product_id), (100.0, 3, 0))
+        order = checkout_cart(customer_id, [{"product_id": product_id, "quantity": 1}, {"product_id": product_id, "quantity": 2}])
+        self.assertEqual(order["total_price"], 3.0)
+        self.assertEqual(state(customer_id, product_id), (97.0, 0, 2))
+
+    def test_insufficient_wallet_rolls_back_cart(self):
+        customer_id = make_customer(10.0)
+        first, second = make_product(6.0, 5), make_product(6.0, 5)
+        with self.assertRaises(CheckoutError) as raised:
+            checkout_cart(customer_id, [{"product_id": first, "quantity": 1}, {"product_id": second, "quantity": 1}])
+        self.assertEqual(raised.exception.status, 402)
+        self.assertEqual((state(customer_id, first), state(customer_id, second)), ((10.0, 5, 0), (10.0, 5, 0)))
+
+    def test_checkout_invalidates_cached_customer(self):
+        customer_id = make_customer(40.0)
+        product_id = make_product(15.0, 5)
+        self.assertEqual(get_customer_by_id(customer_id)["wallet_balance"], 40.0)
+        checkout_cart(customer_id, [{"product_id": product_id, "quantity": 2}])
+        self.assertEqual(get_customer_by_id(customer_id)["wallet_balance"], 10.0)
+
+    def test_nested_stock_batch_rolls_back_to_its_savepoint(self):
+        kept, first, short = make_product(1.0, 5), make_product(1.0, 5), make_product(1.0, 1)
+        with get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE Inventory SET stock_count = 4 WHERE product_id = ?", (kept,))
+            with self.assertRaises(StockError) as raised:
+                decrement_stock_batch({first: 2, short: 2})
+            self.assertEqual(raised.exception.product_ids, [short])
+            # The caller's transaction is still open with its own change intact.
+            self.assertTrue(conn.in_transaction)
+            self.assertEqual(decrement_stock_batch({first: 2}), {first: 3})
+            conn.commit()
+        self.assertEqual((stock_of(kept), stock_of(first), stock_of(short)), (4, 3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from werkzeug.security import check_password_hash, generate_password_hash
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+from connection_db import get_connection
+import customers_db
+from customers_db import HASH_POOL_THRESHOLD, hash_passwords, insert_customer, import_customers, update_customer, get_customer_by_username, get_customer_by_id, adjust_wallet_balance, customer_cache_stats
+from checkout_db import checkout
+
+def customer(username, password="secret"):
+    return {"first_name": "Test", "last_name": "Customer", "username": username, "password": password,
+            "age": 30, "address": "1 Main St", "gender": "O", "marital_status": "Single", "wallet_balance": 0.0}
+
+class TestCustomers(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+
+    def test_create_customer_hashes_password(self):
+        response = self.client.post('/customers', json=customer("hashed_on_create", "plain-secret"))
+        self.assertEqual(response.status_code, 201)
+        stored = get_customer_by_username("hashed_on_create")["password"]
+        self.assertNotEqual(stored, "plain-secret")
+        self.assertTrue(check_password_hash(stored, "plain-secret"))
+
+    def test_update_customer_keeps_existing_hash(self):
+        self.client.post('/customers', json=customer("hashed_on_update", "first-secret"))
+        record = get_customer_by_username("hashed_on_update")
+        record["address"] = "2 Side St"
+        updated = update_customer(record)
+        self.assertEqual(updated["password"], record["password"])
+        self.assertTrue(check_password_hash(updated["password"], "first-secret"))
+        record["password"] = "second-secret"
+        updated = update_customer(record)
+        self.assertTrue(check_password_hash(updated["password"], "second-secret"))
+
+    def test_client_supplied_hash_is_hashed(self):
+        planted = generate_password_hash("attacker-secret")
+        self.client.post('/customers', json=customer("planted_hash", planted))
+        record = get_customer_by_username("planted_hash")
+        self.assertNotEqual(record["password"], planted)
+        self.assertTrue(check_password_hash(record["password"], planted))
+        record["password"] = planted
+        updated = update_customer(record)
+        self.assertNotEqual(updated["password"], planted)
+        self.assertFalse(check_password_hash(updated["password"], "attacker-secret"))
+        report = import_customers([customer("planted_import", planted)])
+        self.assertEqual(report["summary"]["inserted"], 1)
+        self.assertNotEqual(get_customer_by_username("planted_import")["password"], planted)
+
+    def test_prehashed_insert_for_migrations(self):
+        migrated = generate_password_hash("migrated-secret")
+        self.assertEqual(insert_customer(customer("migrated_hash", migrated), prehashed=True)["password"], migrated)
+        self.assertEqual(insert_customer(customer("migrated_plain", "not-a-hash"), prehashed=True), {})
+
+    def test_hash_pool_reused_across_calls(self):
+        created = []
+
+        class InlinePool:
+            def __init__(self, max_workers):
+                created.append(max_workers)
+
+            def map(self, fn, items, chunksize=1):
+                return map(fn, items)
+
+        with patch('customers_db.ProcessPoolExecutor', InlinePool), patch.dict(customers_db._hash_pools, clear=True), \
+                patch('customers_db.hash_password', str.upper):
+            self.assertEqual(len(hash_passwords(["p"] * (HASH_POOL_THRESHOLD - 1), workers=2)), HASH_POOL_THRESHOLD - 1)
+            self.assertEqual(created, [])
+            for _ in range(3):
+                hashes = hash_passwords(["p"] * HASH_POOL_THRESHOLD, workers=2)
+            self.assertEqual(created, [2])
+        self.assertEqual(hashes, ["P"] * HASH_POOL_THRESHOLD)
+
+    def test_failed_chunk_keeps_duplicate_status(self):
+        import_customers([customer("chunk_dup"), customer("chunk_taken")])
+        # The up-front check sees neither name; inside the chunk only chunk_dup
+        # is reported taken, so inserting chunk_taken hits the UNIQUE constraint.
+        checks = iter([set(), {"chunk_dup"}])
+        with patch('customers_db._existing_usernames', side_effect=lambda conn, names: next(checks)):
+            report = import_customers([customer("chunk_dup"), customer("chunk_taken")])
+        statuses = [r["status"] for r in report["results"]]
+        self.assertEqual(statuses, ["duplicate", "failed"])
+
+    def test_wallet_changes_visible_through_cache(self):
+        self.client.post('/customers', json=dict(customer("cached_wallet"), wallet_balance=50.0))
+        customer_id = get_customer_by_username("cached_wallet")["customer_id"]
+        # Fill the cache through every lookup a route can make.
+        for lookup in (lambda: get_customer_by_id(customer_id), lambda: get_customer_by_id(str(customer_id)), lambda: get_customer_by_username("cached_wallet")):
+            self.assertEqual(lookup()["wallet_balance"], 50.0)
+        hits = customer_cache_stats()["hits"]
+        get_customer_by_id(str(customer_id))
+        self.assertEqual(customer_cache_stats()["hits"], hits + 1)
+        adjust_wallet_balance("cached_wallet", 10)
+        self.assertEqual(get_customer_by_id(str(customer_id))["wallet_balance"], 60.0)
+        self.assertEqual(get_customer_by_id(customer_id)["wallet_balance"], 60.0)
+        self.assertEqual(get_customer_by_username("cached_wallet")["wallet_balance"], 60.0)
+        with get_connection() as conn:
+            product_id = conn.execute(
+                "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES ('Cache Pen', 'Accessories', 15, '', 3) RETURNING product_id"
+            ).fetchone()[0]
+            conn.commit()
+        checkout(str(customer_id), product_id, 2)
+        self.assertEqual(get_customer_by_id(str(customer_id))["wallet_balance"], 30.0)
+        self.assertEqual(get_customer_by_username("cached_wallet")["wallet_balance"], 30.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+
+class TestConditionalGets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+        client = app.test_client()
+        client.post('/inventory/import', json=[
+            {"name": "Etag Mug", "category": "Accessories", "price": 8.0, "description": "Blue", "stock_count": 4},
+        ])
+        cls.product = next(p for p in client.get('/inventory').json if p["name"] == "Etag Mug")
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+
+    def test_matching_etag_gets_304(self):
+        url = f"/inventory/{self.product['product_id']}"
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+        again = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.get_data(), b"")
+        self.assertEqual(again.headers["ETag"], etag)
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": '"stale"'}).status_code, 200)
+
+    def test_write_changes_etag(self):
+        url = f"/inventory/{self.product['product_id']}"
+        etag = self.client.get(url).headers["ETag"]
+        listing_etag = self.client.get('/inventory').headers["ETag"]
+        updated = dict(self.product, price=9.5)
+        self.assertEqual(self.client.put(url, json=updated).status_code, 200)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["price"], 9.5)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.client.get('/inventory', headers={"If-None-Match": listing_etag}).status_code, 200)
+        # Tables other than the one a route reads do not change its tag.
+        etag = response.headers["ETag"]
+        self.client.post('/customers', json={
+            "first_name": "Etag", "last_name": "Reader", "username": "etag_reader", "password": "secret",
+            "gender": "O", "age": 30, "address": "n/a", "marital_status": "Single", "wallet_balance": 0.0,
+        })
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+if __name__ == '__main__':
+    unittest.main()
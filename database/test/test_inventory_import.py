@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+
+class TestInventoryImport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+
+    def test_csv_import_skips_nan_price(self):
+        body = (
+            "name,category,price,description,stock_count\n"
+            "Import Apple,Food,1.5,Fresh,10\n"
+            "Import Ghost,Food,nan,Not a price,5\n"
+            "Import Scarf,Clothes,inf,Not a price either,5\n"
+            "Import Cable,Electronics,4.25,USB-C,3\n"
+        )
+        response = self.client.post('/inventory/import', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        report = response.json
+        self.assertEqual(report["summary"]["inserted"], 2)
+        self.assertEqual([r["status"] for r in report["results"]], ["inserted", "invalid", "invalid", "inserted"])
+        self.assertIn("price must be a finite number", report["results"][1]["errors"])
+        names = {p["name"] for p in self.client.get('/inventory').json}
+        self.assertIn("Import Apple", names)
+        self.assertIn("Import Cable", names)
+        self.assertNotIn("Import Ghost", names)
+        self.assertNotIn("Import Scarf", names)
+
+    def test_json_import_skips_nan_price(self):
+        body = ('[{"name": "Json Pen", "category": "Accessories", "price": 2.0, "description": "Blue", "stock_count": 1},'
+                ' {"name": "Json Void", "category": "Accessories", "price": NaN, "description": "None", "stock_count": 1}]')
+        response = self.client.post('/inventory/import', data=body, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["status"] for r in response.json["results"]], ["inserted", "invalid"])
+
+    def test_import_rejects_fractional_stock(self):
+        rows = [{"name": f"Stock {i}", "category": "Food", "price": 1.0, "description": "", "stock_count": count}
+                for i, count in enumerate((2.7, True, "2.5", "ten", 4.0, "6", "", None))]
+        response = self.client.post('/inventory/import', json=rows)
+        self.assertEqual(response.status_code, 201)
+        results = response.json["results"]
+        self.assertEqual([r["status"] for r in results], ["invalid"] * 4 + ["inserted"] * 4)
+        self.assertIn("stock_count must be an integer", results[0]["errors"])
+        stock = {p["name"]: p["stock_count"] for p in self.client.get('/inventory').json if p["name"].startswith("Stock ")}
+        self.assertEqual(stock, {"Stock 4": 4, "Stock 5": 6, "Stock 6": 0, "Stock 7": 0})
+
+    def test_query_rejects_non_finite_price(self):
+        for args in ('min_price=nan', 'max_price=inf'):
+            response = self.client.get(f'/inventory/query?{args}')
+            self.assertEqual(response.status_code, 400, args)
+
+if __name__ == '__main__':
+    unittest.main()
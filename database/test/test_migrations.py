@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Runs in a fresh process on a fresh file: the base tables are created and
+# filled first, as in a database from before the migrations, and only then
+# does initialize_database() add the derived tables and migrate.
+UPGRADE_SCRIPT = '''
+import json
+from customers_db import create_customers_table
+from inventory_db import create_inventory_table
+from reviews_db import create_reviews_table, create_moderation_table
+from sales_db import create_sales_table
+from wishlist_db import create_wishlist_table
+from connection_db import get_connection
+
+for create in (create_customers_table, create_inventory_table, create_reviews_table, create_moderation_table, create_sales_table, create_wishlist_table):
+    create()
+with get_connection() as conn:
+    conn.execute("INSERT INTO Inventory (product_id, name, category, price, description, stock_count) VALUES (1, 'Trail Shoes', 'Clothes', 80, 'Waterproof running shoes', 3)")
+    conn.execute("INSERT INTO Inventory (product_id, name, category, price, description, stock_count) VALUES (2, 'Desk Lamp', 'Electronics', 25, 'Warm light', 9)")
+    conn.executemany("INSERT INTO Reviews (customer_id, product_id, rating, comment) VALUES (1, ?, ?, 'ok')", [(1, 5), (1, 3), (2, 4), (2, None)])
+    conn.executemany(
+        "INSERT INTO Sales (customer_id, product_id, quantity, total_price, order_date) VALUES (1, ?, ?, ?, ?)",
+        [(1, 1, 80, '2024-03-01 10:00:00'), (1, 2, 160, '2024-03-01 18:00:00'), (2, 1, 25, '2024-03-02 09:00:00'), (99, 1, 5, '2024-03-02 12:00:00')],
+    )
+    conn.commit()
+
+from ecommerce_db import initialize_database
+initialize_database()
+with get_connection() as conn:
+    print(json.dumps({
+        "versions": [row[0] for row in conn.execute("SELECT version FROM SchemaVersion ORDER BY version")],
+        "indexes": sorted(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")),
+        "rating_stats": [list(row) for row in conn.execute("SELECT product_id, review_count, rating_sum, stars_3, stars_4, stars_5 FROM ProductRatingStats ORDER BY product_id")],
+        "daily_products": [list(row) for row in conn.execute("SELECT day, product_id, revenue, units, orders FROM SalesDailyProduct ORDER BY day, product_id")],
+        "daily_categories": [list(row) for row in conn.execute("SELECT day, category, revenue, units, orders FROM SalesDailyCategory ORDER BY day, category")],
+        "search": [row[0] for row in conn.execute("SELECT rowid FROM InventorySearch WHERE InventorySearch MATCH 'runn*' ORDER BY rowid")],
+    }))
+'''
+
+class TestMigrations(unittest.TestCase):
+    def test_upgrade_from_base_tables(self):
+        env = dict(os.environ, ECOMMERCE_DB_PATH=os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+        output = subprocess.run(
+            [sys.executable, '-c', UPGRADE_SCRIPT], env=env, check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+        state = json.loads(output.strip().splitlines()[-1])
+
+        from migrations_db import MIGRATIONS
+        self.assertEqual(state["versions"], [version for version, _, _ in MIGRATIONS])
+        self.assertIn("idx_sales_customer_date", state["indexes"])
+        self.assertNotIn("idx_sales_customer", state["indexes"])
+        for index in ("idx_reviews_product", "idx_reviews_customer", "idx_wishes_customer_added", "idx_wishes_added",
+                      "idx_inventory_category", "idx_inventory_category_price", "idx_inventory_stock"):
+            self.assertIn(index, state["indexes"])
+        self.assertEqual(state["rating_stats"], [[1, 2, 8, 1, 0, 1], [2, 1, 4, 0, 1, 0]])
+        self.assertEqual(state["daily_products"], [
+            ["2024-03-01", 1, 240, 3, 2],
+            ["2024-03-02", 2, 25, 1, 1],
+            ["2024-03-02", 99, 5, 1, 1],
+        ])
+        self.assertEqual(state["daily_categories"], [
+            ["2024-03-01", "Clothes", 240, 3, 2],
+            ["2024-03-02", "Electronics", 25, 1, 1],
+            ["2024-03-02", "Uncategorized", 5, 1, 1],
+        ])
+        self.assertEqual(state["search"], [1])
+
+if __name__ == '__main__':
+    unittest.main()
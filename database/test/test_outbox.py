@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import initialize_database
+from connection_db import get_connection
+from outbox_db import OutboxDispatcher, enqueue_notifications, retry_delay
+
+class RecordingSink:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    def send(self, notification):
+        if self.fail:
+            raise ConnectionError("sink down")
+        self.sent.append(notification)
+
+def enqueue(dedupe_key=None):
+    with get_connection() as conn:
+        queued = enqueue_notifications(conn, [{"kind": "test", "customer_id": 1, "payload": {"message": "hi"}, "dedupe_key": dedupe_key}])
+        outbox_id = conn.execute("SELECT MAX(outbox_id) FROM NotificationOutbox").fetchone()[0]
+        conn.commit()
+    return queued, outbox_id
+
+def row(outbox_id):
+    with get_connection() as conn:
+        return dict(conn.execute(
+            "SELECT status, attempts, last_error, (julianday(next_attempt_at) - julianday('now')) * 86400 AS due_in FROM NotificationOutbox WHERE outbox_id = ?",
+            (outbox_id,),
+        ).fetchone())
+
+def make_due(outbox_id):
+    with get_connection() as conn:
+        conn.execute("UPDATE NotificationOutbox SET next_attempt_at = datetime('now', '-1 seconds') WHERE outbox_id = ?", (outbox_id,))
+        conn.commit()
+
+class TestOutboxDispatcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def setUp(self):
+        # Each test starts from an empty outbox so batches only hold its own rows.
+        with get_connection() as conn:
+            conn.execute("DELETE FROM NotificationOutbox")
+            conn.commit()
+
+    def test_delivers_and_marks_sent(self):
+        _, outbox_id = enqueue()
+        sink = RecordingSink()
+        self.assertEqual(OutboxDispatcher(sink).dispatch_once(), {"sent": 1, "retrying": 0, "failed": 0})
+        self.assertEqual([n["outbox_id"] for n in sink.sent], [outbox_id])
+        self.assertEqual(row(outbox_id)["status"], "sent")
+        self.assertEqual(OutboxDispatcher(sink).dispatch_once(), {"sent": 0, "retrying": 0, "failed": 0})
+
+    def test_failing_sink_backs_off_then_fails(self):
+        _, outbox_id = enqueue()
+        dispatcher = OutboxDispatcher(RecordingSink(fail=True), max_attempts=3)
+        for attempt in (1, 2):
+            self.assertEqual(dispatcher.dispatch_once(), {"sent": 0, "retrying": 1, "failed": 0})
+            state = row(outbox_id)
+            self.assertEqual((state["status"], state["attempts"], state["last_error"]), ("pending", attempt, "sink down"))
+            self.assertAlmostEqual(state["due_in"], retry_delay(attempt), delta=2)
+            # Not due yet, so nothing is claimed until the backoff has passed.
+            self.assertEqual(dispatcher.dispatch_once(), {"sent": 0, "retrying": 0, "failed": 0})
+            make_due(outbox_id)
+        self.assertEqual(dispatcher.dispatch_once(), {"sent": 0, "retrying": 0, "failed": 1})
+        self.assertEqual(row(outbox_id)["status"], "failed")
+        make_due(outbox_id)
+        self.assertEqual(dispatcher.dispatch_once(), {"sent": 0, "retrying": 0, "failed": 0})
+
+    def test_expired_lease_is_reclaimed(self):
+        _, outbox_id = enqueue()
+        dispatcher = OutboxDispatcher(RecordingSink())
+        # A worker that claimed the row and then died leaves it pending under a lease.
+        self.assertEqual(len(dispatcher.claim_batch()), 1)
+        self.assertEqual(dispatcher.claim_batch(), [])
+        make_due(outbox_id)
+        self.assertEqual(dispatcher.dispatch_once(), {"sent": 1, "retrying": 0, "failed": 0})
+        self.assertEqual(row(outbox_id)["attempts"], 2)
+        self.assertEqual(row(outbox_id)["status"], "sent")
+
+    def test_enqueue_dedupes_on_key(self):
+        key = f"test:{uuid.uuid4().hex}"
+        self.assertEqual(enqueue(key)[0], 1)
+        self.assertEqual(enqueue(key)[0], 0)
+        # Notifications without a key are never deduplicated.
+        self.assertEqual(enqueue()[0], 1)
+        self.assertEqual(enqueue()[0], 1)
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM NotificationOutbox WHERE dedupe_key = ?", (key,)).fetchone()[0], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import initialize_database
+from connection_db import get_connection
+from reviews_db import submit_review, moderate_reviews, update_review, delete_review, rebuild_rating_stats, get_moderation_queue
+from versions_db import get_table_versions
+
+def make_product():
+    with get_connection() as conn:
+        product_id = conn.execute(
+            "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, 'Food', 1, '', 0) RETURNING product_id",
+            (f"reviewed_{uuid.uuid4().hex[:12]}",),
+        ).fetchone()[0]
+        conn.commit()
+    return product_id
+
+def add_review(product_id, rating, customer_id=1):
+    with get_connection() as conn:
+        review = dict(conn.execute(
+            "INSERT INTO Reviews (customer_id, product_id, rating, comment) VALUES (?, ?, ?, 'ok') RETURNING review_id, customer_id, product_id, rating, comment",
+            (customer_id, product_id, rating),
+        ).fetchone())
+        conn.commit()
+    return review
+
+class TestRatingStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def assertStatsMatchReviews(self, *product_ids):
+        placeholders = ", ".join("?" * len(product_ids))
+        with get_connection() as conn:
+            expected = conn.execute(f'''
+                SELECT product_id, COUNT(*), SUM(rating), SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+                FROM Reviews WHERE rating IS NOT NULL AND product_id IN ({placeholders}) GROUP BY product_id ORDER BY product_id
+            ''', product_ids).fetchall()
+            actual = conn.execute(f'''
+                SELECT product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5
+                FROM ProductRatingStats WHERE review_count != 0 AND product_id IN ({placeholders}) ORDER BY product_id
+            ''', product_ids).fetchall()
+            averages = conn.execute(f'''
+                SELECT product_id, ROUND(AVG(rating), 2) FROM Reviews WHERE rating IS NOT NULL AND product_id IN ({placeholders})
+                GROUP BY product_id ORDER BY product_id
+            ''', product_ids).fetchall()
+            stats_averages = conn.execute(f'''
+                SELECT product_id, ROUND(CAST(rating_sum AS REAL) / review_count, 2) FROM ProductRatingStats
+                WHERE review_count != 0 AND product_id IN ({placeholders}) ORDER BY product_id
+            ''', product_ids).fetchall()
+        self.assertEqual([tuple(r) for r in actual], [tuple(r) for r in expected])
+        self.assertEqual([tuple(r) for r in stats_averages], [tuple(r) for r in averages])
+
+    def test_incremental_stats_match_fresh_aggregate(self):
+        first, second = make_product(), make_product()
+        reviews = [add_review(first, rating) for rating in (5, 4, 4, 1)] + [add_review(second, 3)]
+        unrated = add_review(first, None)
+        self.assertStatsMatchReviews(first, second)
+
+        update_review(dict(reviews[0], rating=2))
+        self.assertStatsMatchReviews(first, second)
+        update_review(dict(reviews[1], product_id=second))
+        self.assertStatsMatchReviews(first, second)
+        update_review(dict(reviews[2], product_id=second, rating=5))
+        self.assertStatsMatchReviews(first, second)
+        update_review(dict(unrated, rating=3))
+        update_review(dict(reviews[3], rating=None))
+        self.assertStatsMatchReviews(first, second)
+
+        delete_review(reviews[4]["review_id"])
+        delete_review(reviews[0]["review_id"])
+        self.assertStatsMatchReviews(first, second)
+
+        pending = [submit_review({"customer_id": 1, "product_id": product_id, "rating": rating, "comment": "queued"})
+                   for product_id, rating in ((first, 5), (second, 2), (second, 4))]
+        moderate_reviews(approve_ids=[pending[0]["review_id"], pending[1]["review_id"]], reject_ids=[pending[2]["review_id"]])
+        self.assertStatsMatchReviews(first, second)
+
+        before = self.stats(first, second)
+        rebuild_rating_stats()
+        self.assertEqual(self.stats(first, second), before)
+
+    def stats(self, *product_ids):
+        with get_connection() as conn:
+            return [tuple(r) for r in conn.execute(
+                f"SELECT * FROM ProductRatingStats WHERE review_count != 0 AND product_id IN ({', '.join('?' * len(product_ids))}) ORDER BY product_id",
+                product_ids,
+            )]
+
+    def queue(self, product_id):
+        return [review["review_id"] for review in get_moderation_queue(product_id=product_id)]
+
+    def reviews(self, product_id):
+        with get_connection() as conn:
+            return [tuple(r) for r in conn.execute("SELECT rating, comment FROM Reviews WHERE product_id = ? ORDER BY review_id", (product_id,))]
+
+    def submit(self, product_id, rating):
+        return submit_review({"customer_id": 1, "product_id": product_id, "rating": rating, "comment": f"stars {rating}"})["review_id"]
+
+    def test_moderated_reviews_leave_queue_once(self):
+        product_id = make_product()
+        add_review(product_id, 4)
+        keep, drop, other = self.submit(product_id, 5), self.submit(product_id, 1), self.submit(product_id, 3)
+        before = get_table_versions()
+
+        result = moderate_reviews(approve_ids=[keep], reject_ids=[drop, 10 ** 9])
+        self.assertEqual([(r["rating"], r["comment"]) for r in result["approved"]], [(5, "stars 5")])
+        self.assertEqual(result["rejected"], [drop])
+        self.assertEqual(result["missing"], [10 ** 9])
+        self.assertEqual(self.queue(product_id), [other])
+        self.assertEqual(self.reviews(product_id), [(4, "ok"), (5, "stars 5")])
+        self.assertStatsMatchReviews(product_id)
+        self.assertEqual(self.stats(product_id)[0][1:3], (2, 9))
+        self.assertEqual(get_table_versions()["Reviews"], before["Reviews"] + 1)
+
+        # Moderating the same ids again finds nothing pending and changes nothing.
+        before = get_table_versions()
+        result = moderate_reviews(approve_ids=[keep], reject_ids=[drop])
+        self.assertEqual((result["approved"], result["rejected"], result["missing"]), ([], [], [keep, drop]))
+        self.assertEqual(len(self.reviews(product_id)), 2)
+        self.assertEqual(get_table_versions(), before)
+
+    def test_concurrent_moderation_publishes_once(self):
+        product_id = make_product()
+        pending = [self.submit(product_id, rating) for rating in (1, 2, 3, 4, 5)]
+        before = get_table_versions()["Reviews"]
+        results, barrier = [], threading.Barrier(4)
+
+        def moderate():
+            barrier.wait()
+            results.append(moderate_reviews(approve_ids=pending))
+
+        threads = [threading.Thread(target=moderate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(len(r["approved"]) for r in results), [0, 0, 0, 5])
+        self.assertEqual(self.queue(product_id), [])
+        self.assertEqual(len(self.reviews(product_id)), 5)
+        self.assertStatsMatchReviews(product_id)
+        self.assertEqual(get_table_versions()["Reviews"], before + 5)
+
+if __name__ == '__main__':
+    unittest.main()
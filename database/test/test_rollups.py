@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import initialize_database
+from connection_db import get_connection
+from rollups_db import UNKNOWN_CATEGORY
+
+def make_product(category):
+    with get_connection() as conn:
+        product_id = conn.execute(
+            "INSERT INTO Inventory (name, category, price, description, stock_count) VALUES (?, ?, 1, '', 0) RETURNING product_id",
+            (f"rollup_{uuid.uuid4().hex[:12]}", category),
+        ).fetchone()[0]
+        conn.commit()
+    return product_id
+
+def sell(product_id, day, quantity=1, price=2.0):
+    with get_connection() as conn:
+        sale_id = conn.execute(
+            "INSERT INTO Sales (customer_id, product_id, quantity, total_price, order_date) VALUES (1, ?, ?, ?, ?) RETURNING sale_id",
+            (product_id, quantity, price * quantity, day),
+        ).fetchone()[0]
+        conn.commit()
+    return sale_id
+
+def execute(sql, params=()):
+    with get_connection() as conn:
+        conn.execute(sql, params)
+        conn.commit()
+
+class TestSalesRollups(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def assertRollupsMatchSales(self, start, end):
+        # What rebuild_sales_rollups would write for these days.
+        with get_connection() as conn:
+            products = conn.execute('''
+                SELECT date(order_date) AS day, product_id, SUM(total_price), SUM(quantity), COUNT(*) FROM Sales
+                WHERE date(order_date) BETWEEN ? AND ? GROUP BY 1, 2 ORDER BY 1, 2
+            ''', (start, end)).fetchall()
+            categories = conn.execute(f'''
+                SELECT date(s.order_date) AS day, COALESCE(i.category, '{UNKNOWN_CATEGORY}') AS category, SUM(s.total_price), SUM(s.quantity), COUNT(*)
+                FROM Sales s LEFT JOIN Inventory i ON i.product_id = s.product_id
+                WHERE date(s.order_date) BETWEEN ? AND ? GROUP BY 1, 2 ORDER BY 1, 2
+            ''', (start, end)).fetchall()
+            rolled_products = conn.execute(
+                "SELECT day, product_id, revenue, units, orders FROM SalesDailyProduct WHERE day BETWEEN ? AND ? AND orders != 0 ORDER BY 1, 2", (start, end)
+            ).fetchall()
+            rolled_categories = conn.execute(
+                "SELECT day, category, revenue, units, orders FROM SalesDailyCategory WHERE day BETWEEN ? AND ? AND orders != 0 ORDER BY 1, 2", (start, end)
+            ).fetchall()
+        self.assertEqual([tuple(r) for r in rolled_products], [tuple(r) for r in products])
+        self.assertEqual([tuple(r) for r in rolled_categories], [tuple(r) for r in categories])
+
+    def test_insert_update_delete_sales(self):
+        product_id, other = make_product('Food'), make_product('Electronics')
+        first = sell(product_id, '2004-01-01', 2)
+        second = sell(product_id, '2004-01-01')
+        sell(other, '2004-01-02', 3)
+        self.assertRollupsMatchSales('2004-01-01', '2004-01-31')
+        execute("UPDATE Sales SET quantity = 5, total_price = 10 WHERE sale_id = ?", (first,))
+        execute("UPDATE Sales SET product_id = ?, order_date = '2004-01-03' WHERE sale_id = ?", (other, second))
+        self.assertRollupsMatchSales('2004-01-01', '2004-01-31')
+        execute("DELETE FROM Sales WHERE sale_id = ?", (first,))
+        self.assertRollupsMatchSales('2004-01-01', '2004-01-31')
+
+    def test_recategorised_product_does_not_drift(self):
+        product_id = make_product('Food')
+        first = sell(product_id, '2004-02-01', 2)
+        sell(product_id, '2004-02-02')
+        execute("UPDATE Inventory SET category = 'Clothes' WHERE product_id = ?", (product_id,))
+        self.assertRollupsMatchSales('2004-02-01', '2004-02-28')
+        execute("DELETE FROM Sales WHERE sale_id = ?", (first,))
+        self.assertRollupsMatchSales('2004-02-01', '2004-02-28')
+        # A stock-only update leaves the category rollups alone.
+        execute("UPDATE Inventory SET stock_count = 9 WHERE product_id = ?", (product_id,))
+        self.assertRollupsMatchSales('2004-02-01', '2004-02-28')
+
+    def test_deleted_product_does_not_drift(self):
+        product_id = make_product('Accessories')
+        first = sell(product_id, '2004-03-01')
+        sell(product_id, '2004-03-01', 4)
+        execute("DELETE FROM Inventory WHERE product_id = ?", (product_id,))
+        self.assertRollupsMatchSales('2004-03-01', '2004-03-31')
+        execute("DELETE FROM Sales WHERE sale_id = ?", (first,))
+        self.assertRollupsMatchSales('2004-03-01', '2004-03-31')
+
+if __name__ == '__main__':
+    unittest.main()
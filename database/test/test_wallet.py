@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import app, initialize_database
+from connection_db import get_connection
+from customers_db import MAX_WALLET_AMOUNT, WalletError, adjust_wallet_balance, invalidate_customer
+
+class TestWalletRoutes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+        client = app.test_client()
+        client.post('/customers', json={
+            "first_name": "Wallet", "last_name": "Owner", "username": "wallet_owner",
+            "email": "wallet_owner@example.com", "password": "secret", "gender": "O",
+            "age": 30, "address": "1 Main St", "marital_status": "Single", "wallet_balance": 100.0,
+        })
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.client.testing = True
+
+    def balance(self):
+        return self.client.get('/customers/wallet_owner').json["wallet_balance"]
+
+    def test_charge_and_deduct(self):
+        before = self.balance()
+        self.assertEqual(self.client.post('/customers/wallet_owner/charge/25').status_code, 200)
+        self.assertEqual(self.client.post('/customers/wallet_owner/deduct/25').status_code, 200)
+        self.assertEqual(self.balance(), before)
+
+    def test_non_finite_amounts_rejected(self):
+        before = self.balance()
+        for route in ('charge', 'deduct'):
+            for amount in ('inf', '-inf', 'nan', 'infinity'):
+                response = self.client.post(f'/customers/wallet_owner/{route}/{amount}')
+                self.assertEqual(response.status_code, 400, (route, amount))
+        self.assertEqual(self.balance(), before)
+
+    def test_huge_amounts_rejected(self):
+        before = self.balance()
+        for route in ('charge', 'deduct'):
+            for amount in ('1e308', str(MAX_WALLET_AMOUNT * 2)):
+                response = self.client.post(f'/customers/wallet_owner/{route}/{amount}')
+                self.assertEqual(response.status_code, 400, (route, amount))
+        self.assertEqual(self.balance(), before)
+
+    def test_wallet_update_rejects_non_finite_json(self):
+        before = self.balance()
+        for body in ('{"amount": NaN}', '{"amount": Infinity}', '{"amount": 1e308}'):
+            response = self.client.post('/customers/wallet_owner/wallet', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(self.balance(), before)
+
+    def test_rejected_adjustment_keeps_callers_transaction(self):
+        before = self.balance()
+        with get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE Customers SET address = '2 Side St' WHERE username = 'wallet_owner'")
+            with self.assertRaises(WalletError) as raised:
+                adjust_wallet_balance('wallet_owner', -(before + 1))
+            self.assertEqual(raised.exception.status, 402)
+            self.assertTrue(conn.in_transaction)
+            adjust_wallet_balance('wallet_owner', 5)
+            self.assertTrue(conn.in_transaction)
+            conn.commit()
+        invalidate_customer(username='wallet_owner')
+        customer = self.client.get('/customers/wallet_owner').json
+        self.assertEqual((customer["address"], customer["wallet_balance"]), ("2 Side St", before + 5))
+        adjust_wallet_balance('wallet_owner', -5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+import uuid
+
+os.environ.setdefault('ECOMMERCE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'ecommerce.db'))
+
+from ecommerce_db import initialize_database
+from connection_db import get_connection
+from wishlist_db import sweep_abandoned_wishlists
+
+def make_customer():
+    with get_connection() as conn:
+        customer_id = conn.execute(
+            "INSERT INTO Customers (first_name, last_name, username, password, age, address, gender, marital_status, wallet_balance) "
+            "VALUES ('Wish', 'Ful', ?, 'x', 30, 'n/a', 'O', 'Single', 0) RETURNING customer_id",
+            (f"wisher_{uuid.uuid4().hex[:12]}",),
+        ).fetchone()[0]
+        conn.commit()
+    return customer_id
+
+def add_old_wish(customer_id, product_id, days_ago):
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO Wishes (customer_id, product_id, quantity, added_at) VALUES (?, ?, 1, datetime('now', ?))",
+            (customer_id, product_id, f"-{days_ago} days"),
+        )
+        conn.commit()
+
+def queued_for(customer_id):
+    with get_connection() as conn:
+        rows = conn.execute("SELECT payload FROM NotificationOutbox WHERE kind = 'abandoned_wishlist' AND customer_id = ?", (customer_id,)).fetchall()
+    return [json.loads(row["payload"]) for row in rows]
+
+class TestAbandonedWishlistSweep(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        initialize_database()
+
+    def test_customer_spanning_batches_notified_once(self):
+        many, few = make_customer(), make_customer()
+        # Interleave the two customers so every batch of two holds wishes of both.
+        for product_id in range(1, 6):
+            add_old_wish(many, product_id, 30 - product_id)
+            if product_id <= 2:
+                add_old_wish(few, product_id, 30 - product_id)
+        name = f"test_{uuid.uuid4().hex[:8]}"
+
+        summary = sweep_abandoned_wishlists(batch_size=2, reset=True, name=name)
+        self.assertGreaterEqual(summary["batches"], 4)
+        notifications = queued_for(many)
+        self.assertEqual(len(notifications), 1)
+        self.assertEqual(sorted(w["product_id"] for w in notifications[0]["wishes"]), [1, 2, 3, 4, 5])
+        self.assertEqual(len(queued_for(few)), 1)
+
+        # The checkpoint has moved past every wish, so a re-run queues nothing.
+        self.assertEqual(sweep_abandoned_wishlists(batch_size=2, name=name)["notifications"], 0)
+        self.assertEqual(len(queued_for(many)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from connection_db import get_connection
+
+# Tables whose every insert, update and delete bumps a change counter.
+TRACKED_TABLES = ('Inventory', 'Reviews', 'Customers')
+# Inventory columns counted separately under 'Catalog', so a purchase that
+# only moves stock_count does not change the catalog version.
+CATALOG_COLUMNS = ('name', 'category', 'price', 'description')
+
+
+def create_table_versions_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS TableVersions (
+                table_name TEXT PRIMARY KEY NOT NULL,
+                version INT NOT NULL DEFAULT 0
+                );
+            ''')
+            for table in TRACKED_TABLES:
+                conn.execute("INSERT OR IGNORE INTO TableVersions (table_name) VALUES (?)", (table,))
+                # The bump runs inside the writer's transaction, so a reader
+                # never sees new rows with an old version or the reverse.
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table.lower()}_version_{event.lower()} AFTER {event} ON {table}
+                        BEGIN UPDATE TableVersions SET version = version + 1 WHERE table_name = '{table}'; END;
+                    ''')
+            conn.execute("INSERT OR IGNORE INTO TableVersions (table_name) VALUES ('Catalog')")
+            changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in CATALOG_COLUMNS)
+            for event, when in (('INSERT', ''), ('DELETE', ''), ('UPDATE', f'WHEN {changed}')):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS catalog_version_{event.lower()} AFTER {event} ON Inventory {when}
+                    BEGIN UPDATE TableVersions SET version = version + 1 WHERE table_name = 'Catalog'; END;
+                ''')
+            conn.commit()
+        print('TableVersions table created successfully.')
+    except:
+        print('An error occured while creating the table versions table.')
+
+
+def get_table_versions(conn=None):
+    """
+    Current change counter of every tracked table.
+
+    Args:
+        conn (sqlite3.Connection, optional): Read on this connection, e.g.
+            inside a read transaction that also reads the table.
+
+    Returns:
+        dict: Table name to version.
+    """
+    if conn is not None:
+        return {row["table_name"]: row["version"] for row in conn.execute("SELECT table_name, version FROM TableVersions")}
+    with get_connection() as conn:
+        return get_table_versions(conn)
+
+
+def get_table_version(table, conn=None):
+    return get_table_versions(conn).get(table, 0)
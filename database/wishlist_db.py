@@ -1,69 +1,77 @@
-import sqlite3
-from datetime import datetime, timedelta
+import hashlib
+from connection_db import get_connection
+from outbox_db import enqueue_notifications
 
-def connect_to_db():
-    conn = sqlite3.connect('ecommerce.db')
-    return conn
+ABANDONED_AFTER_DAYS = 7
+SWEEP_BATCH_SIZE = 500
+SWEEP_NAME = 'abandoned_wishlist'
 
 def create_wishlist_table():
     try:
-        conn = connect_to_db()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS Wishes (
-            wish_id INT AUTO_INCREMENT PRIMARY KEY,
-            customer_id INT NOT NULL,
-            product_id INT NOT NULL,
-            quantity INT NOT NULL,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (product_id) REFERENCES Inventory(product_id),
-            FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
-            );
-        ''')
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS Wishes (
+                wish_id INTEGER PRIMARY KEY NOT NULL,
+                customer_id INT NOT NULL,
+                product_id INT NOT NULL,
+                quantity INT NOT NULL,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (product_id) REFERENCES Inventory(product_id),
+                FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+                );
+            ''')
+            conn.commit()
         print('Wishlist table created successfully.')
     except:
         print('An error occured while creating the wishlist table.')
-    finally:
-        conn.close()
+
+def create_wishlist_sweep_table():
+    try:
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS WishlistSweep (
+                name TEXT PRIMARY KEY NOT NULL,
+                last_added_at TIMESTAMP NOT NULL,
+                last_wish_id INT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            ''')
+            conn.commit()
+        print('WishlistSweep table created successfully.')
+    except:
+        print('An error occured while creating the wishlist sweep table.')
 
 def insert_wish(wish):
     inserted_wish = {}
     try:
-        conn = connect_to_db()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Wishes (customer_id, product_id, quantity) VALUES (?, ?, ?)", (wish['customer_id'], wish["product_id"], wish["quantity"]) )
-        conn.commit()
-        inserted_wish = get_wish_by_id(cur.lastrowid)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO Wishes (customer_id, product_id, quantity) VALUES (?, ?, ?) RETURNING *", (wish['customer_id'], wish["product_id"], wish["quantity"]) )
+            inserted_wish = dict(cur.fetchone())
+            conn.commit()
     except:
         print("Insertion failed.")
-        conn().rollback()
-    finally:
-        conn.close()
     return inserted_wish
 
 def delete_wish(customer_id, product_id):
     message = {}
     try:
-        conn = connect_to_db()
-        conn.execute("DELETE from Wishes WHERE customer_id = ? AND product_id = ?",(customer_id,product_id))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("DELETE from Wishes WHERE customer_id = ? AND product_id = ?",(customer_id,product_id))
+            conn.commit()
         message["status"] = "Wish removed from wishlist"
     except:
         print("Deletion failed.")
-        conn.rollback()
         message["status"] = "Cannot remove wish"
-    finally:
-        conn.close()
     return message
 
 def get_wishes(customer_id):
     wishes = []
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Wishes WHERE customer_id = ?", (customer_id))
-        rows = cur.fetchall()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Wishes WHERE customer_id = ?", (customer_id,))
+            rows = cur.fetchall()
         for i in rows:
             wish = {}
             wish["wish_id"] = i["wish_id"]
@@ -80,11 +88,10 @@ def get_wishes(customer_id):
 def get_wish_by_id(wish_id):
     wish = {}
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Wishes WHERE wish_id = ?",(wish_id,))
-        row = cur.fetchone()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM Wishes WHERE wish_id = ?",(wish_id,))
+            row = cur.fetchone()
         wish["wish_id"] = row["wish_id"]
         wish["customer_id"] = row["customer_id"]
         wish["product_id"] = row["product_id"]
@@ -92,32 +99,130 @@ def get_wish_by_id(wish_id):
         wish["added_at"] = row["added_at"]
     except:
         print(f"Failed to fetch wish with id: {wish_id}")
-        product = {}
-    return product
+        wish = {}
+    return wish
 
 
 def notify_abandoned_wishlist(customer_id):
+    queued = 0
     try:
-        conn = connect_to_db()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT wish_id, customer_id, product_id, quantity, added_at FROM Wishes WHERE customer_id = ? AND added_at < datetime('now', ?)", (customer_id, f"-{ABANDONED_AFTER_DAYS} days"))
+            abandoned_wishes = [dict(row) for row in cur.fetchall()]
+
+            if not abandoned_wishes:
+                print(f"No abandoned wishlist items found for customer {customer_id}.")
+                return queued
+
+            queued = enqueue_notifications(conn, [abandoned_wishlist_notification(customer_id, abandoned_wishes)])
+            conn.commit()
+    except Exception as e:
+        print(f"Failed to process abandoned wishlist notification: {e}")
+    return queued
+
+def abandoned_wishlist_message(customer_id, wishes):
+    items = ", ".join(f"product {w['product_id']} (quantity: {w['quantity']})" for w in wishes)
+    return (f"Customer {customer_id}, your wishlist still holds {items}. "
+            f"Consider purchasing!")
 
-        abandoned_threshold = datetime.now() - timedelta(days=7)
+def abandoned_wishlist_notification(customer_id, wishes):
+    # The same set of wishes always yields the same key, so re-sweeps and
+    # repeated per-customer requests do not notify twice.
+    wish_ids = ",".join(str(w["wish_id"]) for w in sorted(wishes, key=lambda w: w["wish_id"]))
+    return {
+        "kind": "abandoned_wishlist",
+        "customer_id": customer_id,
+        "payload": {"message": abandoned_wishlist_message(customer_id, wishes), "wishes": wishes},
+        "dedupe_key": f"abandoned_wishlist:{customer_id}:{hashlib.sha1(wish_ids.encode()).hexdigest()}",
+    }
 
-        cur.execute("SELECT * FROM Wishes WHERE customer_id = ? AND added_at < ?", (customer_id, abandoned_threshold))
+def get_sweep_checkpoint(name=SWEEP_NAME):
+    with get_connection() as conn:
+        row = conn.execute("SELECT last_added_at, last_wish_id FROM WishlistSweep WHERE name = ?", (name,)).fetchone()
+    return (row["last_added_at"], row["last_wish_id"]) if row else ('', 0)
 
-        abandoned_wishes = cur.fetchall()
+def save_sweep_checkpoint(conn, name, last_key):
+    conn.execute('''
+        INSERT INTO WishlistSweep (name, last_added_at, last_wish_id) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET
+            last_added_at = excluded.last_added_at,
+            last_wish_id = excluded.last_wish_id,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (name, last_key[0], last_key[1]))
 
-        if not abandoned_wishes:
-            print(f"No abandoned wishlist items found for customer {customer_id}.")
+def iter_abandoned_wish_groups(since, cutoff, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Walk wishes added after ``since`` and before ``cutoff`` in added_at order.
+
+    Each batch is one keyset seek on idx_wishes_added, so every wish is read
+    once per run and no read is held open while the caller handles a batch.
+
+    Args:
+        since (tuple): (added_at, wish_id) of the last wish already swept.
+        cutoff (str): Wishes added at or after this timestamp are not abandoned yet.
+        batch_size (int): Rows read per batch.
+
+    Yields:
+        tuple: ({customer_id: [wish dicts]} for one batch, (added_at, wish_id) of its last wish).
+    """
+    while True:
+        with get_connection() as conn:
+            rows = conn.execute('''
+                SELECT wish_id, customer_id, product_id, quantity, added_at FROM Wishes
+                WHERE (added_at, wish_id) > (?, ?) AND added_at < ?
+                ORDER BY added_at, wish_id
+                LIMIT ?
+            ''', (since[0], since[1], cutoff, batch_size)).fetchall()
+        if not rows:
             return
+        groups = {}
+        for row in rows:
+            groups.setdefault(row["customer_id"], []).append(dict(row))
+        since = (rows[-1]["added_at"], rows[-1]["wish_id"])
+        yield groups, since
 
-        for wish in abandoned_wishes:
-            print(f"Notification: Customer {wish['customer_id']}, "
-                  f"your wish for product {wish['product_id']} (quantity: {wish['quantity']}) "
-                  f"added on {wish['added_at']} is still in your wishlist. Consider purchasing!")
+def sweep_abandoned_wishlists(days=ABANDONED_AFTER_DAYS, batch_size=SWEEP_BATCH_SIZE, reset=False, name=SWEEP_NAME):
+    """
+    Notify every customer whose wishes became abandoned since the last sweep.
 
-    except Exception as e:
-        print(f"Failed to process abandoned wishlist notification: {e}")
-    finally:
-        conn.close()
\ No newline at end of file
+    Wishes are read in keyset batches and grouped by customer over the whole
+    run, so a customer whose wishes span several batches still gets a single
+    notification. The notifications are queued in the outbox and the
+    checkpoint advanced in one transaction at the end, so a re-run only reads
+    wishes that crossed the threshold since the previous one, and an
+    interrupted run leaves nothing behind and is simply repeated.
+
+    Args:
+        days (int): Age in days after which a wish counts as abandoned.
+        batch_size (int): Wishes read per batch.
+        reset (bool): Ignore the checkpoint and sweep every abandoned wish.
+        name (str): Checkpoint name, to keep independent sweeps apart.
+
+    Returns:
+        dict: Counts of wishes, notifications queued, batches and the new checkpoint.
+    """
+    with get_connection() as conn:
+        cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{int(days)} days",)).fetchone()[0]
+    since = ('', 0) if reset else get_sweep_checkpoint(name)
+    summary = {"wishes": 0, "notifications": 0, "batches": 0, "cutoff": cutoff}
+    customers = {}
+    for groups, last_key in iter_abandoned_wish_groups(since, cutoff, batch_size):
+        for customer_id, wishes in groups.items():
+            customers.setdefault(customer_id, []).extend(wishes)
+        summary["wishes"] += sum(len(wishes) for wishes in groups.values())
+        summary["batches"] += 1
+        since = last_key
+    if customers:
+        notifications = [abandoned_wishlist_notification(customer_id, wishes) for customer_id, wishes in customers.items()]
+        with get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                summary["notifications"] = enqueue_notifications(conn, notifications)
+                save_sweep_checkpoint(conn, name, since)
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+    summary["checkpoint"] = {"added_at": since[0], "wish_id": since[1]}
+    return summary
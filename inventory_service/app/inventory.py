@@ -1,10 +1,12 @@
 import cProfile
 import pstats
 import io
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import requests
 import logging
+from shared.catalog_snapshot import CatalogSnapshot, serving_process, snapshot_response
+from shared.relay import conditional_headers, relay_json, relay_stream
 
 DATABASE_SERVICE_URL = "http://database:5000"
 
@@ -36,6 +38,8 @@ def profile_function(func):
         return result
     return wrapper
 
+catalog = CatalogSnapshot(DATABASE_SERVICE_URL)
+
 @app.route('/health', methods=['GET'])
 @profile_function
 @profile
@@ -47,15 +51,93 @@ def health_check():
 @app.route('/inventory', methods=['GET'])
 @profile_function
 def api_get_products():
+    """
+    Get all products in the inventory.
+
+    Without query parameters the list is served from the in-memory catalog
+    snapshot once it is loaded; its version is in the X-Catalog-Version header.
+
+    Query Parameters:
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+        stream (str, optional): "ndjson" or "json" to stream every row
+            instead of paging; the body is relayed with constant memory.
+
+    Headers:
+        If-None-Match (str, optional): ETag of an earlier response; answered
+            with an empty 304 if the data has not changed since.
+
+    Returns:
+        Response: JSON list of products, or {"items", "next_cursor"} when paginated.
+    """
     try:
         logger.info("Fetching all products")
-        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory")
-        return jsonify(response.json()), response.status_code
+        version, body = catalog.listing_body()
+        if body is not None and not request.args:
+            return snapshot_response(version, Response(body, status=200, mimetype="application/json"))
+        if request.args.get("stream"):
+            return relay_stream(requests.get(f"{DATABASE_SERVICE_URL}/inventory", params=request.args, stream=True))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory", params=request.args, headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching products: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/inventory/query', methods=['GET'])
+@profile_function
+def api_query_products():
+    """
+    List products matching filters, in a chosen order, one page at a time.
+
+    Query Parameters:
+        category (str, optional): Only products in this category.
+        min_price (float, optional): Lowest price, inclusive.
+        max_price (float, optional): Highest price, inclusive.
+        in_stock (bool, optional): "true" for products with stock left only.
+        sort (str, optional): product_id (default), price, -price, name,
+            -name, stock_count or -stock_count; "-" sorts descending.
+        limit (int, optional): Page size (1-1000, default 100).
+        cursor (str, optional): The next_cursor of the previous page, for the same sort.
+        explain (bool, optional): Include the SQLite query plan as "plan".
+
+    Returns:
+        Response: JSON {"items", "next_cursor"}, or error details for invalid parameters.
+    """
+    try:
+        logger.info("Querying products: %s", dict(request.args))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory/query", params=request.args, headers=conditional_headers())
+        return relay_json(response)
+    except requests.exceptions.RequestException as e:
+        logger.error("Error querying products: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/inventory/search', methods=['GET'])
+@profile_function
+def api_search_products():
+    """
+    Search products by name and description, best matches first.
+
+    Query Parameters:
+        q (str): Words to search for; each word also matches as a prefix.
+        category (str, optional): Only return products in this category.
+        limit (int, optional): Page size (1-1000, default 100).
+        cursor (str, optional): The next_cursor of the previous page.
+
+    Returns:
+        Response: JSON {"items", "next_cursor"} with ranked products, or
+        error details if q has no searchable words.
+    """
+    try:
+        logger.info("Searching products: %s", request.args.get("q"))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory/search", params=request.args, headers=conditional_headers())
+        return relay_json(response)
+    except requests.exceptions.RequestException as e:
+        logger.error("Error searching products: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/inventory/add', methods=['POST'])
 @profile_function
 @profile
@@ -78,11 +160,41 @@ def api_add_product():
     try:
         logger.info("Adding a new product: %s", product)
         response = requests.post(f"{DATABASE_SERVICE_URL}/inventory/add", json=product)
+        catalog.changed()
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
         logger.error("Error adding product: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/inventory/import', methods=['POST'])
+@profile_function
+@profile
+def api_import_products():
+    """
+    Bulk import products, e.g. a supplier catalog.
+
+    Request:
+        Either a JSON array of product objects (same fields as /inventory/add)
+        or a text/csv body with a header row of name, category, price,
+        description, stock_count.
+
+    Returns:
+        Response: JSON with a per-row result (inserted with its product_id,
+        or invalid/failed with errors) and a throughput summary.
+    """
+    try:
+        logger.info("Importing products (%s, %d bytes)", request.mimetype, request.content_length or 0)
+        response = requests.post(
+            f"{DATABASE_SERVICE_URL}/inventory/import",
+            data=request.get_data(),
+            headers={"Content-Type": request.content_type or "application/json"},
+        )
+        catalog.changed()
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error importing products: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/inventory/update', methods=['PUT'])
 def api_update_product():
     """
@@ -104,6 +216,7 @@ def api_update_product():
     try:
         logger.info("Updating product: %s", product)
         response = requests.put(f"{DATABASE_SERVICE_URL}/inventory/update", json=product)
+        catalog.changed()
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
         logger.error("Error updating product: %s", str(e))
@@ -123,6 +236,7 @@ def api_delete_product(product_id):
     try:
         logger.info("Deleting product with ID: %s", product_id)
         response = requests.delete(f"{DATABASE_SERVICE_URL}/inventory/delete/{product_id}")
+        catalog.changed()
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
         logger.error("Error deleting product: %s", str(e))
@@ -132,7 +246,7 @@ def api_delete_product(product_id):
 @app.route('/inventory/<product_id>', methods=['GET'])
 def api_get_product_by_id(product_id):
     """
-    Get details of a specific product.
+    Get details of a specific product, from the catalog snapshot when it has it.
 
     Args:
         product_id (int): ID of the product to fetch.
@@ -142,8 +256,11 @@ def api_get_product_by_id(product_id):
     """
     try:
         logger.info("Fetching product details for ID: %s", product_id)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory/{product_id}")
-        return jsonify(response.json()), response.status_code
+        version, product = catalog.get(product_id)
+        if product is not None:
+            return snapshot_response(version, jsonify(product))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory/{product_id}", headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching product details: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -156,13 +273,18 @@ def api_get_products_by_category(category):
     Args:
         category (str): The category to filter products by.
 
+    Query Parameters:
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+
     Returns:
-        Response: JSON list of products in the specified category.
+        Response: JSON list of products in the specified category, or
+        {"items", "next_cursor"} when paginated.
     """
     try:
         logger.info("Fetching products in category: %s", category)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory/categories/{category}")
-        return jsonify(response.json()), response.status_code
+        response = requests.get(f"{DATABASE_SERVICE_URL}/inventory/categories/{category}", params=request.args, headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching products by category: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -172,4 +294,6 @@ if __name__ == "__main__":
     Starts the Inventory Service on port 5002.
     """
     logger.info("Starting Inventory Service")
+    if serving_process(debug=True):
+        catalog.start()
     app.run(host="0.0.0.0", port=5002, debug=True)
@@ -1,6 +1,8 @@
+import os
 import unittest
 from unittest.mock import patch, MagicMock
-from inventory import app
+from inventory import app, catalog
+from shared.catalog_snapshot import serving_process
 
 class TestInventoryService(unittest.TestCase):
     def setUp(self):
@@ -20,6 +22,27 @@ class TestInventoryService(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, [{"name": "Product1", "price": 10.0}])
 
+    @patch('inventory.requests.get')
+    def test_get_products_paginated(self, mock_get):
+        page = {"items": [{"product_id": 3, "name": "Product3"}], "next_cursor": "eyJhZnRlciI6M30"}
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: page)
+        response = self.client.get('/inventory?limit=1&cursor=eyJhZnRlciI6Mn0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, page)
+        self.assertEqual(dict(mock_get.call_args.kwargs["params"]), {"limit": "1", "cursor": "eyJhZnRlciI6Mn0"})
+
+    @patch('inventory.requests.get')
+    def test_get_products_streamed(self, mock_get):
+        upstream = MagicMock(status_code=200, headers={"Content-Type": "application/x-ndjson"})
+        upstream.iter_content.return_value = iter([b'{"product_id": 1}\n', b'{"product_id": 2}\n'])
+        mock_get.return_value = upstream
+        response = self.client.get('/inventory?stream=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual(response.get_data(), b'{"product_id": 1}\n{"product_id": 2}\n')
+        self.assertTrue(mock_get.call_args.kwargs["stream"])
+        upstream.close.assert_called_once()
+
     @patch('inventory.requests.post')
     def test_add_product(self, mock_post):
         mock_post.return_value = MagicMock(status_code=201, json=lambda: {"message": "Product added"})
@@ -27,5 +50,98 @@ class TestInventoryService(unittest.TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.json, {"message": "Product added"})
 
+    @patch('inventory.requests.post')
+    def test_import_products_csv(self, mock_post):
+        report = {"results": [{"row": 0, "status": "inserted", "product_id": 1}], "summary": {"received": 1, "inserted": 1}}
+        mock_post.return_value = MagicMock(status_code=201, json=lambda: report)
+        body = "name,category,price,description,stock_count\nProduct1,Food,10.0,Fresh,5\n"
+        response = self.client.post('/inventory/import', data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json, report)
+        self.assertEqual(mock_post.call_args.kwargs["data"], body.encode())
+        self.assertEqual(mock_post.call_args.kwargs["headers"], {"Content-Type": "text/csv"})
+
+    @patch('inventory.requests.get')
+    def test_search_products(self, mock_get):
+        page = {"items": [{"product_id": 1, "name": "Red running shoes", "rank": -1.2}], "next_cursor": None}
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: page)
+        response = self.client.get('/inventory/search?q=red+sho')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, page)
+        self.assertEqual(mock_get.call_args.kwargs["params"].get("q"), "red sho")
+
+    @patch('inventory.requests.get')
+    def test_query_products(self, mock_get):
+        page = {"items": [{"product_id": 7, "name": "Phone", "category": "Electronics", "price": 150.0}], "next_cursor": None}
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: page)
+        response = self.client.get('/inventory/query?category=Electronics&max_price=200&in_stock=true&sort=price')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, page)
+        self.assertEqual(
+            dict(mock_get.call_args.kwargs["params"]),
+            {"category": "Electronics", "max_price": "200", "in_stock": "true", "sort": "price"},
+        )
+
+    @patch('shared.catalog_snapshot.requests.get')
+    def test_get_products_from_catalog_snapshot(self, mock_get):
+        products = [{"product_id": 1, "name": "Product1", "category": "Food", "price": 10.0, "description": "Fresh", "stock_count": 5}]
+        mock_get.side_effect = [
+            MagicMock(status_code=200, json=lambda: {"Inventory": 7, "Catalog": 3}),
+            MagicMock(status_code=200, json=lambda: {"version": 3, "stock_version": 7, "products": products}),
+        ]
+        try:
+            catalog.check()
+            response = self.client.get('/inventory')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, products)
+            self.assertEqual(response.headers["X-Catalog-Version"], "3.7")
+            self.assertEqual(self.client.get('/inventory/1').json, products[0])
+            self.assertEqual(mock_get.call_count, 2)
+        finally:
+            catalog.clear()
+
+    @patch('shared.catalog_snapshot.requests.get')
+    def test_get_products_from_catalog_snapshot_not_modified(self, mock_get):
+        mock_get.side_effect = [
+            MagicMock(status_code=200, json=lambda: {"Inventory": 7, "Catalog": 3}),
+            MagicMock(status_code=200, json=lambda: {"version": 3, "stock_version": 7, "products": [{"product_id": 1, "name": "Product1"}]}),
+        ]
+        try:
+            catalog.check()
+            etag = self.client.get('/inventory').headers["ETag"]
+            response = self.client.get('/inventory', headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.get_data(), b"")
+            self.assertEqual(mock_get.call_count, 2)
+        finally:
+            catalog.clear()
+
+    @patch('shared.catalog_snapshot.requests.get')
+    def test_catalog_snapshot_stock_only_change(self, mock_get):
+        products = [{"product_id": 1, "name": "Product1", "category": "Food", "price": 10.0, "description": "Fresh", "stock_count": 5}]
+        mock_get.side_effect = [
+            MagicMock(status_code=200, json=lambda: {"Inventory": 7, "Catalog": 3}),
+            MagicMock(status_code=200, json=lambda: {"version": 3, "stock_version": 7, "products": products}),
+            MagicMock(status_code=200, json=lambda: {"Inventory": 8, "Catalog": 3}),
+            MagicMock(status_code=200, json=lambda: {"stock_version": 8, "stock": [[1, 4]]}),
+        ]
+        try:
+            catalog.check()
+            catalog.check()
+            self.assertTrue(mock_get.call_args.args[0].endswith("/inventory/stock"))
+            response = self.client.get('/inventory')
+            self.assertEqual(response.json, [dict(products[0], stock_count=4)])
+            self.assertEqual(response.headers["X-Catalog-Version"], "3.8")
+        finally:
+            catalog.clear()
+
+    def test_poller_only_in_serving_process(self):
+        with patch.dict(os.environ):
+            os.environ.pop("WERKZEUG_RUN_MAIN", None)
+            self.assertFalse(serving_process(debug=True))
+            self.assertTrue(serving_process(debug=False))
+            os.environ["WERKZEUG_RUN_MAIN"] = "true"
+            self.assertTrue(serving_process(debug=True))
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,7 @@ import sqlite3
 from flask import Flask, request, jsonify, session
 from flask_cors import CORS 
 from werkzeug.security import generate_password_hash, check_password_hash
-from database.auth_db import connect_to_db, create_users_table
+from database.auth_db import get_connection, create_users_table
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -24,7 +24,7 @@ def signup():
     hashed_password = generate_password_hash(password, method='sha256')
 
     try:
-        with connect_to_db() as conn:
+        with get_connection() as conn:
             conn.execute('INSERT INTO Users (username, password, role) VALUES (?, ?, ?)',(username, hashed_password, role))
             conn.commit()
         return jsonify({"message": f"User {username} created successfully!"}), 201
@@ -41,7 +41,7 @@ def login():
     if not username or not password:
         return jsonify({"message": "Username and password are required!"}), 400
 
-    with connect_to_db() as conn:
+    with get_connection() as conn:
         user = conn.execute('SELECT * FROM Users WHERE username = ?',(username,)).fetchone()
 
     if not user or not check_password_hash(user['password'], password):
@@ -5,6 +5,7 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import requests
 import logging
+from shared.relay import conditional_headers, relay_json
 
 DATABASE_SERVICE_URL = "http://database:5000"
 
@@ -126,17 +127,48 @@ def api_get_product_reviews(product_id):
     Args:
         product_id (int): ID of the product to fetch reviews for.
 
+    Query Parameters:
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+
+    Headers:
+        If-None-Match (str, optional): ETag of an earlier response; answered
+            with an empty 304 if the data has not changed since.
+
     Returns:
-        Response: JSON list of reviews for the specified product.
+        Response: JSON list of reviews for the specified product, or
+        {"items", "next_cursor"} when paginated.
     """
     try:
         logger.info("Fetching reviews for product ID: %s", product_id)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/reviews/product/{product_id}")
-        return jsonify(response.json()), response.status_code
+        response = requests.get(f"{DATABASE_SERVICE_URL}/reviews/product/{product_id}", params=request.args, headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching product reviews: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/reviews/product/<product_id>/stats', methods=['GET'])
+def api_get_product_rating_stats(product_id):
+    """
+    Get the rating summary of a specific product.
+
+    The aggregates are maintained as reviews are approved, updated and
+    deleted, so this does not read the product's reviews.
+
+    Args:
+        product_id (int): ID of the product to fetch the summary for.
+
+    Returns:
+        Response: JSON with review_count, average_rating and a per-star histogram.
+    """
+    try:
+        logger.info("Fetching rating stats for product ID: %s", product_id)
+        response = requests.get(f"{DATABASE_SERVICE_URL}/reviews/product/{product_id}/stats", headers=conditional_headers())
+        return relay_json(response)
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching product rating stats: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/reviews/customer/<customer_id>', methods=['GET'])
 def api_get_customer_reviews(customer_id):
     """
@@ -150,8 +182,8 @@ def api_get_customer_reviews(customer_id):
     """
     try:
         logger.info("Fetching reviews for customer ID: %s", customer_id)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/reviews/customer/{customer_id}")
-        return jsonify(response.json()), response.status_code
+        response = requests.get(f"{DATABASE_SERVICE_URL}/reviews/customer/{customer_id}", headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching customer reviews: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -163,12 +195,16 @@ def api_approve_review():
     """
     Approve a submitted review.
 
+    The review is published and removed from the moderation queue in one
+    transaction.
+
     Request:
         JSON object containing:
             - review_id (int): ID of the review to approve.
 
     Returns:
-        Response: JSON with confirmation message or error details.
+        Response: JSON with confirmation message and the published review,
+        or error details (404 if the review is not pending).
     """
     review = request.get_json()
     try:
@@ -179,6 +215,54 @@ def api_approve_review():
         logger.error("Error approving review: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/reviews/moderate', methods=['POST'])
+@profile_function
+@profile
+def api_moderate_reviews():
+    """
+    Approve and reject many submitted reviews in one transaction.
+
+    Request:
+        JSON object containing:
+            - approve (list, optional): IDs of pending reviews to publish.
+            - reject (list, optional): IDs of pending reviews to discard.
+
+    Returns:
+        Response: JSON with the published reviews under "approved", the
+        discarded IDs under "rejected" and IDs that were not pending under
+        "missing", or error details for an invalid batch.
+    """
+    batch = request.get_json()
+    try:
+        logger.info("Moderating reviews: %s", batch)
+        response = requests.post(f"{DATABASE_SERVICE_URL}/reviews/moderate", json=batch)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error moderating reviews: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/reviews/moderation', methods=['GET'])
+def api_get_moderation_queue():
+    """
+    Get the reviews waiting for moderation, oldest first.
+
+    Query Parameters:
+        product_id (int, optional): Only reviews of this product.
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+
+    Returns:
+        Response: JSON list of pending reviews, or {"items", "next_cursor"}
+        when paginated.
+    """
+    try:
+        logger.info("Fetching moderation queue")
+        response = requests.get(f"{DATABASE_SERVICE_URL}/reviews/moderation", params=request.args)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching moderation queue: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/reviews/reject/<review_id>', methods=['DELETE'])
 def api_reject_review(review_id):
     """
@@ -27,5 +27,35 @@ class TestReviewsService(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, [{"product_id": 1, "rating": 5, "comment": "Great product!"}])
 
+    @patch('reviews_service.requests.get')
+    def test_get_product_rating_stats(self, mock_get):
+        stats = {"product_id": 1, "review_count": 2, "average_rating": 4.5, "histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}}
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: stats)
+        response = self.client.get('/reviews/product/1/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, stats)
+
+    @patch('reviews_service.requests.post')
+    def test_moderate_reviews(self, mock_post):
+        result = {
+            "approved": [{"review_id": 10, "customer_id": 1, "product_id": 1, "rating": 5, "comment": "Great product!"}],
+            "rejected": [2],
+            "missing": [3],
+        }
+        mock_post.return_value = MagicMock(status_code=200, json=lambda: result)
+        batch = {"approve": [1], "reject": [2, 3]}
+        response = self.client.post('/reviews/moderate', json=batch)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, result)
+        self.assertEqual(mock_post.call_args.kwargs["json"], batch)
+
+    @patch('reviews_service.requests.get')
+    def test_get_product_reviews_not_modified(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=304, headers={"ETag": '"3f2a"'})
+        response = self.client.get('/reviews/product/1', headers={"If-None-Match": '"3f2a"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], '"3f2a"')
+        self.assertEqual(mock_get.call_args.kwargs["headers"], {"If-None-Match": '"3f2a"'})
+
 if __name__ == '__main__':
     unittest.main()
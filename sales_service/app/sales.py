@@ -1,10 +1,12 @@
 import cProfile
 import pstats
 import io
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import requests
 import logging
+from shared.catalog_snapshot import CatalogSnapshot, serving_process, snapshot_response
+from shared.relay import conditional_headers, relay_json
 
 DATABASE_SERVICE_URL = "http://database:5000"
 
@@ -36,6 +38,8 @@ def profile_function(func):
         return result
     return wrapper
 
+catalog = CatalogSnapshot(DATABASE_SERVICE_URL, listing=lambda product: {"name": product["name"], "price": product["price"]})
+
 @app.route('/health', methods=['GET'])
 @profile_function
 def health_check():
@@ -49,13 +53,28 @@ def api_get_products():
     """
     Get a list of all products available for sale (name, price).
 
+    Without query parameters the list is served from the in-memory catalog
+    snapshot once it is loaded; its version is in the X-Catalog-Version header.
+
+    Query Parameters:
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+
+    Headers:
+        If-None-Match (str, optional): ETag of an earlier response; answered
+            with an empty 304 if the data has not changed since.
+
     Returns:
-        Response: JSON list of products with basic details (e.g., name, price).
+        Response: JSON list of products with basic details (e.g., name, price),
+        or {"items", "next_cursor"} when paginated.
     """
     try:
         logger.info("Fetching all products available for sale")
-        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/products")
-        return jsonify(response.json()), response.status_code
+        version, body = catalog.listing_body()
+        if body is not None and not request.args:
+            return snapshot_response(version, Response(body, status=200, mimetype="application/json"))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/products", params=request.args, headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching products: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -65,7 +84,7 @@ def api_get_products():
 @profile_function
 def api_get_product_detail(product_id):
     """
-    Get detailed information about a specific product.
+    Get detailed information about a specific product, from the catalog snapshot when it has it.
 
     Args:
         product_id (int): ID of the product to fetch details for.
@@ -75,8 +94,11 @@ def api_get_product_detail(product_id):
     """
     try:
         logger.info("Fetching product details for ID: %s", product_id)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/products/{product_id}")
-        return jsonify(response.json()), response.status_code
+        version, product = catalog.get(product_id)
+        if product is not None:
+            return snapshot_response(version, jsonify(product))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/products/{product_id}", headers=conditional_headers())
+        return relay_json(response)
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching product details: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -88,25 +110,59 @@ def api_process_sale():
     """
     Process a sale.
 
+    The database service checks the balance, decrements the stock, debits the
+    wallet and records the sale in a single transaction, pricing the sale from
+    the inventory.
+
     Request:
         JSON object containing:
             - customer_id (int): ID of the customer making the purchase.
             - product_id (int): ID of the product being purchased.
             - quantity (int): Quantity of the product to purchase.
-            - total_price (float): Total cost of the purchase.
 
     Returns:
-        Response: JSON confirmation of the sale or error details.
+        Response: JSON with the created sale, or error details (404 unknown
+        customer or product, 409 out of stock, 402 insufficient balance).
     """
     sale = request.get_json()
     try:
         logger.info("Processing sale: %s", sale)
         response = requests.post(f"{DATABASE_SERVICE_URL}/sales/purchase", json=sale)
+        catalog.changed()
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
         logger.error("Error processing sale: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/sales/cart', methods=['POST'])
+@profile
+@profile_function
+def api_checkout_cart():
+    """
+    Check out a cart of several products in one transaction.
+
+    Either every line is sold with a single wallet debit for the cart total,
+    or nothing is and the response lists the failing lines.
+
+    Request:
+        JSON object containing:
+            - customer_id (int): ID of the customer making the purchase.
+            - items (list): Objects with product_id (int) and quantity (int).
+
+    Returns:
+        Response: JSON with the cart total, new wallet balance and created
+        sales, or an error with per-line details under "errors".
+    """
+    cart = request.get_json()
+    try:
+        logger.info("Checking out cart: %s", cart)
+        response = requests.post(f"{DATABASE_SERVICE_URL}/sales/cart", json=cart)
+        catalog.changed()
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error checking out cart: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/sales/history/<customer_id>', methods=['GET'])
 @profile
 @profile_function
@@ -114,23 +170,113 @@ def api_purchase_history(customer_id):
     """
     Get the purchase history for a specific customer.
 
+    Without a date range only recent (not yet archived) sales are returned;
+    a range reaching back past the archive horizon also reads the archived
+    months it covers.
+
     Args:
         customer_id (int): ID of the customer to fetch purchase history for.
 
+    Query Parameters:
+        start (str, optional): First day, YYYY-MM-DD.
+        end (str, optional): Last day (inclusive), YYYY-MM-DD.
+        limit (int, optional): Page size (1-1000). Enables pagination.
+        cursor (str, optional): The next_cursor of the previous page.
+
     Returns:
-        Response: JSON list of past purchases made by the customer.
+        Response: JSON list of past purchases made by the customer, or
+        {"items", "next_cursor"} when paginated.
     """
     try:
         logger.info("Fetching purchase history for customer ID: %s", customer_id)
-        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/history/{customer_id}")
+        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/history/{customer_id}", params=request.args)
         return jsonify(response.json()), response.status_code
     except requests.exceptions.RequestException as e:
         logger.error("Error fetching purchase history: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/sales/reports/products', methods=['GET'])
+@profile
+@profile_function
+def api_product_sales_report():
+    """
+    Get daily revenue, units sold and order count per product.
+
+    Answered from the daily rollup tables, not by scanning Sales.
+
+    Query Parameters:
+        start (str): First day of the range, YYYY-MM-DD.
+        end (str): Last day of the range (inclusive), YYYY-MM-DD.
+        product_id (int, optional): Restrict the report to one product.
+
+    Returns:
+        Response: JSON with one row per day and product under "days" and the
+        range "totals", or error details for an invalid range.
+    """
+    try:
+        logger.info("Fetching product sales report: %s", dict(request.args))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/reports/products", params=request.args)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching product sales report: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/sales/reports/categories', methods=['GET'])
+@profile
+@profile_function
+def api_category_sales_report():
+    """
+    Get daily revenue, units sold and order count per category.
+
+    Answered from the daily rollup tables, not by scanning Sales.
+
+    Query Parameters:
+        start (str): First day of the range, YYYY-MM-DD.
+        end (str): Last day of the range (inclusive), YYYY-MM-DD.
+        category (str, optional): Restrict the report to one category.
+
+    Returns:
+        Response: JSON with one row per day and category under "days" and
+        the range "totals", or error details for an invalid range.
+    """
+    try:
+        logger.info("Fetching category sales report: %s", dict(request.args))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/reports/categories", params=request.args)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching category sales report: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/sales/reports/breakdown', methods=['GET'])
+@profile
+@profile_function
+def api_sales_breakdown():
+    """
+    Get revenue, units sold and order count of all sales grouped by customer
+    and product attributes.
+
+    Query Parameters:
+        by (str): Comma-separated dimensions: age_band, gender, marital_status, category.
+        engine (str, optional): "numpy" (default) aggregates cached column
+            arrays in memory; "sql" groups in SQLite on every call.
+
+    Returns:
+        Response: JSON with the "groups", overall "totals", the engine used
+        and its timing, or error details for an unknown dimension.
+    """
+    try:
+        logger.info("Fetching sales breakdown: %s", dict(request.args))
+        response = requests.get(f"{DATABASE_SERVICE_URL}/sales/analytics", params=request.args)
+        return jsonify(response.json()), response.status_code
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching sales breakdown: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == "__main__":
     """
     Starts the Sales Service on port 5004.
     """
     logger.info("Starting Sales Service")
+    if serving_process(debug=True):
+        catalog.start()
     app.run(host="0.0.0.0", port=5004, debug=True)
@@ -1,6 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from sales import app
+from sales import app, catalog
 
 class TestSalesService(unittest.TestCase):
     def setUp(self):
@@ -27,5 +27,66 @@ class TestSalesService(unittest.TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.json, {"message": "Sale processed"})
 
+    @patch('sales.requests.post')
+    def test_checkout_cart(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=201, json=lambda: {"customer_id": 1, "total_price": 30.0, "sales": []})
+        cart = {"customer_id": 1, "items": [{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1}]}
+        response = self.client.post('/sales/cart', json=cart)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json["total_price"], 30.0)
+        mock_post.assert_called_once_with("http://database:5000/sales/cart", json=cart)
+
+    @patch('sales.requests.get')
+    def test_category_sales_report(self, mock_get):
+        report = {
+            "start": "2024-01-01", "end": "2024-01-31",
+            "days": [{"day": "2024-01-02", "category": "Food", "revenue": 20.0, "units": 2, "orders": 1}],
+            "totals": {"revenue": 20.0, "units": 2, "orders": 1},
+        }
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: report)
+        response = self.client.get('/sales/reports/categories?start=2024-01-01&end=2024-01-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, report)
+        self.assertEqual(mock_get.call_args.kwargs["params"].get("start"), "2024-01-01")
+
+    @patch('sales.requests.get')
+    def test_sales_breakdown(self, mock_get):
+        report = {
+            "by": ["gender"],
+            "groups": [{"gender": "F", "revenue": 30.0, "units": 3, "orders": 2}],
+            "totals": {"revenue": 30.0, "units": 3, "orders": 2},
+            "engine": "numpy",
+        }
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: report)
+        response = self.client.get('/sales/reports/breakdown?by=gender')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, report)
+
+    @patch('sales.requests.get')
+    def test_purchase_history_with_date_range(self, mock_get):
+        history = [{"sale_id": 4, "customer_id": 1, "product_id": 2, "quantity": 1, "total_price": 10.0, "order_date": "2022-03-02 10:00:00"}]
+        mock_get.return_value = MagicMock(status_code=200, json=lambda: history)
+        response = self.client.get('/sales/history/1?start=2022-01-01&end=2022-12-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, history)
+        self.assertEqual(dict(mock_get.call_args.kwargs["params"]), {"start": "2022-01-01", "end": "2022-12-31"})
+
+    @patch('shared.catalog_snapshot.requests.get')
+    def test_get_products_from_catalog_snapshot(self, mock_get):
+        products = [{"product_id": 1, "name": "Product1", "category": "Food", "price": 10.0, "description": "Fresh", "stock_count": 5}]
+        mock_get.side_effect = [
+            MagicMock(status_code=200, json=lambda: {"Inventory": 7, "Catalog": 3}),
+            MagicMock(status_code=200, json=lambda: {"version": 3, "stock_version": 7, "products": products}),
+        ]
+        try:
+            catalog.check()
+            response = self.client.get('/sales/products')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, [{"name": "Product1", "price": 10.0}])
+            self.assertEqual(self.client.get('/sales/products/1').json, products[0])
+            self.assertEqual(mock_get.call_count, 2)
+        finally:
+            catalog.clear()
+
 if __name__ == '__main__':
     unittest.main()
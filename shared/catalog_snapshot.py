@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import requests
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+CATALOG_POLL_INTERVAL = float(os.environ.get("CATALOG_POLL_INTERVAL", 1.0))
+
+# Part of every snapshot ETag, so tags from before a restart never match.
+ETAG_EPOCH = secrets.token_hex(4)
+
+def snapshot_response(version, response):
+    """
+    Tag a response served from the catalog snapshot with its version, or
+    turn it into an empty 304 if the client already has that version.
+    """
+    etag = hashlib.sha1(f"{ETAG_EPOCH}|{version}|{request.full_path}".encode()).hexdigest()[:24]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["X-Catalog-Version"] = str(version)
+    return response
+
+def serving_process(debug):
+    """
+    Whether this process serves requests. With the debug reloader on,
+    ``app.run`` first starts a watcher process that only restarts the
+    server; background workers belong in the child it spawns.
+    """
+    return not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+class CatalogSnapshot:
+    """
+    In-memory copy of the product catalog, tagged with the database's table versions.
+
+    A background poller asks the database service for the table versions
+    every ``poll_interval`` seconds. The products are reloaded only when the
+    Catalog version has moved (a product was added, removed or edited); when
+    only the Inventory version has moved, as after a purchase, just the stock
+    counts are fetched. Catalog reads are answered from memory and lag writes
+    made elsewhere by at most one interval. Writes through the service wake
+    the poller at once. Until the first load succeeds, and for anything the
+    snapshot cannot answer, routes proxy as before.
+
+    The snapshot version is "<catalog version>.<stock version>".
+
+    Args:
+        base_url (str): URL of the database service.
+        poll_interval (float): Seconds between version checks.
+        listing (callable): Maps a product dict to its entry in the listing body.
+    """
+
+    def __init__(self, base_url, poll_interval=CATALOG_POLL_INTERVAL, listing=None):
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self.listing = listing or (lambda product: product)
+        # (catalog version, stock version, serialized listing, products by id), swapped as a whole.
+        self.state = None
+        self.refresh_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def version(self):
+        state = self.state
+        return f"{state[0]}.{state[1]}" if state else None
+
+    def listing_body(self):
+        """
+        Returns:
+            tuple: (version, serialized listing), or (None, None) before the first load.
+        """
+        state = self.state
+        return (f"{state[0]}.{state[1]}", state[2]) if state else (None, None)
+
+    def get(self, product_id):
+        """
+        Returns:
+            tuple: (version, product dict or None).
+        """
+        state = self.state
+        if state is None or not str(product_id).isdigit():
+            return None, None
+        return f"{state[0]}.{state[1]}", state[3].get(int(product_id))
+
+    def _swap(self, version, stock_version, products):
+        body = json.dumps([self.listing(product) for product in products.values()])
+        self.state = (version, stock_version, body, products)
+
+    def refresh(self):
+        response = requests.get(f"{self.base_url}/inventory/catalog", timeout=10)
+        response.raise_for_status()
+        snapshot = response.json()
+        self._swap(snapshot["version"], snapshot["stock_version"], {product["product_id"]: product for product in snapshot["products"]})
+        logger.info("Catalog snapshot loaded: version %s, %d products", snapshot["version"], len(snapshot["products"]))
+
+    def refresh_stock(self):
+        response = requests.get(f"{self.base_url}/inventory/stock", timeout=10)
+        response.raise_for_status()
+        levels = response.json()
+        version, _, _, products = self.state
+        stock = dict((product_id, count) for product_id, count in levels["stock"])
+        if stock.keys() != products.keys():
+            # A product was added or removed after the Catalog version was read.
+            self.refresh()
+            return
+        self._swap(version, levels["stock_version"], {
+            product_id: dict(product, stock_count=stock[product_id]) for product_id, product in products.items()
+        })
+
+    def check(self):
+        with self.refresh_lock:
+            response = requests.get(f"{self.base_url}/db/versions", timeout=5)
+            response.raise_for_status()
+            versions = response.json()
+            state = self.state
+            if state is None or versions.get("Catalog") != state[0]:
+                self.refresh()
+            elif versions.get("Inventory") != state[1]:
+                self.refresh_stock()
+
+    def changed(self):
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.check()
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                logger.warning("Catalog snapshot check failed: %s", str(e))
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def start(self):
+        if self.poll_interval <= 0:
+            return self
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="catalog-snapshot", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def clear(self):
+        self.state = None
@@ -0,0 +1,35 @@
+from flask import Response, request, jsonify
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def relay_stream(upstream):
+    """
+    Pass a streamed database service response through chunk by chunk.
+    """
+    def chunks():
+        try:
+            for chunk in upstream.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            upstream.close()
+    return Response(chunks(), status=upstream.status_code, content_type=upstream.headers.get("Content-Type"))
+
+def conditional_headers():
+    """
+    Forward the client's If-None-Match so the database service can answer 304.
+    """
+    etag = request.headers.get("If-None-Match")
+    return {"If-None-Match": etag} if etag else {}
+
+def relay_json(upstream):
+    """
+    Relay a JSON database service response with its ETag; a 304 is passed on without a body.
+    """
+    if upstream.status_code == 304:
+        response = Response(status=304)
+    else:
+        response = jsonify(upstream.json())
+        response.status_code = upstream.status_code
+    if "ETag" in upstream.headers:
+        response.headers["ETag"] = upstream.headers["ETag"]
+    return response